@@ -3,13 +3,30 @@ import os
 import pandas as pd
 import json
 import base64
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
 from io import BytesIO
 from extract_tenant_data import flatten_extracted_data, parse_gpt_output, process_pdf, extract_images_from_pdf, call_gpt_vision_api, normalize_all_dates, normalize_date_string
 from extract_utils import detect_form_type, extract_text_from_first_page, extract_data_by_form_type,extract_handwritten_form, extract_standard_form
 from write_to_excel_template import write_multiple_applicants_to_template, write_flattened_to_template, write_to_summary_template
 from write_template_holder import write_to_template_holder
+from extraction_pipeline import DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT
+from extraction_jobs import JOB_DONE, cancel_job, get_job, job_results, submit_extraction_job
+from openai_scheduler import get_scheduler
+from model_cascade import MODEL_CASCADE_ENABLED, FIRST_PASS_MODEL, get_cascade_stats
+from field_reextract import REQUIRED_FIELD_COLUMNS, reextract_missing_fields
+from applicant_store import count_applicants, import_excel_holder, load_applicants_cached, update_applicant, upsert_records
+from batch_templates import write_batch_zip
+from bulk_extract import (
+    BATCH_TERMINAL_STATUSES,
+    download_batch_results,
+    make_openai_client,
+    pending_batches,
+    prepare_batch,
+    record_batch,
+    submit_batch,
+    update_batch_status,
+)
 from email.message import EmailMessage
 from email_ui import render_email_ui
 import smtplib
@@ -118,19 +135,32 @@ SINGLE_TEMPLATE_PATH = "templates/Tenant_Template.xlsx"
 MULTIPLE_TEMPLATE_PATH = "templates/Tenant_Template_Multiple.xlsx"
 SUMMARY_TEMPLATE_PATH ="templates/App_Summary_Template.xlsx"
 
+# Shown for each file while its GPT answer streams in.
+PREVIEW_FIELDS = ["Property Address", "FullName", "Monthly Rent", "Move-in Date"]
+
 st.sidebar.title("Navigation")
 st.title(" TenantApp Assistant")
 st.markdown("This tool extracts and validates tenant application data.")
 
 template_type = st.sidebar.selectbox("Select number of applicants:", ["1–2 Applicants", "3+ Applicants"], key="template_type_selector")
 
-df_holder = pd.DataFrame()
-if os.path.exists(EXTRACTED_DATA_PATH):
+if "applicant_store_migrated" not in st.session_state:
+    # Carry records saved by older versions (Excel holder) into the store once.
     try:
-        df_holder = pd.read_excel(EXTRACTED_DATA_PATH)
-        st.sidebar.markdown(f"📄 File loaded. Rows: **{len(df_holder)}**")
+        imported = import_excel_holder(EXTRACTED_DATA_PATH)
+        if imported:
+            st.sidebar.info(f"Imported {imported} record(s) from {EXTRACTED_DATA_PATH}.")
     except Exception as e:
-        st.sidebar.error(f"❌ Failed to load extracted data: {e}")
+        st.sidebar.warning(f"⚠️ Could not import {EXTRACTED_DATA_PATH}: {e}")
+    st.session_state["applicant_store_migrated"] = True
+
+df_holder = pd.DataFrame()
+applicant_search = st.sidebar.text_input("Search applicants (name or address):", key="applicant_search")
+try:
+    df_holder = load_applicants_cached(search=applicant_search)
+    st.sidebar.markdown(f"📄 Applicants stored: **{count_applicants()}** · shown: **{len(df_holder)}**")
+except Exception as e:
+    st.sidebar.error(f"❌ Failed to load extracted data: {e}")
 
 try:
     selected_indices = st.sidebar.multiselect(
@@ -170,25 +200,15 @@ if st.sidebar.button("Save to Tenant Template", key="save_to_template"):
                 st.session_state["final_output_bytes"] = output_bytes
                 st.session_state["final_filename"] = download_filename
 
-                os.makedirs(os.path.dirname(SUMMARY_TEMPLATE_PATH), exist_ok=True)
-
                 first_applicant = selected_df.iloc[0].to_dict()
-                write_to_summary_template(
+                summary_bytes, summary_filename = write_to_summary_template(
                     flat_data=first_applicant,
-                    output_path=SUMMARY_TEMPLATE_PATH,
                     summary_template_path=SUMMARY_TEMPLATE_PATH
                 )
 
-                with open(SUMMARY_TEMPLATE_PATH, "rb") as f:
-                    summary_bytes = BytesIO(f.read())
-
-                address = str(first_applicant.get("Property Address", "tenant")).strip()
-                address_clean = "_".join(re.sub(r"[^\w\s]", "", address).split()[:3]) or "tenant"
-                date_str = datetime.now().strftime("%Y%m%d")
-                summary_filename = f"{address_clean}_{date_str}_summary.xlsx".lower()
-
                 st.session_state["summary_output_bytes"] = summary_bytes
                 st.session_state["summary_filename"] = summary_filename
+                st.session_state["validation_ids"] = [int(i) for i in selected_df.index]
                 st.session_state["trigger_validation"] = True
 
             except Exception as e:
@@ -210,6 +230,48 @@ if "summary_output_bytes" in st.session_state and isinstance(st.session_state["s
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
+with st.sidebar.expander("📦 Batch Templates"):
+    st.caption("Tenant template and summary for every property that received applications in a period, in one zip.")
+    today = datetime.now().date()
+    batch_dates = st.date_input("Applications saved between:", value=(today, today), key="batch_dates")
+    if st.button("Generate for every property", key="batch_generate"):
+        if not isinstance(batch_dates, (tuple, list)) or len(batch_dates) != 2:
+            st.warning("Please pick a start and an end date.")
+        else:
+            saved_from = datetime.combine(batch_dates[0], datetime.min.time()).timestamp()
+            saved_to = datetime.combine(batch_dates[1] + timedelta(days=1), datetime.min.time()).timestamp()
+            try:
+                batch_df = load_applicants_cached(saved_between=(saved_from, saved_to))
+                if batch_df.empty:
+                    st.info("No applicants were saved in that period.")
+                else:
+                    batch_progress = st.progress(0.0, text="Building templates…")
+
+                    def on_batch_progress(done, total, report):
+                        status = f"❌ {report.error}" if report.error else f"{report.seconds:.2f}s"
+                        batch_progress.progress(done / total, text=f"{done}/{total} properties · {report.property_address} ({status})")
+
+                    zip_bytes = BytesIO()
+                    # Oldest first, so each property's summary describes its first applicant.
+                    reports = write_batch_zip(batch_df.iloc[::-1].to_dict("records"), zip_bytes, on_progress=on_batch_progress)
+                    zip_bytes.seek(0)
+                    st.session_state["batch_zip_bytes"] = zip_bytes
+                    st.session_state["batch_zip_filename"] = f"templates_{batch_dates[0]:%Y%m%d}_{batch_dates[1]:%Y%m%d}.zip"
+                    st.session_state["batch_zip_report"] = pd.DataFrame(
+                        [{"Property": r.property_address, "Applicants": r.applicants, "Seconds": round(r.seconds, 3), "Error": r.error or ""} for r in reports]
+                    )
+            except Exception as e:
+                st.error(f"❌ Batch template generation failed: {e}")
+
+    if isinstance(st.session_state.get("batch_zip_bytes"), BytesIO):
+        st.dataframe(st.session_state["batch_zip_report"], hide_index=True)
+        st.download_button(
+            label="⬇️ Download Batch Zip",
+            data=st.session_state["batch_zip_bytes"].getvalue(),
+            file_name=st.session_state["batch_zip_filename"],
+            mime="application/zip"
+        )
+
 uploaded_pdfs = st.file_uploader("Upload Tenant Application PDFs", type=["pdf"], accept_multiple_files=True, key="tenant_pdf_uploader")
 
 if "batch_extracted" not in st.session_state:
@@ -218,45 +280,167 @@ if "saved_applicants" not in st.session_state:
     st.session_state.saved_applicants = []
 
 if uploaded_pdfs:
+    max_workers = st.slider(
+        "Parallel extractions",
+        min_value=1,
+        max_value=MAX_WORKERS_LIMIT,
+        value=min(DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT),
+        help="Number of applications processed at the same time.",
+        key="max_extraction_workers",
+    )
+    use_cache = st.checkbox(
+        "Reuse cached results for previously processed PDFs",
+        value=True,
+        help="Uncheck to force a fresh GPT extraction for every file.",
+        key="use_gpt_cache",
+    )
     if st.button("Extract Data"):
-        for uploaded_file in uploaded_pdfs:
-            filename = uploaded_file.name
-            temp_path = os.path.join("temp", filename)
-            try:
-                with open(temp_path, "wb") as f:
-                    f.write(uploaded_file.read())
-            except Exception as e:
-                st.warning(f"{filename}: Failed to save uploaded file – {e}")
-                continue
-
-            try:
-                images = extract_images_from_pdf(temp_path)
-                text = extract_text_from_first_page(temp_path)
-                ocr_used = len(text.strip()) < 50
-                form_type = detect_form_type(text, ocr_used=ocr_used)
-            except Exception as e:
-                st.warning(f"{filename}: Error during form recognition – {e}")
-                continue
-
-            try:
-                if form_type in ["standard_form", "Form_A_2022", "Form_B_2024"]:
-                    extracted_data = extract_standard_form(images)
-                elif form_type == "handwritten_form":
-                    extracted_data = extract_handwritten_form(images)
+        files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_pdfs]
+        job_id = submit_extraction_job(files, max_workers=max_workers, use_cache=use_cache)
+        st.session_state.extraction_job = job_id
+        st.session_state.extraction_stats_before = (get_scheduler().stats(), get_cascade_stats().stats())
+        # Kept in the URL so a reconnecting browser picks the job up again.
+        st.query_params["job"] = job_id
+
+
+def show_extraction_job_summary(job, results):
+    """Move a finished job's results into the session and report on them."""
+    cached_files, text_layer_files = [], []
+    seen = set()
+    for filename, extracted_data in results:
+        # Uploads sharing a name are kept apart as "name#2", "name#3", ...
+        name, n = filename, 2
+        while name in seen:
+            name, n = f"{filename}#{n}", n + 1
+        seen.add(name)
+        filename = name
+        if "error" in extracted_data:
+            st.warning(f"{filename}: {extracted_data['error']}")
+            continue
+        st.session_state.batch_extracted[filename] = extracted_data
+        if extracted_data.get("cache_hit"):
+            cached_files.append(filename)
+        if extracted_data.get("source") == "text_layer":
+            text_layer_files.append(filename)
+
+    stats_before = st.session_state.pop("extraction_stats_before", None)
+    if stats_before:
+        scheduler_before, cascade_before = stats_before
+        stats_after = get_scheduler().stats()
+        cascade_after = get_cascade_stats().stats()
+        st.caption(
+            f"OpenAI requests: {stats_after['requests'] - scheduler_before['requests']} · "
+            f"retries: {stats_after['retries'] - scheduler_before['retries']} · "
+            f"rate-limit wait: {stats_after['total_wait_seconds'] - scheduler_before['total_wait_seconds']:.1f}s · "
+            f"still queued (all sessions): {stats_after['queue_depth']}"
+        )
+        if MODEL_CASCADE_ENABLED:
+            first_pass = cascade_after["first_pass"] - cascade_before["first_pass"]
+            accepted = cascade_after["first_pass_accepted"] - cascade_before["first_pass_accepted"]
+            st.caption(
+                f"Model cascade: {accepted} of {first_pass} settled by {FIRST_PASS_MODEL}"
+                f"{f' ({accepted / first_pass:.0%})' if first_pass else ''} · "
+                f"escalated: {cascade_after['escalated'] - cascade_before['escalated']} · "
+                f"escalation failures: {cascade_after['escalation_failed'] - cascade_before['escalation_failed']} · "
+                f"first-pass hit rate since start: {cascade_after['first_pass_hit_rate']:.0%}"
+            )
+    if cached_files:
+        st.info(f"♻️ {len(cached_files)} of {job.total} application(s) served from cache: {', '.join(cached_files)}")
+    if text_layer_files:
+        st.info(f"⚡ {len(text_layer_files)} fillable form(s) read directly without GPT: {', '.join(text_layer_files)}")
+    if job.status == JOB_DONE:
+        st.success("✅ All applications extracted.")
+    else:
+        st.warning(f"Extraction {job.status}: {job.done} of {job.total} application(s) finished.")
+
+
+def render_extraction_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        st.session_state.pop("extraction_job", None)
+        st.query_params.pop("job", None)
+        return
+    if job.finished:
+        # Collected once: the job id is dropped with the results, so later
+        # reruns neither merge them again nor repeat the messages.
+        st.session_state.pop("extraction_job", None)
+        st.query_params.pop("job", None)
+        show_extraction_job_summary(job, job_results(job_id))
+        return
+
+    st.progress(job.done / job.total if job.total else 1.0, text=f"Extracting {job.done} of {job.total} applications... (job {job_id[:8]})")
+    for filename in job.running_files:
+        fields = job.partials.get(filename, {})
+        preview = " · ".join(f"{key}: {fields[key]}" for key in PREVIEW_FIELDS if fields.get(key))
+        st.markdown(f"⏳ **{filename}** — {preview or 'reading...'}")
+    if st.button("Cancel extraction", key=f"cancel_{job_id}"):
+        if not cancel_job(job_id):
+            st.warning("This job is no longer running.")
+
+
+extraction_job_id = st.session_state.get("extraction_job") or st.query_params.get("job")
+if extraction_job_id:
+    st.session_state.extraction_job = extraction_job_id
+    active_job = get_job(extraction_job_id)
+    # Only unfinished jobs are polled; the fragment reruns the whole script
+    # once the job finishes so polling stops.
+    poll_every = 1.0 if active_job and not active_job.finished else None
+
+    @st.fragment(run_every=poll_every)
+    def extraction_job_status():
+        job = get_job(extraction_job_id)
+        if poll_every and job and job.finished:
+            st.rerun()
+        render_extraction_job(extraction_job_id)
+
+    extraction_job_status()
+
+with st.expander("📦 Bulk mode (OpenAI Batch API)"):
+    st.caption(
+        "For large backlogs: submit the uploaded PDFs as one batch job. Results arrive within 24 hours "
+        "at half the cost and are added to the extracted applications when you check the job."
+    )
+    if uploaded_pdfs and st.button("Submit uploaded PDFs as batch job", key="submit_bulk_batch"):
+        try:
+            files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_pdfs]
+            with st.spinner("Preparing batch requests..."):
+                payload, resolved, pending = prepare_batch(files)
+            for filename, result in resolved.items():
+                if "error" in result:
+                    st.warning(f"{filename}: {result['error']}")
                 else:
-                    st.warning(f"{filename}: Unknown or unsupported form type.")
-                    continue
+                    st.session_state.batch_extracted[filename] = result
+            if payload:
+                batch_id = submit_batch(make_openai_client(), payload)
+                record_batch(batch_id, pending)
+                st.success(f"✅ Submitted batch {batch_id} with {len(pending)} application(s).")
+            else:
+                st.info("Nothing to submit – all files were resolved without GPT.")
+        except Exception as e:
+            st.error(f"❌ Failed to submit batch: {e}")
 
-                if "error" in extracted_data:
-                    st.warning(f"{filename}: {extracted_data['error']}")
+    # Submitted batches are read back from the batch store, so they survive
+    # reloads, disconnects and restarts until their results are collected.
+    for stored in pending_batches():
+        batch_id = stored.batch_id
+        if st.button(f"Check batch {batch_id} ({len(stored.pending)} files, {stored.status})", key=f"check_{batch_id}"):
+            try:
+                client = make_openai_client()
+                batch = client.batches.retrieve(batch_id)
+                if batch.status not in BATCH_TERMINAL_STATUSES:
+                    update_batch_status(batch_id, batch.status)
+                    st.info(f"Batch {batch_id} is {batch.status}.")
                     continue
-
-                st.session_state.batch_extracted[filename] = extracted_data
+                results = download_batch_results(client, batch, stored.pending)
+                for filename, result in results.items():
+                    if "error" in result:
+                        st.warning(f"{filename}: {result['error']}")
+                    else:
+                        st.session_state.batch_extracted[filename] = result
+                update_batch_status(batch_id, batch.status, collected=True)
+                st.success(f"✅ Batch {batch_id} {batch.status}: results added. Click 'Save Extracted Data' to store them.")
             except Exception as e:
-                st.warning(f"{filename}: Extraction failed – {e}")
-                continue
-
-        st.success("✅ All applications extracted.")
+                st.error(f"❌ Failed to check batch {batch_id}: {e}")
 
 if st.button("Save Extracted Data"):
     saved_records = []
@@ -265,14 +449,14 @@ if st.button("Save Extracted Data"):
             parsed = parse_gpt_output(data)
             normalized = normalize_all_dates(parsed)
             flat = flatten_extracted_data(normalized)
+            flat["SourceFile"] = filename
             saved_records.append(flat)
         except Exception as e:
             st.warning(f"{filename}: Failed to parse – {e}")
 
     if saved_records:
         try:
-            df = pd.DataFrame(saved_records)
-            df.to_excel(EXTRACTED_DATA_PATH, index=False)
+            st.session_state["validation_ids"] = upsert_records(saved_records)
             st.success("✅ All extracted records saved.")
             st.session_state["trigger_validation"] = True
             st.session_state["email_validation_done"] = False
@@ -288,12 +472,53 @@ def is_missing(value):
     except Exception:
         return True
 
+# === Targeted re-extraction of missing required fields ===
+if uploaded_pdfs and st.session_state.get("validation_ids") and st.button(
+    "🔁 Re-extract Missing Fields",
+    help="Re-read only the form sections that hold missing required fields, instead of the whole application.",
+):
+    try:
+        df_fix = load_applicants_cached(ids=st.session_state["validation_ids"])
+    except Exception as e:
+        st.error(f"❌ Failed to load extracted data: {e}")
+        df_fix = pd.DataFrame()
+
+    uploads = {uploaded_file.name: uploaded_file for uploaded_file in uploaded_pdfs}
+    updated_rows = 0
+    if "SourceFile" not in df_fix.columns:
+        st.info("Saved records do not name their source PDFs. Click 'Save Extracted Data' again first.")
+    else:
+        with st.spinner("Re-extracting missing fields..."):
+            for idx, row in df_fix.iterrows():
+                missing = [label for label, column in REQUIRED_FIELD_COLUMNS.items() if is_missing(row.get(column, ""))]
+                source_file = str(row.get("SourceFile", "") or "")
+                if not missing or source_file not in uploads:
+                    continue
+                values, error = reextract_missing_fields(uploads[source_file].getvalue(), source_file, missing)
+                if error:
+                    st.warning(f"{source_file}: {error}")
+                if values:
+                    try:
+                        update_applicant(idx, values)
+                        updated_rows += 1
+                        st.caption(f"{source_file}: recovered {', '.join(values)}")
+                    except Exception as e:
+                        st.error(f"❌ Failed to save re-extracted fields for {source_file}: {e}")
+
+    if updated_rows:
+        st.success(f"✅ Updated {updated_rows} record(s).")
+        st.session_state["trigger_validation"] = True
+        st.session_state["email_validation_done"] = False
+    elif "SourceFile" in df_fix.columns:
+        st.info("No missing fields could be recovered from the uploaded PDFs.")
+
 # === Validation + Email Phase ===
 if st.session_state.get("trigger_validation", False) and not st.session_state.get("email_validation_done", False):
     st.caption("🔍 Validating Missing Info + Sending Emails...")
 
     try:
-        df_check = pd.read_excel(EXTRACTED_DATA_PATH)
+        # Only the records saved in this session need checking.
+        df_check = load_applicants_cached(ids=st.session_state.get("validation_ids"))
     except Exception as e:
         st.error(f"❌ Failed to load extracted data: {e}")
         st.stop()
@@ -306,13 +531,7 @@ if st.session_state.get("trigger_validation", False) and not st.session_state.ge
         email = str(row.get("Email", "") or "").strip()
         full_name = str(row.get("FullName", "") or "Applicant").strip()
 
-        required_fields = {
-            "Full Name": row.get("FullName", ""),
-            "Phone Number": row.get("PhoneNumber", ""),
-            "SSN": row.get("SSN", ""),
-            "DOB": row.get("DOB", ""),
-            "Current Employer": row.get("Applicant's Current Employer", "")
-        }
+        required_fields = {label: row.get(column, "") for label, column in REQUIRED_FIELD_COLUMNS.items()}
 
         missing_fields = [field for field, val in required_fields.items() if is_missing(val)]
         if not missing_fields:
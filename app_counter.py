@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import threading
+from typing import Dict
+from settings import get_setting, get_int_setting
+
+# Monotonic application numbers for summary IDs (APP-<number>-...). Numbers
+# are handed out by a single UPSERT on a SQLite row, which the database
+# serializes across threads and Streamlit worker processes, so no two
+# summaries get the same number and no workbook is read or written.
+
+APP_COUNTER_PATH = get_setting("app", "APP_COUNTER_PATH", "data/app_counter.sqlite3")
+APP_COUNTER_START = get_int_setting("app", "APP_COUNTER_START", 636)
+
+# One open connection per thread and database; opening SQLite and creating
+# the table on every call would cost more than the increment itself.
+_local = threading.local()
+
+
+def _connection(path: str) -> sqlite3.Connection:
+    connections: Dict[str, sqlite3.Connection] = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        connections[path] = conn
+    return conn
+
+
+def next_application_number(name: str = "application", path: str = APP_COUNTER_PATH, start: int = APP_COUNTER_START) -> int:
+    """
+    Reserve the next number of counter `name`. The first call returns
+    `start`; every later call returns the previous number + 1.
+    """
+    conn = _connection(path)
+    with conn:
+        # The UPSERT takes the write lock, so the SELECT in the same
+        # transaction reads this call's own value.
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name, start),
+        )
+        return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+
+def current_application_number(name: str = "application", path: str = APP_COUNTER_PATH):
+    """The last number handed out for `name`, or None before the first one."""
+    row = _connection(path).execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
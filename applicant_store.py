@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import pandas as pd
+from record_codec import normalize_record
+from settings import get_setting
+
+# Persistent store of saved applicants. Every saved record is kept: saving
+# again upserts by applicant identity instead of overwriting earlier
+# batches. Records are stored whole as JSON; the columns the app filters
+# and sorts on are copied out and indexed.
+
+APPLICANT_STORE_PATH = get_setting("app", "APPLICANT_STORE_PATH", "data/applicants.sqlite3")
+
+# Parsed DataFrames kept by `load_applicants_cached`, keyed by query and
+# store version. Streamlit reruns the whole script on every interaction, so
+# idle reruns are served from here.
+_LOAD_CACHE_SIZE = 8
+_load_cache: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+_load_cache_lock = threading.Lock()
+
+# Stores whose schema and WAL mode were already set up by this process;
+# both persist in the database file, so later connections skip them.
+_initialized_paths: Set[str] = set()
+
+
+@contextmanager
+def _store_db(path: str = APPLICANT_STORE_PATH):
+    """Open the store, commit on success and always close."""
+    conn = _connect(path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _connect(path: str = APPLICANT_STORE_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    if path not in _initialized_paths:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS applicants (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                record_key TEXT NOT NULL UNIQUE,
+                property_address TEXT,
+                full_name TEXT,
+                application_date TEXT,
+                source_file TEXT,
+                record TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_applicants_property_address ON applicants(property_address)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_applicants_full_name ON applicants(full_name)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_applicants_application_date ON applicants(application_date)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_applicants_updated_at ON applicants(updated_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_applicants_created_at ON applicants(created_at)")
+        _initialized_paths.add(path)
+    return conn
+
+
+def _clean(value) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    return str(value).strip()
+
+
+def _escape_like(text: str) -> str:
+    """Make `%`, `_` and the escape character itself match literally in LIKE."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _normalize(value) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", _clean(value).lower()).strip()
+
+
+def make_record_key(record: Dict) -> str:
+    """
+    Identity of an application: applicant name + property address +
+    application date, or the source file name when the name or address is
+    missing. Saving the same application again updates its row.
+    """
+    name, address = _normalize(record.get("FullName")), _normalize(record.get("Property Address"))
+    if name and address:
+        identity = f"applicant|{name}|{address}|{_normalize(record.get('ApplicationDate'))}"
+    else:
+        identity = f"file|{_clean(record.get('SourceFile'))}|{name}|{address}"
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+def _indexed_columns(record: Dict):
+    return (
+        _clean(record.get("Property Address")),
+        _clean(record.get("FullName")),
+        _clean(record.get("ApplicationDate")),
+        _clean(record.get("SourceFile")),
+    )
+
+
+def _to_json(record: Dict) -> str:
+    # NaN from DataFrame rows is stored as an empty value; nested fields are
+    # stored as real JSON lists (see record_codec).
+    cleaned = {k: ("" if isinstance(v, float) and pd.isna(v) else v) for k, v in normalize_record(record).items()}
+    return json.dumps(cleaned, default=str)
+
+
+def upsert_records(records: Iterable[Dict], path: str = APPLICANT_STORE_PATH) -> List[int]:
+    """
+    Insert new applicants and update ones already stored.
+
+    Returns the store ids of the records, in input order.
+    """
+    now = time.time()
+    ids = []
+    with _store_db(path) as conn:
+        for record in records:
+            record_key = make_record_key(record)
+            conn.execute(
+                """
+                INSERT INTO applicants (record_key, property_address, full_name, application_date, source_file, record, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(record_key) DO UPDATE SET
+                    property_address = excluded.property_address,
+                    full_name = excluded.full_name,
+                    application_date = excluded.application_date,
+                    source_file = excluded.source_file,
+                    record = excluded.record,
+                    updated_at = excluded.updated_at
+                """,
+                (record_key, *_indexed_columns(record), _to_json(record), now, now),
+            )
+            ids.append(conn.execute("SELECT id FROM applicants WHERE record_key = ?", (record_key,)).fetchone()[0])
+    return ids
+
+
+def update_applicant(applicant_id: int, values: Dict, path: str = APPLICANT_STORE_PATH) -> bool:
+    """
+    Merge `values` into a stored record. The record keeps its id; its
+    identity follows the edited name, address and date, so saving the
+    corrected application later updates this row. When another row already
+    has that identity it is folded into this one (the edited values win).
+    """
+    with _store_db(path) as conn:
+        row = conn.execute("SELECT record, created_at FROM applicants WHERE id = ?", (int(applicant_id),)).fetchone()
+        if row is None:
+            return False
+        record = {**json.loads(row[0]), **values}
+        created_at = row[1]
+        record_key = make_record_key(record)
+
+        clash = conn.execute(
+            "SELECT id, record, created_at FROM applicants WHERE record_key = ? AND id != ?",
+            (record_key, int(applicant_id)),
+        ).fetchone()
+        if clash is not None:
+            record = {**json.loads(clash[1]), **record}
+            created_at = min(created_at, clash[2])
+            conn.execute("DELETE FROM applicants WHERE id = ?", (clash[0],))
+
+        conn.execute(
+            """
+            UPDATE applicants
+            SET record_key = ?, property_address = ?, full_name = ?, application_date = ?, source_file = ?,
+                record = ?, created_at = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (record_key, *_indexed_columns(record), _to_json(record), created_at, time.time(), int(applicant_id)),
+        )
+        return True
+
+
+def load_applicants(
+    ids: Optional[Iterable[int]] = None,
+    search: Optional[str] = None,
+    path: str = APPLICANT_STORE_PATH,
+    saved_between: Optional[Tuple[float, float]] = None,
+) -> pd.DataFrame:
+    """
+    Stored applicants as a DataFrame indexed by store id, newest first.
+
+    Args:
+        ids: Only these applicants.
+        search: Case-insensitive substring of the applicant name or
+            property address.
+        saved_between: (start, end) epoch seconds; only applicants first
+            saved in [start, end).
+    """
+    query = "SELECT id, record FROM applicants"
+    clauses, params = [], []
+    if ids is not None:
+        ids = [int(i) for i in ids]
+        if not ids:
+            return pd.DataFrame()
+        clauses.append(f"id IN ({', '.join('?' * len(ids))})")
+        params.extend(ids)
+    if search and search.strip():
+        clauses.append("(full_name LIKE ? ESCAPE '\\' OR property_address LIKE ? ESCAPE '\\')")
+        params.extend([f"%{_escape_like(search.strip())}%"] * 2)
+    if saved_between is not None:
+        clauses.append("created_at >= ? AND created_at < ?")
+        params.extend(float(t) for t in saved_between)
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY updated_at DESC, id DESC"
+
+    with _store_db(path) as conn:
+        rows = conn.execute(query, params).fetchall()
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame([json.loads(record) for _, record in rows], index=pd.Index([i for i, _ in rows], name="id"))
+
+
+def store_version(path: str = APPLICANT_STORE_PATH) -> Tuple[int, float, int]:
+    """
+    Cheap fingerprint of the store contents: (row count, last update time,
+    highest id). It changes on every insert, update or delete.
+    """
+    with _store_db(path) as conn:
+        count, updated_at, max_id = conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(updated_at), 0), COALESCE(MAX(id), 0) FROM applicants"
+        ).fetchone()
+    return count, updated_at, max_id
+
+
+def load_applicants_cached(
+    ids: Optional[Iterable[int]] = None,
+    search: Optional[str] = None,
+    path: str = APPLICANT_STORE_PATH,
+    saved_between: Optional[Tuple[float, float]] = None,
+) -> pd.DataFrame:
+    """
+    `load_applicants`, reusing the last parsed DataFrame for the same query
+    while the store is unchanged. Treat the result as read-only; it is
+    shared between reruns and sessions.
+    """
+    ids_key = None if ids is None else tuple(sorted(int(i) for i in ids))
+    saved_key = None if saved_between is None else tuple(float(t) for t in saved_between)
+    key = (path, ids_key, (search or "").strip().lower(), saved_key, store_version(path))
+    with _load_cache_lock:
+        if key in _load_cache:
+            _load_cache.move_to_end(key)
+            return _load_cache[key]
+
+    df = load_applicants(ids=ids_key, search=search, path=path, saved_between=saved_key)
+    with _load_cache_lock:
+        _load_cache[key] = df
+        while len(_load_cache) > _LOAD_CACHE_SIZE:
+            _load_cache.popitem(last=False)
+    return df
+
+
+def count_applicants(path: str = APPLICANT_STORE_PATH) -> int:
+    with _store_db(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM applicants").fetchone()[0]
+
+
+def import_excel_holder(excel_path: str, path: str = APPLICANT_STORE_PATH) -> int:
+    """
+    One-time migration of a Template_Data_Holder.xlsx into an empty store.
+    Stringified nested fields are decoded on the way in. Returns the number
+    of records imported.
+    """
+    if not os.path.exists(excel_path) or count_applicants(path):
+        return 0
+    df = pd.read_excel(excel_path, dtype=str).fillna("")
+    return len(upsert_records(df.to_dict("records"), path=path))
+
@@ -0,0 +1,198 @@
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+from applicant_store import APPLICANT_STORE_PATH, upsert_records
+from extract_tenant_data import flatten_extracted_data, normalize_all_dates, parse_gpt_output
+from extract_utils import extract_from_document
+from extraction_pipeline import DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT
+from pdf_document import PdfDocument
+
+# Headless batch extraction for cron jobs and archives. Every PDF goes
+# through the same detect -> extract -> parse_gpt_output ->
+# normalize_all_dates -> flatten_extracted_data chain as the Streamlit
+# upload path, and the flat records are upserted into the applicant store
+# as files finish. Nothing here touches st.secrets: all configuration
+# (OPENAI_API_KEY, APPLICANT_STORE_PATH, RENDER_PROCESSES, GPT_CACHE_ENABLED,
+# ...) is read from the environment through `settings.get_setting`.
+#
+#   python batch_cli.py archive/2025-06 --workers 8
+#   python batch_cli.py "archive/**/*.pdf" --no-cache
+
+STAGES = ("detect", "extract", "parse", "normalize", "flatten", "store")
+
+
+class FileResult(NamedTuple):
+    path: str
+    record: Optional[Dict]
+    timings: Dict[str, float]  # stage -> seconds, for the stages that ran
+    error: Optional[str] = None
+
+
+def find_pdfs(inputs: Iterable[str], recursive: bool = False) -> List[str]:
+    """
+    Expand folders, glob patterns and file paths into a sorted list of PDF
+    paths, without duplicates.
+    """
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            # "*" and the suffix check below, so "scan.PDF" is found too.
+            pattern = os.path.join(item, "**", "*") if recursive else os.path.join(item, "*")
+            matches = glob.glob(pattern, recursive=recursive)
+        else:
+            matches = glob.glob(item, recursive=True)
+        found.update(os.path.abspath(m) for m in matches if m.lower().endswith(".pdf") and os.path.isfile(m))
+    return sorted(found)
+
+
+def process_pdf(path: str, use_cache: bool = True) -> FileResult:
+    """
+    Run one PDF through the pipeline up to the flat record, timing each
+    stage. Never raises, so it is safe to run inside a worker thread.
+    """
+    timings: Dict[str, float] = {}
+    stage = "detect"
+    start = time.perf_counter()
+    try:
+        with PdfDocument(path) as doc:
+            form_type = doc.form_type
+            timings["detect"] = time.perf_counter() - start
+            if form_type not in ("standard_form", "handwritten_form"):
+                return FileResult(path, None, timings, f"Unsupported or unknown form type: {form_type}")
+
+            stage, start = "extract", time.perf_counter()
+            result = extract_from_document(doc, use_cache=use_cache)
+            timings["extract"] = time.perf_counter() - start
+        if "error" in result:
+            return FileResult(path, None, timings, result["error"])
+
+        stage, start = "parse", time.perf_counter()
+        parsed = parse_gpt_output(result)
+        timings["parse"] = time.perf_counter() - start
+
+        stage, start = "normalize", time.perf_counter()
+        normalized = normalize_all_dates(parsed)
+        timings["normalize"] = time.perf_counter() - start
+
+        stage, start = "flatten", time.perf_counter()
+        record = flatten_extracted_data(normalized)
+        timings["flatten"] = time.perf_counter() - start
+    except Exception as e:
+        return FileResult(path, None, timings, f"{stage} failed – {e}")
+
+    record["SourceFile"] = os.path.basename(path)
+    return FileResult(path, record, timings)
+
+
+def process_pdfs(
+    paths: List[str],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    use_cache: bool = True,
+    store_path: Optional[str] = APPLICANT_STORE_PATH,
+    on_result: Optional[Callable[[FileResult, int, int], None]] = None,
+) -> List[FileResult]:
+    """
+    Process `paths` with at most `max_workers` files in flight and upsert
+    each record into the store at `store_path` (None skips the store) as
+    soon as its file finishes, so an interrupted run keeps what it did.
+
+    `on_result(result, done, total)` is called in the calling thread.
+    Returns the results in completion order.
+    """
+    results: List[FileResult] = []
+    if not paths:
+        return results
+    max_workers = max(1, min(int(max_workers or 1), MAX_WORKERS_LIMIT, len(paths)))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-cli") as pool:
+        futures = [pool.submit(process_pdf, path, use_cache) for path in paths]
+        for future in as_completed(futures):
+            result = future.result()
+            if result.record is not None and store_path:
+                # SQLite writes stay in this thread; the workers only extract.
+                start = time.perf_counter()
+                try:
+                    upsert_records([result.record], path=store_path)
+                    result.timings["store"] = time.perf_counter() - start
+                except Exception as e:
+                    result = result._replace(record=None, error=f"store failed – {e}")
+            results.append(result)
+            if on_result:
+                on_result(result, len(results), len(paths))
+    return results
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile (q in 0..100) of `values`."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    pos = (len(ordered) - 1) * q / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def format_throughput(results: List[FileResult], elapsed: float) -> str:
+    """Files/min for the run plus p50/p95 seconds for every stage that ran."""
+    stored = sum(1 for r in results if r.record is not None)
+    rate = len(results) / elapsed * 60 if elapsed > 0 else 0.0
+    lines = [
+        f"📊 {len(results)} file(s) in {elapsed:.1f}s – {rate:.1f} files/min, {stored} stored, {len(results) - stored} failed",
+        f"   {'stage':<10} {'files':>6} {'p50 s':>9} {'p95 s':>9}",
+    ]
+    for stage in STAGES:
+        values = [r.timings[stage] for r in results if stage in r.timings]
+        if values:
+            lines.append(f"   {stage:<10} {len(values):>6} {percentile(values, 50):>9.3f} {percentile(values, 95):>9.3f}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Extract tenant application PDFs into the applicant store without the Streamlit UI.",
+        epilog="Settings (OPENAI_API_KEY, APPLICANT_STORE_PATH, RENDER_PROCESSES, GPT_CACHE_ENABLED, ...) are read from the environment.",
+    )
+    parser.add_argument("inputs", nargs="+", help="Folders, glob patterns (quote them) or PDF files")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help=f"PDFs in flight at once (1-{MAX_WORKERS_LIMIT}, default MAX_EXTRACTION_WORKERS={DEFAULT_MAX_WORKERS})")
+    parser.add_argument("--recursive", action="store_true", help="Include PDFs in subfolders of folder inputs")
+    parser.add_argument("--store", default=APPLICANT_STORE_PATH, help="Applicant store database (default APPLICANT_STORE_PATH)")
+    parser.add_argument("--no-store", action="store_true", help="Extract and report only; do not write to the store")
+    parser.add_argument("--no-cache", action="store_true", help="Do not answer from the GPT response cache")
+    args = parser.parse_args(argv)
+
+    paths = find_pdfs(args.inputs, recursive=args.recursive)
+    if not paths:
+        print("❌ No PDF files found.")
+        return 2
+
+    def report(result: FileResult, done: int, total: int) -> None:
+        name = os.path.basename(result.path)
+        if result.error:
+            print(f"⚠️ [{done}/{total}] {name}: {result.error}")
+        else:
+            print(f"✅ [{done}/{total}] {name} ({sum(result.timings.values()):.1f}s)")
+
+    workers = max(1, min(args.workers, MAX_WORKERS_LIMIT))
+    print(f"📦 Processing {len(paths)} PDF(s) with {workers} worker(s)...")
+    start = time.perf_counter()
+    results = process_pdfs(
+        paths,
+        max_workers=workers,
+        use_cache=not args.no_cache,
+        store_path=None if args.no_store else args.store,
+        on_result=report,
+    )
+    print(format_throughput(results, time.perf_counter() - start))
+    if not args.no_store:
+        print(f"💾 Applicant store: {os.path.abspath(args.store)}")
+    return 1 if any(r.error for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
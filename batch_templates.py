@@ -0,0 +1,196 @@
+import csv
+import io
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from property_index import address_key
+from settings import get_int_setting
+
+# Batch template generation: stored applicants are grouped by property and
+# every group gets its tenant template and summary, built in a process pool
+# and written into one zip as groups finish. This module is imported by the
+# worker processes; the Excel writers are imported inside the worker
+# function so the parent only loads them once it builds outputs itself.
+
+SINGLE_TEMPLATE_PATH = "templates/Tenant_Template.xlsx"
+MULTIPLE_TEMPLATE_PATH = "templates/Tenant_Template_Multiple.xlsx"
+SUMMARY_TEMPLATE_PATH = "templates/App_Summary_Template.xlsx"
+
+# Set BATCH_TEMPLATE_PROCESSES=1 to build every group in the calling process.
+BATCH_TEMPLATE_PROCESSES = get_int_setting("app", "BATCH_TEMPLATE_PROCESSES", min(4, os.cpu_count() or 1))
+
+REPORT_NAME = "batch_report.csv"
+
+_batch_pool: Optional[ProcessPoolExecutor] = None
+_batch_pool_size = 0
+_batch_pool_lock = threading.Lock()
+
+
+class GroupOutput(NamedTuple):
+    property_address: str
+    applicants: int
+    files: List[Tuple[str, bytes]]  # (file name, xlsx bytes)
+    seconds: float
+    error: Optional[str] = None
+
+
+class GroupReport(NamedTuple):
+    """What `write_batch_zip` did for one property; `files` are paths inside the zip."""
+    property_address: str
+    applicants: int
+    files: List[str]
+    seconds: float
+    error: Optional[str] = None
+
+
+def _clean_record(record: Dict) -> Dict:
+    # DataFrame rows carry NaN for fields a record does not have.
+    return {k: ("" if isinstance(v, float) and math.isnan(v) else v) for k, v in record.items()}
+
+
+def group_by_property(records: Iterable[Dict]) -> List[Tuple[str, List[Dict]]]:
+    """
+    Group applicant records by normalized property address, in order of
+    first appearance. Records without an address are left out.
+    """
+    groups: Dict[str, Tuple[str, List[Dict]]] = {}
+    for record in records:
+        record = _clean_record(record)
+        address = str(record.get("Property Address", "") or "").strip()
+        key = address_key(address)
+        if not key:
+            continue
+        groups.setdefault(key, (address, []))[1].append(record)
+    return list(groups.values())
+
+
+def build_group_outputs(
+    property_address: str,
+    records: List[Dict],
+    engine: Optional[str] = None,
+    single_template: str = SINGLE_TEMPLATE_PATH,
+    multiple_template: str = MULTIPLE_TEMPLATE_PATH,
+    summary_template: str = SUMMARY_TEMPLATE_PATH,
+) -> GroupOutput:
+    """Tenant template (single or multi-applicant) and summary for one property. Runs in worker processes."""
+    import pandas as pd
+    from write_to_excel_template import write_flattened_to_template, write_multiple_applicants_to_template, write_to_summary_template
+
+    start = time.perf_counter()
+    try:
+        if len(records) == 1:
+            output, filename = write_flattened_to_template(records[0], single_template, engine=engine)
+        else:
+            output, filename = write_multiple_applicants_to_template(pd.DataFrame(records), template_path=multiple_template, engine=engine)
+        if output is None:
+            raise RuntimeError("the tenant template could not be written (see the log)")
+        summary, summary_filename = write_to_summary_template(records[0], summary_template_path=summary_template, engine=engine)
+        files = [(filename, output.getvalue()), (summary_filename, summary.getvalue())]
+        return GroupOutput(property_address, len(records), files, time.perf_counter() - start)
+    except Exception as e:
+        return GroupOutput(property_address, len(records), [], time.perf_counter() - start, str(e))
+
+
+def _get_batch_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Return the shared batch pool, (re)creating it if the size changed or it broke."""
+    global _batch_pool, _batch_pool_size
+    with _batch_pool_lock:
+        if _batch_pool is None or _batch_pool_size != max_workers:
+            if _batch_pool is not None:
+                _batch_pool.shutdown(wait=False, cancel_futures=True)
+            # "spawn" avoids forking a process that already runs Streamlit threads.
+            _batch_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _batch_pool_size = max_workers
+        return _batch_pool
+
+
+def _reset_batch_pool() -> None:
+    global _batch_pool, _batch_pool_size
+    with _batch_pool_lock:
+        if _batch_pool is not None:
+            _batch_pool.shutdown(wait=False, cancel_futures=True)
+        _batch_pool = None
+        _batch_pool_size = 0
+
+
+def iter_group_outputs(
+    groups: List[Tuple[str, List[Dict]]],
+    max_workers: Optional[int] = None,
+    engine: Optional[str] = None,
+) -> Iterator[GroupOutput]:
+    """Build every group's outputs, yielding them in completion order."""
+    max_workers = max_workers or BATCH_TEMPLATE_PROCESSES
+    if max_workers <= 1 or len(groups) <= 1:
+        for address, records in groups:
+            yield build_group_outputs(address, records, engine)
+        return
+
+    pool = _get_batch_pool(max_workers)
+    try:
+        futures = [pool.submit(build_group_outputs, address, records, engine) for address, records in groups]
+        for future in as_completed(futures):
+            yield future.result()
+    except BrokenProcessPool:
+        _reset_batch_pool()
+        raise
+
+
+def _folder_name(address: str, used: set) -> str:
+    base = "_".join(re.sub(r"[^\w\s]", "", address).split()) or "property"
+    name, n = base, 2
+    while name.lower() in used:
+        name, n = f"{base}_{n}", n + 1
+    used.add(name.lower())
+    return name
+
+
+def write_batch_zip(
+    records: Iterable[Dict],
+    output: BinaryIO,
+    max_workers: Optional[int] = None,
+    engine: Optional[str] = None,
+    on_progress: Optional[Callable[[int, int, GroupReport], None]] = None,
+) -> List[GroupReport]:
+    """
+    Build templates for every property in `records` and write them into a
+    zip on `output` (one folder per property, plus batch_report.csv with
+    per-group timing and errors).
+
+    `on_progress(done, total, report)` is called in the calling thread after
+    each group is written. Returns the group reports in completion order.
+    """
+    groups = group_by_property(records)
+    results: List[GroupReport] = []
+    used_folders: set = set()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zf:
+        for result in iter_group_outputs(groups, max_workers=max_workers, engine=engine):
+            folder = _folder_name(result.property_address, used_folders)
+            paths = []
+            for filename, data in result.files:
+                paths.append(f"{folder}/{filename}")
+                zf.writestr(paths[-1], data)
+            report = GroupReport(result.property_address, result.applicants, paths, result.seconds, result.error)
+            results.append(report)
+            if on_progress:
+                on_progress(len(results), len(groups), report)
+
+        report_csv = io.StringIO()
+        writer = csv.writer(report_csv)
+        writer.writerow(["Property Address", "Applicants", "Files", "Seconds", "Error"])
+        for report in results:
+            writer.writerow([
+                report.property_address,
+                report.applicants,
+                "; ".join(report.files),
+                f"{report.seconds:.3f}",
+                report.error or "",
+            ])
+        zf.writestr(REPORT_NAME, report_csv.getvalue())
+    return results
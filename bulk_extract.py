@@ -0,0 +1,422 @@
+import io
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+import openai
+from extract_tenant_data import (
+    GPT_VISION_MODEL,
+    STANDARD_FORM_PROMPT,
+    build_image_parts,
+    build_vision_messages,
+    flatten_extracted_data,
+    normalize_all_dates,
+    parse_gpt_output,
+)
+from extract_utils import HANDWRITTEN_FORM_PROMPT, extract_standard_form_text_layer
+from form_text_layer import merge_with_gpt_output
+from pdf_document import PdfDocument
+from output_schema import (
+    HANDWRITTEN_FORM_RESPONSE_FORMAT,
+    STANDARD_FORM_RESPONSE_FORMAT,
+    STRUCTURED_OUTPUT_ENABLED,
+    spec_for_response_format,
+    validate_gpt_json,
+)
+from record_codec import encode_for_excel
+from settings import get_setting
+
+# Offline bulk extraction through the OpenAI Batch API. Requests use the same
+# prompts and image encoding as the interactive path, are uploaded as one
+# JSONL file, and the results go through the usual
+# parse_gpt_output -> normalize_all_dates -> flatten_extracted_data chain.
+# Answers are schema-checked and merged with the text-layer record exactly
+# like interactive ones, so prepare_batch hands back what each request needs
+# for that (its form type and partial text-layer record), keyed by custom_id.
+# Batches cost half as much as interactive calls and finish within 24h.
+#
+# A batch can outlive the Streamlit session that submitted it, so submitted
+# batch ids, the per-request mapping and the last seen status are kept in
+# SQLite (BULK_BATCHES_PATH) until their results have been collected.
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+BULK_BATCHES_PATH = get_setting("app", "BULK_BATCHES_PATH", "data/bulk_batches.sqlite3")
+
+# A PDF path, or a (filename, pdf_bytes) pair for uploads kept in memory.
+BatchSource = Union[str, Path, Tuple[str, bytes]]
+
+_RESPONSE_FORMATS = {
+    "standard_form": STANDARD_FORM_RESPONSE_FORMAT,
+    "handwritten_form": HANDWRITTEN_FORM_RESPONSE_FORMAT,
+}
+
+
+def make_openai_client(base_url: Optional[str] = None) -> openai.OpenAI:
+    """
+    Create an OpenAI client for batch work.
+
+    `base_url` (or the OPENAI_BASE_URL setting) points the client at another
+    server, e.g. `fake_batch_server.FakeBatchServer` during testing.
+    """
+    return openai.OpenAI(
+        api_key=get_setting("openai", "OPENAI_API_KEY"),
+        base_url=base_url or get_setting("openai", "OPENAI_BASE_URL"),
+    )
+
+
+def build_batch_line(
+    custom_id: str,
+    system_prompt: str,
+    images,
+    model: str = GPT_VISION_MODEL,
+    max_tokens: int = 1000,
+    response_format: Optional[Dict] = None,
+) -> Dict:
+    """One Batch API request line, identical to what run_vision_completion sends."""
+    messages = build_vision_messages(system_prompt, build_image_parts(images))
+    body = {
+        "model": model,
+        "messages": messages,
+        "temperature": 0,
+        "max_tokens": max_tokens,
+    }
+    if response_format and STRUCTURED_OUTPUT_ENABLED:
+        body["response_format"] = response_format
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": body,
+    }
+
+
+def _unique_custom_id(name: str, seen: set) -> str:
+    custom_id = name
+    n = 2
+    while custom_id in seen:
+        custom_id = f"{name}#{n}"
+        n += 1
+    seen.add(custom_id)
+    return custom_id
+
+
+def _open_source(source: BatchSource) -> PdfDocument:
+    if isinstance(source, tuple):
+        name, data = source
+        return PdfDocument(data, name=name)
+    return PdfDocument(source)
+
+
+def prepare_batch(
+    sources: Iterable[BatchSource], model: str = GPT_VISION_MODEL
+) -> Tuple[bytes, Dict[str, Dict[str, str]], Dict[str, Dict]]:
+    """
+    Build the batch JSONL for a set of PDFs.
+
+    Each source is a PDF path or a (filename, pdf_bytes) pair; the file name
+    becomes the custom_id. Fillable standard forms that the text-layer fast
+    path can read completely are resolved immediately and not sent.
+    Unreadable or unknown forms are reported as errors.
+
+    Returns:
+        Tuple[bytes, Dict[str, Dict[str, str]], Dict[str, Dict]]: the JSONL
+        payload (empty when nothing needs GPT), custom_id -> result for files
+        already resolved, and custom_id -> {"form_type", "text_layer_record"}
+        for every request in the payload, to pass to download_batch_results.
+    """
+    lines = []
+    resolved: Dict[str, Dict[str, str]] = {}
+    pending: Dict[str, Dict] = {}
+    seen: set = set()
+
+    for source in sources:
+        name = source[0] if isinstance(source, tuple) else Path(source).name
+        custom_id = _unique_custom_id(name, seen)
+        try:
+            text_layer_record = None
+            with _open_source(source) as doc:
+                form_type = doc.form_type
+                if form_type == "standard_form":
+                    fast_result, text_layer_record = extract_standard_form_text_layer(doc)
+                    if fast_result:
+                        resolved[custom_id] = fast_result
+                        continue
+                    prompt = STANDARD_FORM_PROMPT
+                elif form_type == "handwritten_form":
+                    prompt = HANDWRITTEN_FORM_PROMPT
+                else:
+                    resolved[custom_id] = {"error": "Unknown or unsupported form type."}
+                    continue
+
+                images = doc.form_images()
+            if not images:
+                resolved[custom_id] = {"error": "Failed to render PDF pages."}
+                continue
+            line = build_batch_line(custom_id, prompt, images, model=model, response_format=_RESPONSE_FORMATS[form_type])
+            lines.append(json.dumps(line))
+            pending[custom_id] = {"form_type": form_type, "text_layer_record": text_layer_record}
+        except Exception as e:
+            resolved[custom_id] = {"error": f"Failed to prepare batch request – {e}"}
+
+    payload = ("\n".join(lines) + "\n").encode() if lines else b""
+    return payload, resolved, pending
+
+
+def submit_batch(client: openai.OpenAI, payload: bytes, description: str = "tenant application bulk extraction") -> str:
+    """Upload the JSONL payload and start a batch. Returns the batch id."""
+    input_file = client.files.create(file=("batch_requests.jsonl", io.BytesIO(payload)), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata={"description": description},
+    )
+    return batch.id
+
+
+def wait_for_batch(
+    client: openai.OpenAI,
+    batch_id: str,
+    poll_interval: float = 30.0,
+    timeout: Optional[float] = None,
+    on_status: Optional[Callable[[object], None]] = None,
+):
+    """Poll until the batch reaches a terminal status (or `timeout` seconds pass)."""
+    started = time.monotonic()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if on_status:
+            on_status(batch)
+        if batch.status in BATCH_TERMINAL_STATUSES:
+            return batch
+        if timeout is not None and time.monotonic() - started > timeout:
+            raise TimeoutError(f"Batch {batch_id} still '{batch.status}' after {timeout:.0f}s")
+        time.sleep(poll_interval)
+
+
+def _read_jsonl(client: openai.OpenAI, file_id: Optional[str]) -> List[Dict]:
+    if not file_id:
+        return []
+    text = client.files.content(file_id).text
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _checked_result(content: str, request: Dict) -> Dict[str, str]:
+    """Validate one batch answer and merge it like the interactive extractors do."""
+    spec = spec_for_response_format(_RESPONSE_FORMATS.get(request.get("form_type")))
+    if spec is not None:
+        record, problems = validate_gpt_json(content, spec)
+        if record is None:
+            return {"error": f"GPT output failed schema validation: {'; '.join(problems)}"}
+        if problems:
+            print(f"⚠️ GPT output repaired to match schema: {'; '.join(problems[:5])}")
+        content = json.dumps(record)
+    result = {"GPT_Output": content}
+    if request.get("text_layer_record"):
+        result = merge_with_gpt_output(request["text_layer_record"], result)
+    return result
+
+
+def download_batch_results(client: openai.OpenAI, batch, pending: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict[str, str]]:
+    """
+    Collect per-request results of a finished batch.
+
+    `pending` is the custom_id -> request mapping from prepare_batch. Each
+    answer is checked against its form's schema and merged with the
+    text-layer record; requests without an output line (failed, expired or
+    cancelled batches) are reported as errors.
+
+    Returns:
+        Dict[str, Dict[str, str]]: custom_id -> {"GPT_Output": text} or {"error": message},
+        the same shape the interactive extractors return.
+    """
+    pending = pending or {}
+    results: Dict[str, Dict[str, str]] = {}
+
+    for line in _read_jsonl(client, batch.output_file_id) + _read_jsonl(client, batch.error_file_id):
+        custom_id = line.get("custom_id")
+        response = line.get("response") or {}
+        body = response.get("body") or {}
+        error = line.get("error") or body.get("error")
+        if error or response.get("status_code", 200) != 200:
+            message = error.get("message") if isinstance(error, dict) else str(error or f"HTTP {response.get('status_code')}")
+            results[custom_id] = {"error": message}
+            continue
+        choices = body.get("choices") or []
+        if not choices:
+            results[custom_id] = {"error": "No GPT choices returned"}
+            continue
+        if choices[0].get("finish_reason") == "length":
+            # Batch answers cannot be continued like interactive ones.
+            results[custom_id] = {"error": "GPT output truncated at max_tokens"}
+            continue
+        content = (choices[0].get("message", {}).get("content") or "").strip()
+        results[custom_id] = _checked_result(content, pending.get(custom_id, {}))
+
+    for custom_id in pending:
+        results.setdefault(custom_id, {"error": f"No result returned (batch status '{batch.status}')"})
+    return results
+
+
+def flatten_batch_results(results: Dict[str, Dict[str, str]]) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """
+    Run parse_gpt_output -> normalize_all_dates -> flatten_extracted_data on
+    every successful result.
+
+    Returns:
+        Tuple[Dict[str, Dict], Dict[str, str]]: custom_id -> flat record, and
+        custom_id -> error message for everything that failed.
+    """
+    records, errors = {}, {}
+    for custom_id, result in results.items():
+        if "error" in result:
+            errors[custom_id] = result["error"]
+            continue
+        try:
+            records[custom_id] = flatten_extracted_data(normalize_all_dates(parse_gpt_output(result)))
+        except Exception as e:
+            errors[custom_id] = f"Failed to parse – {e}"
+    return records, errors
+
+
+def run_bulk_extraction(
+    sources: Iterable[BatchSource],
+    client: Optional[openai.OpenAI] = None,
+    poll_interval: float = 30.0,
+    timeout: Optional[float] = None,
+    on_status: Optional[Callable[[object], None]] = None,
+) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """Prepare, submit and wait for one batch, then flatten its results."""
+    client = client or make_openai_client()
+    payload, results, pending = prepare_batch(sources)
+    if payload:
+        batch_id = submit_batch(client, payload)
+        batch = wait_for_batch(client, batch_id, poll_interval=poll_interval, timeout=timeout, on_status=on_status)
+        results.update(download_batch_results(client, batch, pending))
+    return flatten_batch_results(results)
+
+
+# ── Submitted batches ──────────────────────────────
+class StoredBatch(NamedTuple):
+    batch_id: str
+    status: str
+    submitted_at: float
+    updated_at: float
+    # custom_id -> request context from prepare_batch, for download_batch_results.
+    pending: Dict[str, Dict]
+
+
+_initialized_paths: Set[str] = set()
+
+
+@contextmanager
+def _batches_db(path: str = BULK_BATCHES_PATH):
+    """Open the batch database, commit on success and always close."""
+    conn = _connect(path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _connect(path: str = BULK_BATCHES_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    if path not in _initialized_paths:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                submitted_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                collected_at REAL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS batch_files (
+                batch_id TEXT NOT NULL,
+                custom_id TEXT NOT NULL,
+                request TEXT NOT NULL,
+                PRIMARY KEY (batch_id, custom_id)
+            )
+            """
+        )
+        _initialized_paths.add(path)
+    return conn
+
+
+def record_batch(batch_id: str, pending: Dict[str, Dict], status: str = "validating", path: str = BULK_BATCHES_PATH) -> None:
+    """Remember a submitted batch and its requests (prepare_batch's `pending`)."""
+    now = time.time()
+    with _batches_db(path) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO batches (batch_id, status, submitted_at, updated_at) VALUES (?, ?, ?, ?)",
+            (batch_id, status, now, now),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO batch_files (batch_id, custom_id, request) VALUES (?, ?, ?)",
+            [(batch_id, custom_id, json.dumps(request, default=str)) for custom_id, request in pending.items()],
+        )
+
+
+def pending_batches(path: str = BULK_BATCHES_PATH) -> List[StoredBatch]:
+    """Submitted batches whose results have not been collected yet, oldest first."""
+    with _batches_db(path) as conn:
+        rows = conn.execute(
+            "SELECT batch_id, status, submitted_at, updated_at FROM batches WHERE collected_at IS NULL ORDER BY submitted_at"
+        ).fetchall()
+        files = conn.execute(
+            "SELECT batch_id, custom_id, request FROM batch_files WHERE batch_id IN "
+            "(SELECT batch_id FROM batches WHERE collected_at IS NULL) ORDER BY rowid"
+        ).fetchall()
+    requests: Dict[str, Dict[str, Dict]] = {}
+    for batch_id, custom_id, request in files:
+        requests.setdefault(batch_id, {})[custom_id] = json.loads(request)
+    return [StoredBatch(*row, pending=requests.get(row[0], {})) for row in rows]
+
+
+def update_batch_status(batch_id: str, status: str, collected: bool = False, path: str = BULK_BATCHES_PATH) -> None:
+    """Store the last seen status; `collected` retires the batch from `pending_batches`."""
+    now = time.time()
+    with _batches_db(path) as conn:
+        conn.execute(
+            "UPDATE batches SET status = ?, updated_at = ?, collected_at = ? WHERE batch_id = ?",
+            (status, now, now if collected else None, batch_id),
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Extract a folder of tenant application PDFs with the OpenAI Batch API.")
+    parser.add_argument("folder", help="Folder containing application PDFs")
+    parser.add_argument("--output", default="bulk_extracted.xlsx", help="Excel file for the flattened records")
+    parser.add_argument("--poll-interval", type=float, default=30.0)
+    parser.add_argument("--base-url", default=None, help="Alternative API base URL (e.g. a local fake batch server)")
+    args = parser.parse_args()
+
+    pdfs = sorted(str(p) for p in Path(args.folder).glob("*.pdf"))
+    print(f"📦 Preparing batch for {len(pdfs)} PDF(s)...")
+    records, errors = run_bulk_extraction(
+        pdfs,
+        client=make_openai_client(args.base_url),
+        poll_interval=args.poll_interval,
+        on_status=lambda b: print(f"   batch {b.id}: {b.status}"),
+    )
+    for custom_id, error in errors.items():
+        print(f"⚠️ {custom_id}: {error}")
+    if records:
+        pd.DataFrame([encode_for_excel(r) for r in records.values()]).to_excel(args.output, index=False)
+        print(f"✅ {len(records)} record(s) written to {os.path.abspath(args.output)}")
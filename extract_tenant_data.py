@@ -3,188 +3,480 @@ import io
 import json
 import re
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Callable, Iterable, List, Dict, NamedTuple, Tuple, Optional, Union
 import fitz  # PyMuPDF
 from PIL import Image
 import openai
 import streamlit as st
 from datetime import datetime
+from pdf_render import iter_page_images
+from pdf_document import PdfDocument, detect_form_type
+from settings import get_setting, get_int_setting
+from gpt_cache import GPT_CACHE_ENABLED, make_cache_key, get_cached_response, store_response
+from openai_scheduler import get_scheduler, estimate_request_tokens
+from model_cascade import MODEL_CASCADE_ENABLED, run_cascade
+from output_schema import (
+    STANDARD_FORM_RESPONSE_FORMAT,
+    STRUCTURED_OUTPUT_ENABLED,
+    parse_partial_json,
+    response_format_fingerprint,
+    spec_for_response_format,
+    strip_json_fences,
+    validate_gpt_json,
+)
 
 
 EXTRACTED_DATA_PATH = "Template_Data_Holder.xlsx"
 
-def extract_images_from_pdf(pdf_path: str | Path) -> List[Image.Image]:
+# Page images are encoded once, straight from the rendered pixels, in this
+# format. JPEG/WEBP payloads are a fraction of PNG size and cheaper to encode.
+GPT_IMAGE_FORMAT = str(get_setting("openai", "GPT_IMAGE_FORMAT", "JPEG")).upper()
+GPT_IMAGE_QUALITY = get_int_setting("openai", "GPT_IMAGE_QUALITY", 85)
+IMAGE_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+GPT_VISION_MODEL = get_setting("openai", "GPT_VISION_MODEL", "gpt-4o")
+
+def extract_images_from_pdf(
+    pdf_path: str | Path,
+    parallel: Optional[bool] = None,
+    max_workers: Optional[int] = None,
+) -> List[Image.Image]:
     """
     Convert all pages of a PDF into high-resolution PIL images.
 
     Args:
         pdf_path (str | Path): Path to the PDF file.
+        parallel (bool | None): Render pages in a process pool. None lets
+            `pdf_render.iter_page_images` decide based on page count.
+        max_workers (int | None): Number of render processes.
 
     Returns:
-        List[Image.Image]: List of PIL Image objects, one for each page.
+        List[Image.Image]: List of PIL Image objects, one for each page, in page order.
     
     Notes:
         - Uses 2x zoom scaling (~144 DPI) for higher quality suitable for OCR or GPT Vision.
         - Handles errors gracefully and prints diagnostic messages on failure.
         - Supports both str and Path types for `pdf_path`.
+        - `PdfDocument.iter_page_images` streams pages instead, for `encode_images`.
     """
-    images = []
+    pages = []
 
     try:
-        with fitz.open(pdf_path) as doc:
-            for page in doc:
-                # Define zoom factor for high-resolution rendering
-                zoom = 2.0  # 2x zoom gives ~144 DPI (sufficient for clean OCR)
-                mat = fitz.Matrix(zoom, zoom)
-
-                # Render page to pixmap (RGB colorspace)
-                pix = page.get_pixmap(matrix=mat, colorspace=fitz.csRGB)
-
-                # Convert raw pixmap bytes to a PIL image
-                img = Image.open(io.BytesIO(pix.tobytes("png")))
-                images.append(img)
+        for page_number, img in iter_page_images(pdf_path, parallel=parallel, max_workers=max_workers):
+            pages.append((page_number, img))
     except Exception as e:
         print(f"❌ Failed to extract images from PDF: {e}")
 
-    return images
+    return [img for _, img in sorted(pages, key=lambda p: p[0])]
+
+
+def encode_image_for_gpt(img: Image.Image, image_format: str | None = None, quality: int | None = None) -> str:
+    """
+    Encode a page image exactly once and return it as a base64 data URL.
+
+    Args:
+        img (Image.Image): Page image, built from pixmap samples by `pdf_render`.
+        image_format (str | None): "JPEG", "WEBP" or "PNG". Defaults to GPT_IMAGE_FORMAT.
+        quality (int | None): Lossy quality 1-100. Defaults to GPT_IMAGE_QUALITY.
+    """
+    image_format = (image_format or GPT_IMAGE_FORMAT).upper()
+    if image_format == "JPG":
+        image_format = "JPEG"
+    if image_format not in IMAGE_MIME_TYPES:
+        raise ValueError(f"Unsupported image format for GPT payload: {image_format}")
+
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    buf = io.BytesIO()
+    if image_format == "PNG":
+        img.save(buf, format="PNG")
+    else:
+        img.save(buf, format=image_format, quality=quality or GPT_IMAGE_QUALITY)
+    img_b64 = base64.b64encode(buf.getbuffer()).decode()
+    return f"data:{IMAGE_MIME_TYPES[image_format]};base64,{img_b64}"
+
+
+class EncodedImages(NamedTuple):
+    """Page images encoded for the GPT payload, in the order they are sent."""
+    parts: List[Dict]
+    sizes: List[Tuple[int, int]]
 
-    
-def call_gpt_vision_api(images: List[Image.Image]) -> Dict[str, str]:
-    try:
-        openai.api_key = st.secrets["openai"]["OPENAI_API_KEY"]
-    except Exception as key_err:
-        return {"error": f"Missing OpenAI API key: {key_err}"}
 
-    image_parts = []
-    for img in images:
+# Page images as accepted by the extraction calls: a list of images, a
+# stream of (index, image) pairs, or an already encoded payload.
+PageImages = Union[Iterable[Image.Image], Iterable[Tuple[int, Image.Image]], EncodedImages]
+
+
+def encode_images(images: PageImages, image_format: str | None = None, quality: int | None = None) -> EncodedImages:
+    """
+    Encode page images for the GPT payload.
+
+    `images` is a list of PIL images or an iterator of (index, image)
+    pairs such as `PdfDocument.iter_form_images()`. Pairs are encoded as
+    they arrive, while the render processes are still working on later
+    pages, and put in index order afterwards. Already encoded images are
+    returned unchanged.
+    """
+    if isinstance(images, EncodedImages):
+        return images
+    encoded = []
+    for position, item in enumerate(images):
+        index, img = item if isinstance(item, tuple) else (position, item)
         try:
-            buf = io.BytesIO()
-            img.save(buf, format="PNG")
-            img_b64 = base64.b64encode(buf.getvalue()).decode()
-            image_parts.append({
-                "type": "image_url",
-                "image_url": {"url": f"data:image/png;base64,{img_b64}"}
-            })
+            part = {"type": "image_url", "image_url": {"url": encode_image_for_gpt(img, image_format, quality)}}
+            encoded.append((index, part, img.size))
         except Exception as img_err:
             print(f"⚠️ Error encoding image: {img_err}")
-
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "Extract structured tenant application data and return a JSON object using the exact schema below. "
-                "All fields must be included, even if null. Do NOT add explanations.\n\n"
-                "**Required focus:** Extract accurately the following sections:\n"
-                "- C. Representation and Marketing\n"
-                "- Employment and Other Income\n"
-                "- E. Occupant Information\n"
-                "- F. Vehicle Information (must return as a list with Monthly Payment per vehicle)\n"
-                "- G. Animals (list if \"Will any animals be kept on the Property?\" is \"Yes\")\n"
-                "- Applicant's Current Address (must be a nested object with Address, Phone:Day, Landlord Name, Move-out Date, Reason for Move)\n"
-                "- Co-applicants: list all co-applicants with their Name and Relationship\n\n"
-                "Return only this JSON format:\n"
-                "{\n"
-                '  "Property Address": string | null,\n'
-                '  "Move-in Date": string | null,\n'
-                '  "Monthly Rent": string | null,\n'
-                '  "FullName": string | null,\n'
-                '  "PhoneNumber": string | null,\n'
-                '  "Email": string | null,\n'
-                '  "DOB": string | null,\n'
-                '  "SSN": string | null,\n'
-                '  "Co-applicants": [\n'
-                '    {"Name": string | null, "Relationship": string | null}\n'
-                '  ],\n'
-                '  "Applicant\'s Current Address": {\n'
-                '    "Address": string | null,\n'
-                '    "Phone:Day": string | null,\n'
-                '    "Landlord or Property Manager\'s Name": string | null,\n'
-                '    "Rent": string | null,\n'
-                '    "Move-out Date": string | null,\n'
-                '    "Reason for Move": string | null\n'
-                '  },\n'
-                '  "IDType": string | null,\n'
-                '  "DriverLicenseNumber": string | null,\n'
-                '  "IDIssuer": string | null,\n'
-                '  "Nationality": string | null,\n'
-                '  "FormSource": string | null,\n'
-                '  "ApplicationDate": string | null,\n'
-                '  "C.Representation and Marketing": {\n'
-                '    "Name": string | null,\n'
-                '    "Company": string | null,\n'
-                '    "E-mail": string | null,\n'
-                '    "Phone Number": string | null\n'
-                '  },\n'
-                '  "Employment and Other Income:": {\n'
-                '    "Applicant\'s Current Employer": string | null,\n'
-                '    "Current Employer Details": {\n'
-                '      "Employment Verification Contact": string | null,\n'
-                '      "Address": string | null,\n'
-                '      "Phone": string | null,\n'
-                '      "E-mail": string | null,\n'
-                '      "Position": string | null,\n'
-                '      "Start Date": string | null,\n'
-                '      "Gross Monthly Income": string | null\n'
-                '    },\n'
-                '    "Child Support": string | null\n'
-                '  },\n'
-                '  "E. Occupant Information": [\n'
-                '    {\n'
-                '      "Name": string | null,\n'
-                '      "Relationship": string | null,\n'
-                '      "DOB": string | null\n'
-                '    }\n'
-                '  ],\n'
-                '  "F. Vehicle Information:": [\n'
-                '    {\n'
-                '      "Type": string | null,\n'
-                '      "Year": string | null,\n'
-                '      "Make": string | null,\n'
-                '      "Model": string | null,\n'
-                '      "Monthly Payment": string | null\n'
-                '    }\n'
-                '  ],\n'
-                '  "G. Animals": [\n'
-                '    {\n'
-                '      "Type and Breed": string | null,\n'
-                '      "Name": string | null,\n'
-                '      "Color": string | null,\n'
-                '      "Weight": string | null,\n'
-                '      "Age in Yrs": string | null,\n'
-                '      "Gender": string | null\n'
-                '    }\n'
-                '  ]\n'
-                '}\n\n'
-                "Instruction for G. Animals: First, locate the question: 'Will any animals (dogs, cats, birds, reptiles, fish, other types of animals) be kept on the Property?'. "
-                "If the checkbox or answer is 'Yes', then go to the section that begins with: 'If yes, list all animals to be kept on the Property' and extract the following details for each animal:\n"
-                "- Type and Breed\n"
-                "- Name\n"
-                "- Color\n"
-                "- Weight\n"
-                "- Age in Yrs\n"
-                "- Gender\n\n"
-                "Return the results in the structured list format under the key 'G. Animals'. "
-                "If the checkbox or answer is 'No', return an empty list for 'G. Animals'."
-            )
-        },
+    encoded.sort(key=lambda e: e[0])
+    return EncodedImages([part for _, part, _ in encoded], [size for _, _, size in encoded])
+
+
+def build_image_parts(images: PageImages, image_format: str | None = None, quality: int | None = None) -> List[Dict]:
+    """Build the `image_url` message parts for page images (see `encode_images`)."""
+    return encode_images(images, image_format, quality).parts
+
+
+STANDARD_FORM_PROMPT = (
+    "Extract structured tenant application data and return a JSON object using the exact schema below. "
+    "All fields must be included, even if null. Do NOT add explanations.\n\n"
+    "**Required focus:** Extract accurately the following sections:\n"
+    "- C. Representation and Marketing\n"
+    "- Employment and Other Income\n"
+    "- E. Occupant Information\n"
+    "- F. Vehicle Information (must return as a list with Monthly Payment per vehicle)\n"
+    "- G. Animals (list if \"Will any animals be kept on the Property?\" is \"Yes\")\n"
+    "- Applicant's Current Address (must be a nested object with Address, Phone:Day, Landlord Name, Move-out Date, Reason for Move)\n"
+    "- Co-applicants: list all co-applicants with their Name and Relationship\n\n"
+    "Return only this JSON format:\n"
+    "{\n"
+    '  "Property Address": string | null,\n'
+    '  "Move-in Date": string | null,\n'
+    '  "Monthly Rent": string | null,\n'
+    '  "FullName": string | null,\n'
+    '  "PhoneNumber": string | null,\n'
+    '  "Email": string | null,\n'
+    '  "DOB": string | null,\n'
+    '  "SSN": string | null,\n'
+    '  "Co-applicants": [\n'
+    '    {"Name": string | null, "Relationship": string | null}\n'
+    '  ],\n'
+    '  "Applicant\'s Current Address": {\n'
+    '    "Address": string | null,\n'
+    '    "Phone:Day": string | null,\n'
+    '    "Landlord or Property Manager\'s Name": string | null,\n'
+    '    "Rent": string | null,\n'
+    '    "Move-out Date": string | null,\n'
+    '    "Reason for Move": string | null\n'
+    '  },\n'
+    '  "IDType": string | null,\n'
+    '  "DriverLicenseNumber": string | null,\n'
+    '  "IDIssuer": string | null,\n'
+    '  "Nationality": string | null,\n'
+    '  "FormSource": string | null,\n'
+    '  "ApplicationDate": string | null,\n'
+    '  "C.Representation and Marketing": {\n'
+    '    "Name": string | null,\n'
+    '    "Company": string | null,\n'
+    '    "E-mail": string | null,\n'
+    '    "Phone Number": string | null\n'
+    '  },\n'
+    '  "Employment and Other Income:": {\n'
+    '    "Applicant\'s Current Employer": string | null,\n'
+    '    "Current Employer Details": {\n'
+    '      "Employment Verification Contact": string | null,\n'
+    '      "Address": string | null,\n'
+    '      "Phone": string | null,\n'
+    '      "E-mail": string | null,\n'
+    '      "Position": string | null,\n'
+    '      "Start Date": string | null,\n'
+    '      "Gross Monthly Income": string | null\n'
+    '    },\n'
+    '    "Child Support": string | null\n'
+    '  },\n'
+    '  "E. Occupant Information": [\n'
+    '    {\n'
+    '      "Name": string | null,\n'
+    '      "Relationship": string | null,\n'
+    '      "DOB": string | null\n'
+    '    }\n'
+    '  ],\n'
+    '  "F. Vehicle Information:": [\n'
+    '    {\n'
+    '      "Type": string | null,\n'
+    '      "Year": string | null,\n'
+    '      "Make": string | null,\n'
+    '      "Model": string | null,\n'
+    '      "Monthly Payment": string | null\n'
+    '    }\n'
+    '  ],\n'
+    '  "G. Animals": [\n'
+    '    {\n'
+    '      "Type and Breed": string | null,\n'
+    '      "Name": string | null,\n'
+    '      "Color": string | null,\n'
+    '      "Weight": string | null,\n'
+    '      "Age in Yrs": string | null,\n'
+    '      "Gender": string | null\n'
+    '    }\n'
+    '  ]\n'
+    '}\n\n'
+    "Instruction for G. Animals: First, locate the question: 'Will any animals (dogs, cats, birds, reptiles, fish, other types of animals) be kept on the Property?'. "
+    "If the checkbox or answer is 'Yes', then go to the section that begins with: 'If yes, list all animals to be kept on the Property' and extract the following details for each animal:\n"
+    "- Type and Breed\n"
+    "- Name\n"
+    "- Color\n"
+    "- Weight\n"
+    "- Age in Yrs\n"
+    "- Gender\n\n"
+    "Return the results in the structured list format under the key 'G. Animals'. "
+    "If the checkbox or answer is 'No', return an empty list for 'G. Animals'."
+)
+
+
+def build_vision_messages(system_prompt: str, image_parts: List[Dict]) -> List[Dict]:
+    return [
+        {"role": "system", "content": system_prompt},
         {"role": "user", "content": image_parts}
     ]
 
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0,
-            max_tokens=1000,
-        )
-        if hasattr(response, "choices") and response.choices:
-            return {"GPT_Output": response.choices[0].message.content.strip()}
+
+# Sent when an answer stops at max_tokens, so the model picks up where it
+# left off instead of the whole application being extracted again.
+CONTINUE_PROMPT = "Continue the JSON exactly where you stopped. Output only the remaining characters."
+MAX_CONTINUATIONS = get_int_setting("openai", "GPT_MAX_CONTINUATIONS", 2)
+
+# Interactive extractions stream their answer so fields can be shown as
+# soon as the model writes them.
+GPT_STREAMING_ENABLED = str(get_setting("openai", "GPT_STREAMING_ENABLED", "true")).strip().lower() not in ("0", "false", "no", "off")
+
+
+class StreamedChoice(NamedTuple):
+    content: str
+    finish_reason: Optional[str]
+    refusal: Optional[str]
+
+
+def _read_streamed_choice(stream, prefix: str, on_partial: Callable[[Dict], None]) -> Tuple[StreamedChoice, Optional[int]]:
+    """
+    Consume a streamed completion, reporting newly completed top-level
+    fields of the JSON answer (`prefix` + text so far) as they arrive.
+
+    Returns the choice and the total tokens from the trailing usage chunk
+    (requested with `stream_options={"include_usage": True}`), in the shape
+    `RateLimitScheduler.call_stream` expects.
+    """
+    pieces, refusal_pieces = [], []
+    finish_reason = None
+    total_tokens = None
+    reported = 0
+    for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            total_tokens = chunk.usage.total_tokens
+        if not chunk.choices:
+            continue  # the trailing usage chunk
+        choice = chunk.choices[0]
+        delta = choice.delta
+        if getattr(delta, "refusal", None):
+            refusal_pieces.append(delta.refusal)
+        if delta.content:
+            pieces.append(delta.content)
+            fields = parse_partial_json(prefix + "".join(pieces))
+            if len(fields) > reported:
+                reported = len(fields)
+                on_partial(fields)
+        if choice.finish_reason:
+            finish_reason = choice.finish_reason
+    return StreamedChoice("".join(pieces), finish_reason, "".join(refusal_pieces) or None), total_tokens
+
+
+def _complete_with_continuation(
+    messages: List[Dict],
+    model: str,
+    max_tokens: int,
+    estimated_tokens: int,
+    response_format: Optional[Dict] = None,
+    on_partial: Optional[Callable[[Dict], None]] = None,
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Run a chat completion, continuing it while it is cut off by max_tokens.
+
+    Only the first request carries `response_format`; continuations return
+    the rest of the same JSON text, which a schema would reject. With
+    `on_partial` the answer is streamed (see `_read_streamed_choice`).
+
+    Returns (content, error); content is None when no choices came back.
+    """
+    messages = list(messages)
+    pieces = []
+    stream = on_partial is not None and GPT_STREAMING_ENABLED
+    for attempt in range(MAX_CONTINUATIONS + 1):
+        options = {"response_format": response_format} if response_format and attempt == 0 else {}
+        request = dict(model=model, messages=messages, temperature=0, max_tokens=max_tokens, **options)
+        if stream:
+            # Read inside the scheduler so mid-stream failures are retried
+            # and the usage chunk is charged back to the token budget.
+            prefix = "".join(pieces)
+            piece, finish_reason, refusal = get_scheduler().call_stream(
+                openai.chat.completions.create,
+                estimated_tokens,
+                lambda response: _read_streamed_choice(response, prefix, on_partial),
+                stream=True,
+                stream_options={"include_usage": True},
+                **request,
+            )
+            if finish_reason is None and not piece:
+                return None, "No GPT choices returned"
         else:
-            return {"error": "No GPT choices returned"}
+            response = get_scheduler().call(openai.chat.completions.create, estimated_tokens, **request)
+            if not (hasattr(response, "choices") and response.choices):
+                return None, "No GPT choices returned"
+            choice = response.choices[0]
+            piece, finish_reason, refusal = choice.message.content or "", choice.finish_reason, getattr(choice.message, "refusal", None)
+        if refusal:
+            return None, f"GPT refused the request: {refusal}"
+        pieces.append(piece)
+        if finish_reason != "length":
+            return "".join(pieces).strip(), None
+        print(f"⚠️ GPT answer truncated at {max_tokens} tokens, continuing ({attempt + 1}/{MAX_CONTINUATIONS})")
+        messages += [{"role": "assistant", "content": piece}, {"role": "user", "content": CONTINUE_PROMPT}]
+    return "".join(pieces).strip(), None
+
+
+def run_vision_completion(
+    system_prompt: str,
+    images: PageImages,
+    model: str = GPT_VISION_MODEL,
+    image_format: str | None = None,
+    quality: int | None = None,
+    use_cache: bool = True,
+    max_tokens: int = 1000,
+    response_format: Optional[Dict] = None,
+    on_partial: Optional[Callable[[Dict], None]] = None,
+) -> Dict[str, str]:
+    """
+    Send page images with a system prompt to the vision model.
+
+    Returns {"GPT_Output": text} on success (plus "cache_hit": True when the
+    answer came from the response cache) or {"error": message}. The call
+    goes through the shared rate-limit scheduler, so 429s and timeouts are
+    retried before an error is returned.
+
+    Args:
+        use_cache (bool): Look the request up in the response cache first.
+            Passing False bypasses the lookup; the fresh answer is still stored.
+        response_format (dict | None): One of the `output_schema` response
+            formats. The answer is then requested as structured output (unless
+            STRUCTURED_OUTPUT_ENABLED is off), continued if it hits
+            max_tokens, and validated against the schema. GPT_Output is the
+            validated record as plain JSON; answers that are not JSON at all
+            are reported as errors and not cached.
+        on_partial (callable | None): Stream the answer and call
+            on_partial(fields) whenever more top-level fields are complete.
+            Called from the calling thread; a cached answer is reported once.
+    """
+    try:
+        openai.api_key = get_setting("openai", "OPENAI_API_KEY")
+        if not openai.api_key:
+            raise KeyError("OPENAI_API_KEY")
+        # Retries and backoff are handled by openai_scheduler.
+        openai.max_retries = 0
+    except Exception as key_err:
+        return {"error": f"Missing OpenAI API key: {key_err}"}
+
+    encoded = encode_images(images, image_format, quality)
+    image_parts = encoded.parts
+    messages = build_vision_messages(system_prompt, image_parts)
+    spec = spec_for_response_format(response_format)
+    request_format = response_format if STRUCTURED_OUTPUT_ENABLED else None
+
+    cache_key = None
+    if GPT_CACHE_ENABLED:
+        options = {"max_tokens": max_tokens}
+        if request_format:
+            options["response_format"] = response_format_fingerprint(request_format)
+        cache_key = make_cache_key(model, system_prompt, image_parts, **options)
+        if use_cache:
+            cached = get_cached_response(cache_key)
+            if cached is not None:
+                if on_partial:
+                    on_partial(parse_partial_json(cached))
+                return {"GPT_Output": cached, "cache_hit": True}
+
+    try:
+        estimated_tokens = estimate_request_tokens(system_prompt, encoded.sizes, max_tokens)
+        content, error = _complete_with_continuation(messages, model, max_tokens, estimated_tokens, request_format, on_partial)
+        if error:
+            return {"error": error}
+        if spec is not None:
+            record, problems = validate_gpt_json(content, spec)
+            if record is None:
+                return {"error": f"GPT output failed schema validation: {'; '.join(problems)}"}
+            if problems:
+                print(f"⚠️ GPT output repaired to match schema: {'; '.join(problems[:5])}")
+            content = json.dumps(record)
+        if cache_key:
+            store_response(cache_key, model, content)
+        return {"GPT_Output": content}
     except Exception as exc:
         return {"error": str(exc)}
 
 
+def run_extraction(
+    system_prompt: str,
+    images: PageImages,
+    image_format: str | None = None,
+    quality: int | None = None,
+    use_cache: bool = True,
+    response_format: Optional[Dict] = None,
+    on_partial: Optional[Callable[[Dict], None]] = None,
+) -> Dict[str, str]:
+    """
+    Extract one application, through the model cascade when
+    MODEL_CASCADE_ENABLED is set (see `model_cascade.run_cascade`), otherwise
+    with GPT_VISION_MODEL alone.
+
+    `images` may be a stream of (index, image) pairs; it is encoded once
+    here, as pages arrive, and the encoded payload is reused by every
+    model the cascade tries.
+    """
+    images = encode_images(images, image_format, quality)
+
+    def complete(model: str) -> Dict[str, str]:
+        return run_vision_completion(
+            system_prompt,
+            images,
+            model=model,
+            image_format=image_format,
+            quality=quality,
+            use_cache=use_cache,
+            response_format=response_format,
+            on_partial=on_partial,
+        )
+
+    if MODEL_CASCADE_ENABLED:
+        return run_cascade(complete, GPT_VISION_MODEL)
+    return complete(GPT_VISION_MODEL)
+
+
+def call_gpt_vision_api(
+    images: PageImages,
+    image_format: str | None = None,
+    quality: int | None = None,
+    use_cache: bool = True,
+    on_partial: Optional[Callable[[Dict], None]] = None,
+) -> Dict[str, str]:
+    return run_extraction(
+        STANDARD_FORM_PROMPT,
+        images,
+        image_format=image_format,
+        quality=quality,
+        use_cache=use_cache,
+        response_format=STANDARD_FORM_RESPONSE_FORMAT,
+        on_partial=on_partial,
+    )
+
+
 def extract_text_from_first_page(pdf_path: str | Path) -> str:
     try:
         with fitz.open(pdf_path) as doc:
@@ -192,31 +484,19 @@ def extract_text_from_first_page(pdf_path: str | Path) -> str:
     except Exception:
         return ""
 
-def detect_form_type(text: str, ocr_used: bool = False) -> str:
-    if ocr_used:
-        return "handwritten_form"
-    if "05-15-24" in text or "07-08-22" in text:
-        return "standard_form"
-    elif "2-1-18" in text or "Declawed?" in text:
-        return "handwritten_form"
-    return "unknown"
-
 def call_handwritten_prompt(images: List[Image.Image]) -> Dict[str, str]:
     # For now, reuse the same prompt as standard
     return call_gpt_vision_api(images)
 
-def process_pdf(pdf_path: str | Path) -> Tuple[Dict[str, str], Dict]:
-    images = extract_images_from_pdf(pdf_path)
-    text = extract_text_from_first_page(pdf_path)
-
-    form_type = detect_form_type(text)
-
-    if form_type == "standard_form":
-        return call_gpt_vision_api(images), {}
-    elif form_type == "handwritten_form":
-        return call_handwritten_prompt(images), {}
-    else:
-        return {"error": "Unsupported or unknown form type"}, {}
+def process_pdf(pdf_path: str | Path | bytes) -> Tuple[Dict[str, str], Dict]:
+    with PdfDocument(pdf_path) as doc:
+        form_type = detect_form_type(doc.first_page_text)
+        if form_type not in ("standard_form", "handwritten_form"):
+            return {"error": "Unsupported or unknown form type"}, {}
+        # Pages are encoded as they finish rendering.
+        if form_type == "standard_form":
+            return call_gpt_vision_api(doc.iter_page_images()), {}
+        return call_handwritten_prompt(doc.iter_page_images()), {}
 
 def parse_gpt_output(form_data: Dict[str, str | None]) -> Dict:
     raw = (form_data.get("GPT_Output") or "").strip()
@@ -429,13 +709,8 @@ def flatten_extracted_data(data: Dict) -> Dict[str, str]:
 
    
 def parse_gpt_output(form_data):
-    raw = form_data.get("GPT_Output", "").strip()
-
-    # Remove markdown formatting if present
-    if raw.startswith("```json"):
-        raw = raw[7:]
-    if raw.endswith("```"):
-        raw = raw[:-3]
+    # Structured output is plain JSON; older cached answers may be fenced.
+    raw = strip_json_fences(form_data.get("GPT_Output") or "")
 
     try:
         parsed = json.loads(raw)
@@ -1,118 +1,100 @@
-import openai
-import base64
-import io
-import streamlit as st
-from typing import Tuple, Dict, List
+import json
+from typing import Callable, Tuple, Dict, Optional
 from pathlib import Path
 import fitz  # PyMuPDF
-from PIL import Image
-from extract_tenant_data import extract_images_from_pdf, call_gpt_vision_api
+from extract_tenant_data import PageImages, call_gpt_vision_api, run_extraction
+from form_text_layer import merge_with_gpt_output
+from output_schema import HANDWRITTEN_FORM_RESPONSE_FORMAT
+from pdf_document import PdfDocument, detect_form_type
 
 
 # === Handwritten Form GPT Prompt Wrapper ===
-def call_handwritten_prompt(images: List[Image.Image]) -> Dict[str, str]:
-    try:
-        openai.api_key = st.secrets["openai"]["OPENAI_API_KEY"]
-    except Exception as e:
-        return {"error": f"Missing or invalid OpenAI API key: {e}"}
-
-    image_parts = []
-    for img in images:
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        img_b64 = base64.b64encode(buf.getvalue()).decode()
-        image_parts.append({
-            "type": "image_url",
-            "image_url": {"url": f"data:image/png;base64,{img_b64}"}
-        })
-
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "Extract structured tenant application data and return a JSON object using the schema below. "
-                "This form is a handwritten TXR-2003 (2-1-18) residential lease application. "
-                "You must interpret handwriting accurately and include all fields even if they appear blank. Do NOT add any explanations.\n\n"
-                "**Focus areas to extract:**\n"
-                "- Property Address, Move-in Date, Monthly Rent, Security Deposit\n"
-                "- Applicant Info: Full Name, Email, Phone, SSN, DOB, DL No., Issuer, Nationality\n"
-                "- Co-Applicants and Occupants: Name, Relationship, Age, DOB\n"
-                "- Current Address block (with Phone:Day, Landlord Name, Rent)\n"
-                "- Employment section (Employer name, Supervisor, Contact, Position, Start Date, Income)\n"
-                "- Previous Employment (if listed)\n"
-                "- Vehicle Information: list of vehicles with Type, Year, Make, Model, Monthly Payment\n"
-                "- Animal Information: Extract only if 'Will any pets...?' is checked Yes. List Type, Name, Color, Weight, Age, Gender\n"
-                "- C. Representation and Marketing (Agent name, email, phone)\n"
-                "- Application Date (signature date on last page)\n\n"
-                "Return in this JSON schema:\n"
-                "{\n"
-                '  "Property Address": string | null,\n'
-                '  "Move-in Date": string | null,\n'
-                '  "Monthly Rent": string | null,\n'
-                '  "FullName": string | null,\n'
-                '  "PhoneNumber": string | null,\n'
-                '  "Email": string | null,\n'
-                '  "DOB": string | null,\n'
-                '  "SSN": string | null,\n'
-                '  "Co-applicants": [ {"Name": string | null, "Relationship": string | null} ],\n'
-                '  "Applicant\'s Current Address": {\n'
-                '    "Address": string | null,\n'
-                '    "Phone:Day": string | null,\n'
-                '    "Landlord or Property Manager\'s Name": string | null,\n'
-                '    "Rent": string | null\n'
-                '  },\n'
-                '  "IDType": string | null,\n'
-                '  "DriverLicenseNumber": string | null,\n'
-                '  "IDIssuer": string | null,\n'
-                '  "Nationality": string | null,\n'
-                '  "FormSource": "TXR-2003 (2-1-18)",\n'
-                '  "ApplicationDate": string | null,\n'
-                '  "C.Representation and Marketing": {\n'
-                '    "Name": string | null,\n'
-                '    "Company": string | null,\n'
-                '    "E-mail": string | null,\n'
-                '    "Phone Number": string | null\n'
-                '  },\n'
-                '  "Employment and Other Income:": {\n'
-                '    "Applicant\'s Current Employer": string | null,\n'
-                '    "Current Employer Details": {\n'
-                '      "Employment Verification Contact": string | null,\n'
-                '      "Address": string | null,\n'
-                '      "Phone": string | null,\n'
-                '      "E-mail": string | null,\n'
-                '      "Position": string | null,\n'
-                '      "Start Date": string | null,\n'
-                '      "Gross Monthly Income": string | null\n'
-                '    },\n'
-                '    "Child Support": null\n'
-                '  },\n'
-                '  "E. Occupant Information": [ {"Name": string | null, "Relationship": string | null, "DOB": string | null} ],\n'
-                '  "F. Vehicle Information:": [ {"Type": string | null, "Year": string | null, "Make": string | null, "Model": string | null, "Monthly Payment": string | null} ],\n'
-                '  "G. Animals": [ {"Type and Breed": string | null, "Name": string | null, "Color": string | null, "Weight": string | null, "Age in Yrs": string | null, "Gender": string | null} ]\n'
-                "}"
-            )
-        },
-        {"role": "user", "content": image_parts}
-    ]
-
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0,
-            max_tokens=1000,
-        )
-        if hasattr(response, "choices") and response.choices:
-            return {"GPT_Output": response.choices[0].message.content.strip()}
-        else:
-            return {"error": "No choices returned by GPT"}
-    except Exception as e:
-        return {"error": str(e)}
+HANDWRITTEN_FORM_PROMPT = (
+    "Extract structured tenant application data and return a JSON object using the schema below. "
+    "This form is a handwritten TXR-2003 (2-1-18) residential lease application. "
+    "You must interpret handwriting accurately and include all fields even if they appear blank. Do NOT add any explanations.\n\n"
+    "**Focus areas to extract:**\n"
+    "- Property Address, Move-in Date, Monthly Rent, Security Deposit\n"
+    "- Applicant Info: Full Name, Email, Phone, SSN, DOB, DL No., Issuer, Nationality\n"
+    "- Co-Applicants and Occupants: Name, Relationship, Age, DOB\n"
+    "- Current Address block (with Phone:Day, Landlord Name, Rent)\n"
+    "- Employment section (Employer name, Supervisor, Contact, Position, Start Date, Income)\n"
+    "- Previous Employment (if listed)\n"
+    "- Vehicle Information: list of vehicles with Type, Year, Make, Model, Monthly Payment\n"
+    "- Animal Information: Extract only if 'Will any pets...?' is checked Yes. List Type, Name, Color, Weight, Age, Gender\n"
+    "- C. Representation and Marketing (Agent name, email, phone)\n"
+    "- Application Date (signature date on last page)\n\n"
+    "Return in this JSON schema:\n"
+    "{\n"
+    '  "Property Address": string | null,\n'
+    '  "Move-in Date": string | null,\n'
+    '  "Monthly Rent": string | null,\n'
+    '  "FullName": string | null,\n'
+    '  "PhoneNumber": string | null,\n'
+    '  "Email": string | null,\n'
+    '  "DOB": string | null,\n'
+    '  "SSN": string | null,\n'
+    '  "Co-applicants": [ {"Name": string | null, "Relationship": string | null} ],\n'
+    '  "Applicant\'s Current Address": {\n'
+    '    "Address": string | null,\n'
+    '    "Phone:Day": string | null,\n'
+    '    "Landlord or Property Manager\'s Name": string | null,\n'
+    '    "Rent": string | null\n'
+    '  },\n'
+    '  "IDType": string | null,\n'
+    '  "DriverLicenseNumber": string | null,\n'
+    '  "IDIssuer": string | null,\n'
+    '  "Nationality": string | null,\n'
+    '  "FormSource": "TXR-2003 (2-1-18)",\n'
+    '  "ApplicationDate": string | null,\n'
+    '  "C.Representation and Marketing": {\n'
+    '    "Name": string | null,\n'
+    '    "Company": string | null,\n'
+    '    "E-mail": string | null,\n'
+    '    "Phone Number": string | null\n'
+    '  },\n'
+    '  "Employment and Other Income:": {\n'
+    '    "Applicant\'s Current Employer": string | null,\n'
+    '    "Current Employer Details": {\n'
+    '      "Employment Verification Contact": string | null,\n'
+    '      "Address": string | null,\n'
+    '      "Phone": string | null,\n'
+    '      "E-mail": string | null,\n'
+    '      "Position": string | null,\n'
+    '      "Start Date": string | null,\n'
+    '      "Gross Monthly Income": string | null\n'
+    '    },\n'
+    '    "Child Support": null\n'
+    '  },\n'
+    '  "E. Occupant Information": [ {"Name": string | null, "Relationship": string | null, "DOB": string | null} ],\n'
+    '  "F. Vehicle Information:": [ {"Type": string | null, "Year": string | null, "Make": string | null, "Model": string | null, "Monthly Payment": string | null} ],\n'
+    '  "G. Animals": [ {"Type and Breed": string | null, "Name": string | null, "Color": string | null, "Weight": string | null, "Age in Yrs": string | null, "Gender": string | null} ]\n'
+    "}"
+)
+
+
+def call_handwritten_prompt(
+    images: PageImages,
+    image_format: str | None = None,
+    quality: int | None = None,
+    use_cache: bool = True,
+    on_partial: Optional[Callable[[Dict], None]] = None,
+) -> Dict[str, str]:
+    return run_extraction(
+        HANDWRITTEN_FORM_PROMPT,
+        images,
+        image_format=image_format,
+        quality=quality,
+        use_cache=use_cache,
+        response_format=HANDWRITTEN_FORM_RESPONSE_FORMAT,
+        on_partial=on_partial,
+    )
 
 
 # === Other Utilities ===
 
 def extract_text_from_first_page(pdf_path: Path) -> str:
+    """First-page text for a PDF path. Prefer `PdfDocument.first_page_text` when the PDF is already open."""
     try:
         with fitz.open(pdf_path) as doc:
             return doc[0].get_text().strip()
@@ -121,41 +103,72 @@ def extract_text_from_first_page(pdf_path: Path) -> str:
         return ""
 
 
-def detect_form_type(text: str, ocr_used: bool = False) -> str:
-    if ocr_used:
-        return "handwritten_form"
-    if "05-15-24" in text or "07-08-22" in text:
-        return "standard_form"
-    elif "2-1-18" in text or "Declawed?" in text:
-        return "handwritten_form"
-    return "unknown"
+def extract_standard_form_text_layer(doc: PdfDocument) -> Tuple[Dict[str, str] | None, Dict | None]:
+    """
+    Fast path for fillable standard forms.
+
+    Returns (result, None) when the form widgets alone fill every required
+    field, otherwise (None, partial_record) so the caller can fall back to
+    GPT and merge the partial record via `extract_standard_form`.
+    """
+    record, missing = doc.read_text_layer()
+    if record is not None and not missing:
+        return {"GPT_Output": json.dumps(record), "source": "text_layer"}, None
+    return None, record
 
 
-def extract_standard_form(images: List[Image.Image]) -> Dict[str, str]:
+def extract_standard_form(
+    images: PageImages,
+    use_cache: bool = True,
+    text_layer_record: Dict | None = None,
+    on_partial: Optional[Callable[[Dict], None]] = None,
+) -> Dict[str, str]:
     try:
-        return call_gpt_vision_api(images)
+        result = call_gpt_vision_api(images, use_cache=use_cache, on_partial=on_partial)
+        if text_layer_record:
+            result = merge_with_gpt_output(text_layer_record, result)
+        return result
     except Exception as e:
         return {"error": f"Standard form extraction failed: {e}"}
 
 
-def extract_handwritten_form(images: List[Image.Image]) -> Dict[str, str]:
+def extract_handwritten_form(
+    images: PageImages,
+    use_cache: bool = True,
+    on_partial: Optional[Callable[[Dict], None]] = None,
+) -> Dict[str, str]:
     try:
-        return call_handwritten_prompt(images)
+        return call_handwritten_prompt(images, use_cache=use_cache, on_partial=on_partial)
     except Exception as e:
         return {"error": f"Handwritten form extraction failed: {e}"}
 
 
+def extract_from_document(
+    doc: PdfDocument,
+    use_cache: bool = True,
+    on_partial: Optional[Callable[[Dict], None]] = None,
+) -> Dict[str, str]:
+    """
+    Route an opened application PDF to the right extractor.
+
+    Filled AcroForms are read directly; pages are only rendered when GPT has
+    to supply fields the widgets left empty. `on_partial` receives fields
+    as the GPT answer streams in.
+    """
+    form_type = doc.form_type
+    if form_type == "standard_form":
+        fast_result, text_layer_record = extract_standard_form_text_layer(doc)
+        if fast_result:
+            return fast_result
+        return extract_standard_form(doc.iter_form_images(), use_cache=use_cache, text_layer_record=text_layer_record, on_partial=on_partial)
+    elif form_type == "handwritten_form":
+        return extract_handwritten_form(doc.iter_form_images(), use_cache=use_cache, on_partial=on_partial)
+    return {"error": f"Unsupported or unknown form type: {form_type}"}
+
+
 def extract_data_by_form_type(pdf_path: Path) -> Tuple[Dict[str, str], Dict]:
     try:
-        images = extract_images_from_pdf(pdf_path)
-        text = extract_text_from_first_page(pdf_path)
-        form_type = detect_form_type(text)
-
-        if form_type == "standard_form":
-            return extract_standard_form(images), {}
-        elif form_type == "handwritten_form":
-            return extract_handwritten_form(images), {}
-        else:
-            return {"error": f"Unsupported or unknown form type: {form_type}"}, {}
+        with PdfDocument(pdf_path) as doc:
+            return extract_from_document(doc), {}
     except Exception as e:
         return {"error": f"extract_data_by_form_type failed: {e}"}, {}
@@ -0,0 +1,388 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from extraction_pipeline import DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT, extract_uploaded_pdf
+from settings import get_setting, get_int_setting
+
+# Background extraction jobs. The Streamlit script only submits a job and
+# polls its status, so reruns, tab switches and browser disconnects no
+# longer abort or repeat an extraction. Files run on one thread pool shared
+# by every session; each job keeps at most its own `max_workers` files in
+# flight, so concurrent jobs interleave instead of queueing behind each
+# other. Job progress and every file's extractor result are stored in
+# SQLite as files finish. The uploaded PDF bytes live only in memory, so a
+# job can only finish in the process that accepted it. Each job records
+# that process (host and PID) and a heartbeat the process keeps renewing;
+# jobs whose owner has exited, or whose heartbeat lapsed, are marked
+# "interrupted" when they are next read. Several Streamlit or CLI
+# processes can share the database without touching each other's jobs.
+
+EXTRACTION_JOBS_PATH = get_setting("app", "EXTRACTION_JOBS_PATH", "data/extraction_jobs.sqlite3")
+# Threads shared by all jobs in this process.
+EXTRACTION_JOB_THREADS = get_int_setting("app", "EXTRACTION_JOB_THREADS", MAX_WORKERS_LIMIT)
+EXTRACTION_JOB_RETENTION_DAYS = get_int_setting("app", "EXTRACTION_JOB_RETENTION_DAYS", 7)
+# A job whose heartbeat is older than this is considered abandoned.
+EXTRACTION_JOB_LEASE_SECONDS = get_int_setting("app", "EXTRACTION_JOB_LEASE_SECONDS", 120)
+HEARTBEAT_SECONDS = max(1.0, EXTRACTION_JOB_LEASE_SECONDS / 4)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_CANCELLED = "cancelled"
+JOB_INTERRUPTED = "interrupted"
+FINISHED_JOB_STATUSES = {JOB_DONE, JOB_CANCELLED, JOB_INTERRUPTED}
+
+FILE_ERROR = "error"
+
+
+class JobStatus(NamedTuple):
+    job_id: str
+    status: str
+    total: int
+    done: int  # files finished, successfully or not
+    failed: int
+    created_at: float
+    updated_at: float
+    running_files: List[str]
+    # filename -> top-level fields streamed so far, for files still running.
+    partials: Dict[str, Dict]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_JOB_STATUSES
+
+
+class _JobRun:
+    """In-memory state of a job this process is executing."""
+
+    def __init__(self, job_id: str, files: List[Tuple[int, str, bytes]], max_workers: int, use_cache: bool, path: str):
+        self.job_id = job_id
+        self.pending: Deque[Tuple[int, str, bytes]] = deque(files)
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        self.path = path
+        self.in_flight = 0
+        self.cancelled = threading.Event()
+        self.partials: Dict[str, Dict] = {}
+
+
+_runs: Dict[str, _JobRun] = {}
+_runs_lock = threading.Lock()
+_job_pool: Optional[ThreadPoolExecutor] = None
+_heartbeat_thread: Optional[threading.Thread] = None
+_migrated_paths: Set[str] = set()
+
+
+def _owner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+@contextmanager
+def _jobs_db(path: str = EXTRACTION_JOBS_PATH):
+    """Open the jobs database, commit on success and always close."""
+    conn = _connect(path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _connect(path: str = EXTRACTION_JOBS_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            use_cache INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            owner TEXT,
+            heartbeat_at REAL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS job_files (
+            job_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT,
+            seconds REAL,
+            PRIMARY KEY (job_id, position)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at)")
+    if path not in _migrated_paths:
+        # Databases created before jobs had owners.
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        _migrated_paths.add(path)
+    return conn
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def _owner_is_gone(owner: Optional[str], heartbeat_at: Optional[float], now: float) -> bool:
+    if owner == _owner_id():
+        return False
+    if heartbeat_at is None or now - heartbeat_at > EXTRACTION_JOB_LEASE_SECONDS:
+        return True
+    host, _, pid = (owner or "").rpartition(":")
+    # On the same host an exited owner is noticed without waiting for the lease.
+    return host == socket.gethostname() and pid.isdigit() and not _pid_alive(int(pid))
+
+
+def _recover_interrupted_jobs(conn: sqlite3.Connection) -> None:
+    """Mark unfinished jobs whose owning process is gone as interrupted."""
+    now = time.time()
+    rows = conn.execute(
+        "SELECT job_id, owner, heartbeat_at FROM jobs WHERE status IN (?, ?)", (JOB_QUEUED, JOB_RUNNING)
+    ).fetchall()
+    abandoned = [job_id for job_id, owner, heartbeat_at in rows if _owner_is_gone(owner, heartbeat_at, now)]
+    if not abandoned:
+        return
+    placeholders = ",".join("?" * len(abandoned))
+    with conn:
+        conn.execute(
+            f"UPDATE job_files SET status = ? WHERE status IN (?, ?) AND job_id IN ({placeholders})",
+            (JOB_INTERRUPTED, JOB_QUEUED, JOB_RUNNING, *abandoned),
+        )
+        # Re-checks the status so a job that just finished is left alone.
+        conn.execute(
+            f"UPDATE jobs SET status = ?, updated_at = ? WHERE status IN (?, ?) AND job_id IN ({placeholders})",
+            (JOB_INTERRUPTED, now, JOB_QUEUED, JOB_RUNNING, *abandoned),
+        )
+
+
+def _heartbeat_loop() -> None:
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        with _runs_lock:
+            by_path: Dict[str, List[str]] = {}
+            for job_id, run in _runs.items():
+                by_path.setdefault(run.path, []).append(job_id)
+        for path, job_ids in by_path.items():
+            try:
+                with _jobs_db(path) as conn:
+                    conn.execute(
+                        f"UPDATE jobs SET heartbeat_at = ? WHERE job_id IN ({','.join('?' * len(job_ids))})",
+                        (time.time(), *job_ids),
+                    )
+            except Exception as e:
+                print(f"⚠️ Extraction job heartbeat failed: {e}")
+
+
+def _get_job_pool() -> ThreadPoolExecutor:
+    global _job_pool, _heartbeat_thread
+    with _runs_lock:
+        if _job_pool is None:
+            _job_pool = ThreadPoolExecutor(max_workers=max(1, EXTRACTION_JOB_THREADS), thread_name_prefix="extract-job")
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="extract-job-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+        return _job_pool
+
+
+def submit_extraction_job(
+    files: Iterable[Tuple[str, bytes]],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    use_cache: bool = True,
+    path: str = EXTRACTION_JOBS_PATH,
+) -> str:
+    """
+    Queue (filename, pdf_bytes) pairs for extraction and return the job id
+    at once. Read the uploads in the calling thread; the bytes are handed
+    to the workers.
+    """
+    files = list(files)
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    max_workers = max(1, min(int(max_workers or 1), MAX_WORKERS_LIMIT))
+
+    with _jobs_db(path) as conn:
+        conn.execute(
+            "DELETE FROM job_files WHERE job_id IN (SELECT job_id FROM jobs WHERE created_at < ? AND status IN (?, ?, ?))",
+            (now - EXTRACTION_JOB_RETENTION_DAYS * 86400, *FINISHED_JOB_STATUSES),
+        )
+        conn.execute(
+            "DELETE FROM jobs WHERE created_at < ? AND status IN (?, ?, ?)",
+            (now - EXTRACTION_JOB_RETENTION_DAYS * 86400, *FINISHED_JOB_STATUSES),
+        )
+        conn.execute(
+            "INSERT INTO jobs (job_id, status, total, use_cache, created_at, updated_at, owner, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, JOB_QUEUED if files else JOB_DONE, len(files), int(use_cache), now, now, _owner_id(), now),
+        )
+        conn.executemany(
+            "INSERT INTO job_files (job_id, position, filename, status) VALUES (?, ?, ?, ?)",
+            [(job_id, i, name, JOB_QUEUED) for i, (name, _) in enumerate(files)],
+        )
+
+    if files:
+        run = _JobRun(job_id, [(i, name, data) for i, (name, data) in enumerate(files)], max_workers, use_cache, path)
+        with _runs_lock:
+            _runs[job_id] = run
+        _dispatch(run)
+    return job_id
+
+
+def _dispatch(run: _JobRun) -> None:
+    """Start files of `run` until it has `max_workers` in flight."""
+    pool = _get_job_pool()
+    with _runs_lock:
+        while run.pending and run.in_flight < run.max_workers and not run.cancelled.is_set():
+            run.in_flight += 1
+            pool.submit(_run_file, run, *run.pending.popleft())
+
+
+def _run_file(run: _JobRun, position: int, filename: str, pdf_bytes: bytes) -> None:
+    start = time.time()
+    try:
+        with _jobs_db(run.path) as conn:
+            conn.execute("UPDATE job_files SET status = ? WHERE job_id = ? AND position = ?", (JOB_RUNNING, run.job_id, position))
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, heartbeat_at = ? WHERE job_id = ? AND status = ?",
+                (JOB_RUNNING, start, start, run.job_id, JOB_QUEUED),
+            )
+
+        result = extract_uploaded_pdf(
+            filename,
+            pdf_bytes,
+            use_cache=run.use_cache,
+            on_partial=lambda fields: run.partials.__setitem__(filename, fields),
+        )
+        failed = "error" in result
+        with _jobs_db(run.path) as conn:
+            conn.execute(
+                "UPDATE job_files SET status = ?, result = ?, seconds = ? WHERE job_id = ? AND position = ?",
+                (FILE_ERROR if failed else JOB_DONE, json.dumps(result, default=str), time.time() - start, run.job_id, position),
+            )
+            conn.execute(
+                "UPDATE jobs SET done = done + 1, failed = failed + ?, updated_at = ? WHERE job_id = ?",
+                (int(failed), time.time(), run.job_id),
+            )
+    except Exception as e:
+        print(f"❌ Extraction job {run.job_id} failed on {filename}: {e}")
+        # Record the failure so the file does not stay "running" and the
+        # job's counts still add up to its total.
+        try:
+            with _jobs_db(run.path) as conn:
+                conn.execute(
+                    "UPDATE job_files SET status = ?, result = ?, seconds = ? WHERE job_id = ? AND position = ?",
+                    (FILE_ERROR, json.dumps({"error": str(e)}), time.time() - start, run.job_id, position),
+                )
+                conn.execute(
+                    "UPDATE jobs SET done = done + 1, failed = failed + 1, updated_at = ? WHERE job_id = ?",
+                    (time.time(), run.job_id),
+                )
+        except Exception as db_error:
+            print(f"❌ Could not record the failure of {filename} in job {run.job_id}: {db_error}")
+    finally:
+        run.partials.pop(filename, None)
+        with _runs_lock:
+            run.in_flight -= 1
+        _dispatch(run)
+        _finish_if_idle(run)
+
+
+def _finish_if_idle(run: _JobRun) -> None:
+    with _runs_lock:
+        if run.in_flight or (run.pending and not run.cancelled.is_set()) or _runs.get(run.job_id) is not run:
+            return
+        del _runs[run.job_id]
+    status = JOB_CANCELLED if run.cancelled.is_set() else JOB_DONE
+    with _jobs_db(run.path) as conn:
+        conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?", (status, time.time(), run.job_id))
+
+
+def cancel_job(job_id: str, path: str = EXTRACTION_JOBS_PATH) -> bool:
+    """
+    Stop a job: files not yet started are marked cancelled, files already
+    talking to GPT finish and keep their results. Returns False when the
+    job is not running in this process.
+    """
+    with _runs_lock:
+        run = _runs.get(job_id)
+        if run is None:
+            return False
+        run.cancelled.set()
+        skipped = [position for position, _, _ in run.pending]
+        run.pending.clear()
+    with _jobs_db(path) as conn:
+        conn.executemany(
+            "UPDATE job_files SET status = ? WHERE job_id = ? AND position = ?",
+            [(JOB_CANCELLED, job_id, position) for position in skipped],
+        )
+    _finish_if_idle(run)
+    return True
+
+
+def get_job(job_id: str, path: str = EXTRACTION_JOBS_PATH) -> Optional[JobStatus]:
+    """Current status of `job_id`, or None for an unknown (or pruned) job."""
+    with _jobs_db(path) as conn:
+        _recover_interrupted_jobs(conn)
+        row = conn.execute(
+            "SELECT job_id, status, total, done, failed, created_at, updated_at FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        running = [name for (name,) in conn.execute(
+            "SELECT filename FROM job_files WHERE job_id = ? AND status = ? ORDER BY position", (job_id, JOB_RUNNING)
+        )]
+    with _runs_lock:
+        run = _runs.get(job_id)
+        partials = dict(run.partials) if run else {}
+    return JobStatus(*row, running_files=running, partials=partials)
+
+
+def job_results(job_id: str, path: str = EXTRACTION_JOBS_PATH) -> List[Tuple[str, Dict[str, str]]]:
+    """
+    (filename, extractor result or {"error": ...}) for every finished file
+    of the job, in upload order. Uploads sharing a name each keep their own
+    entry.
+    """
+    with _jobs_db(path) as conn:
+        rows = conn.execute(
+            "SELECT filename, result FROM job_files WHERE job_id = ? AND result IS NOT NULL ORDER BY position",
+            (job_id,),
+        ).fetchall()
+    return [(filename, json.loads(result)) for filename, result in rows]
+
+
+def list_jobs(limit: int = 20, path: str = EXTRACTION_JOBS_PATH) -> List[JobStatus]:
+    """The most recent jobs, newest first (without running-file details)."""
+    with _jobs_db(path) as conn:
+        _recover_interrupted_jobs(conn)
+        rows = conn.execute(
+            "SELECT job_id, status, total, done, failed, created_at, updated_at FROM jobs ORDER BY created_at DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    return [JobStatus(*row, running_files=[], partials={}) for row in rows]
@@ -0,0 +1,38 @@
+from typing import Callable, Dict, Optional
+from extract_utils import extract_from_document
+from pdf_document import PdfDocument
+from settings import get_int_setting
+
+# Extraction is dominated by GPT network wait, so threads overlap well even
+# with the GIL. Keep the default modest to stay under the OpenAI rate limit.
+DEFAULT_MAX_WORKERS = get_int_setting("app", "MAX_EXTRACTION_WORKERS", 4)
+MAX_WORKERS_LIMIT = 16
+
+
+def extract_uploaded_pdf(
+    filename: str,
+    pdf_bytes: bytes,
+    use_cache: bool = True,
+    on_partial: Optional[Callable[[Dict], None]] = None,
+) -> Dict[str, str]:
+    """
+    Run the full extraction for one uploaded PDF.
+
+    The PDF is opened once, straight from the uploaded bytes; nothing is
+    written to disk.
+
+    Returns the extractor's dict (with "GPT_Output", plus "cache_hit" when the
+    GPT response cache answered or "source" when the form's text layer was
+    used) or a dict with an "error" key. Never raises,
+    so it is safe to run inside a worker thread.
+    """
+    try:
+        doc = PdfDocument(pdf_bytes, name=filename)
+    except Exception as e:
+        return {"error": f"Error during form recognition – {e}"}
+
+    try:
+        with doc:
+            return extract_from_document(doc, use_cache=use_cache, on_partial=on_partial)
+    except Exception as e:
+        return {"error": f"Extraction failed – {e}"}
@@ -0,0 +1,228 @@
+import json
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+# Minimal local stand-in for the OpenAI Files + Batches endpoints used by
+# bulk_extract. It accepts the uploaded JSONL, pretends to process it for a
+# few polls and serves canned chat completions, so bulk mode can be exercised
+# without network access or cost:
+#
+#     with FakeBatchServer({"app1.pdf": '{"FullName": "Jane Doe"}'}) as server:
+#         client = make_openai_client(base_url=server.base_url)
+#         records, errors = run_bulk_extraction(paths, client=client, poll_interval=0)
+
+
+def _completion_body(content: str) -> Dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "fake-gpt",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+class FakeBatchServer:
+    """
+    Serve /v1/files and /v1/batches on 127.0.0.1 with canned responses.
+
+    Args:
+        responses: custom_id -> completion text. Requests without an entry
+            get `default_response(custom_id, body)` if given, otherwise an
+            error line.
+        polls_until_complete: Number of status polls that report
+            "in_progress" before the batch completes.
+    """
+
+    def __init__(
+        self,
+        responses: Optional[Dict[str, str]] = None,
+        default_response: Optional[Callable[[str, Dict], str]] = None,
+        polls_until_complete: int = 1,
+    ):
+        self.responses = dict(responses or {})
+        self.default_response = default_response
+        self.polls_until_complete = polls_until_complete
+        self.files: Dict[str, Dict] = {}
+        self.batches: Dict[str, Dict] = {}
+        self.requests_seen: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeBatchServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeBatchServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ── State transitions ──────────────────────────────
+    def _add_file(self, content: bytes, purpose: str, filename: str) -> Dict:
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        obj = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        self.files[file_id] = {**obj, "content": content}
+        return obj
+
+    def _run_batch(self, batch: Dict) -> None:
+        """Produce the output (and error) file for a batch."""
+        input_lines = self.files[batch["input_file_id"]]["content"].decode().splitlines()
+        output, errors = [], []
+        for line in filter(str.strip, input_lines):
+            request = json.loads(line)
+            custom_id = request["custom_id"]
+            self.requests_seen[custom_id] = request
+            content = self.responses.get(custom_id)
+            if content is None and self.default_response:
+                content = self.default_response(custom_id, request.get("body", {}))
+            if content is None:
+                errors.append({
+                    "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                    "custom_id": custom_id,
+                    "response": None,
+                    "error": {"code": "not_found", "message": f"No canned response for {custom_id}"},
+                })
+                continue
+            output.append({
+                "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                "custom_id": custom_id,
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": _completion_body(content)},
+                "error": None,
+            })
+
+        to_jsonl = lambda rows: ("\n".join(json.dumps(r) for r in rows) + "\n").encode()
+        batch["output_file_id"] = self._add_file(to_jsonl(output), "batch_output", "output.jsonl")["id"] if output else None
+        batch["error_file_id"] = self._add_file(to_jsonl(errors), "batch_output", "errors.jsonl")["id"] if errors else None
+        batch["request_counts"] = {"total": len(output) + len(errors), "completed": len(output), "failed": len(errors)}
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+
+    def _retrieve_batch(self, batch_id: str) -> Optional[Dict]:
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        if batch["status"] not in ("completed", "failed", "cancelled"):
+            batch["_polls"] += 1
+            if batch["_polls"] > self.polls_until_complete:
+                self._run_batch(batch)
+            else:
+                batch["status"] = "in_progress"
+        return {k: v for k, v in batch.items() if not k.startswith("_")}
+
+    # ── HTTP plumbing ──────────────────────────────────
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload, content_type: str = "application/json"):
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _not_found(self):
+                self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                with server._lock:
+                    if path == "/v1/files":
+                        raw = self._body()
+                        message = BytesParser(policy=default_policy).parsebytes(
+                            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw
+                        )
+                        fields, content, filename = {}, b"", "upload.jsonl"
+                        for part in message.iter_parts():
+                            name = part.get_param("name", header="content-disposition")
+                            if name == "file":
+                                content = part.get_payload(decode=True) or b""
+                                filename = part.get_filename() or filename
+                            else:
+                                fields[name] = part.get_content().strip()
+                        return self._send(200, server._add_file(content, fields.get("purpose", "batch"), filename))
+
+                    if path == "/v1/batches":
+                        params = json.loads(self._body() or b"{}")
+                        if params.get("input_file_id") not in server.files:
+                            return self._send(400, {"error": {"message": "input_file_id not found"}})
+                        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+                        server.batches[batch_id] = {
+                            "id": batch_id,
+                            "object": "batch",
+                            "endpoint": params.get("endpoint"),
+                            "input_file_id": params["input_file_id"],
+                            "completion_window": params.get("completion_window", "24h"),
+                            "status": "validating",
+                            "created_at": int(time.time()),
+                            "metadata": params.get("metadata"),
+                            "output_file_id": None,
+                            "error_file_id": None,
+                            "_polls": 0,
+                        }
+                        return self._send(200, server._retrieve_batch(batch_id) | {"status": "validating"})
+
+                    if path.startswith("/v1/batches/") and path.endswith("/cancel"):
+                        batch = server.batches.get(path.split("/")[3])
+                        if batch is None:
+                            return self._not_found()
+                        batch["status"] = "cancelled"
+                        return self._send(200, server._retrieve_batch(batch["id"]))
+                self._not_found()
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                parts = path.strip("/").split("/")
+                with server._lock:
+                    if len(parts) == 3 and parts[:2] == ["v1", "batches"]:
+                        batch = server._retrieve_batch(parts[2])
+                        return self._send(200, batch) if batch else self._not_found()
+                    if len(parts) == 4 and parts[:2] == ["v1", "files"] and parts[3] == "content":
+                        file = server.files.get(parts[2])
+                        return self._send(200, file["content"], "application/octet-stream") if file else self._not_found()
+                    if len(parts) == 3 and parts[:2] == ["v1", "files"]:
+                        file = server.files.get(parts[2])
+                        if file is None:
+                            return self._not_found()
+                        return self._send(200, {k: v for k, v in file.items() if k != "content"})
+                self._not_found()
+
+        return Handler
@@ -0,0 +1,104 @@
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+from PIL import Image
+from extract_tenant_data import GPT_VISION_MODEL, run_vision_completion
+from form_layouts import HANDWRITING_ZOOM, get_form_layout
+from output_schema import make_response_format
+from pdf_document import PdfDocument
+from pdf_render import render_page, render_region
+
+# Targeted re-extraction: when a saved record is missing required fields,
+# only the part of the form that holds them is rendered and sent with a
+# short prompt asking for just those values. Answers are merged back into
+# the record without touching fields that already have a value.
+
+# Validation label -> holder column, in the order the app reports them.
+REQUIRED_FIELD_COLUMNS: Dict[str, str] = {
+    "Full Name": "FullName",
+    "Phone Number": "PhoneNumber",
+    "SSN": "SSN",
+    "DOB": "DOB",
+    "Current Employer": "Applicant's Current Employer",
+}
+
+# Holder column -> (what to ask for, form_layouts region label keyword,
+# page to send whole when the form has no known layout).
+FIELD_LOCATIONS: Dict[str, Tuple[str, str, int]] = {
+    "FullName": ("the applicant's full name", "applicant identity", 0),
+    "PhoneNumber": ("the applicant's phone number", "applicant identity", 0),
+    "SSN": ("the applicant's Social Security number", "applicant identity", 0),
+    "DOB": ("the applicant's date of birth", "applicant identity", 0),
+    "Applicant's Current Employer": ("the name of the applicant's current employer", "Employment", 1),
+}
+
+TARGETED_MAX_TOKENS = 300
+
+
+def build_targeted_prompt(columns: List[str]) -> str:
+    wanted = "\n".join(f'- "{column}": {FIELD_LOCATIONS[column][0]}' for column in columns)
+    return (
+        "These images are sections of a residential lease application. "
+        "Read only the following values and return them as a JSON object with exactly these keys. "
+        "Use null for anything blank or illegible. Do NOT add explanations.\n\n"
+        f"{wanted}"
+    )
+
+
+def targeted_images(doc: PdfDocument, columns: List[str]) -> List[Image.Image]:
+    """Render the layout regions (or whole fallback pages) that hold `columns`, each once."""
+    keywords = {FIELD_LOCATIONS[column][1] for column in columns}
+    layout = get_form_layout(doc.form_variant, doc.page_count)
+    if layout:
+        regions = [region for region in layout if any(keyword in region.label for keyword in keywords)]
+        if regions:
+            return [render_region(doc.doc[r.page], r.box, max(r.zoom, HANDWRITING_ZOOM)) for r in regions]
+
+    pages = sorted({FIELD_LOCATIONS[column][2] for column in columns if FIELD_LOCATIONS[column][2] < doc.page_count})
+    return [render_page(doc.doc[page]) for page in pages or [0]]
+
+
+def reextract_fields(doc: PdfDocument, columns: Iterable[str], use_cache: bool = True) -> Tuple[Dict[str, str], Optional[str]]:
+    """
+    Ask GPT for just `columns` from the relevant part of the form.
+
+    Returns (values, error): values holds only the columns GPT could read.
+    """
+    columns = [column for column in columns if column in FIELD_LOCATIONS]
+    if not columns:
+        return {}, None
+
+    spec = {column: None for column in columns}
+    # Schema names allow only [a-zA-Z0-9_-], so the field set is hashed.
+    name = "missing_fields_" + hashlib.sha256("|".join(columns).encode()).hexdigest()[:12]
+    response_format = make_response_format(name, spec)
+    result = run_vision_completion(
+        build_targeted_prompt(columns),
+        targeted_images(doc, columns),
+        model=GPT_VISION_MODEL,
+        use_cache=use_cache,
+        max_tokens=TARGETED_MAX_TOKENS,
+        response_format=response_format,
+    )
+    if "error" in result:
+        return {}, result["error"]
+
+    # run_vision_completion already conformed the answer to `spec` (cached
+    # answers are stored conformed), so it only needs decoding.
+    record = json.loads(result["GPT_Output"])
+    return {column: value.strip() for column, value in record.items() if isinstance(value, str) and value.strip()}, None
+
+
+def reextract_missing_fields(
+    pdf_bytes: bytes,
+    filename: str,
+    missing_labels: Iterable[str],
+    use_cache: bool = True,
+) -> Tuple[Dict[str, str], Optional[str]]:
+    """Re-read the missing required fields (validation labels, e.g. "SSN") of one uploaded PDF."""
+    columns = [REQUIRED_FIELD_COLUMNS[label] for label in missing_labels if label in REQUIRED_FIELD_COLUMNS]
+    try:
+        with PdfDocument(pdf_bytes, name=filename) as doc:
+            return reextract_fields(doc, columns, use_cache=use_cache)
+    except Exception as e:
+        return {}, f"Targeted re-extraction failed – {e}"
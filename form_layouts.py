@@ -0,0 +1,80 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from settings import get_setting
+
+# Page regions worth sending to GPT for each fixed-layout form. Boxes are
+# fractions of the page (x0, y0, x1, y1) so they hold at any render size.
+# Pages and bands that only carry boilerplate (authorizations, notices) are
+# skipped. Regions on a page never overlap, and each one has its own zoom:
+# handwriting bands get more pixels, typed fields and the signature date
+# get fewer.
+#
+# Image tokens are billed per 512px tile, so region sizes are chosen to
+# fill whole tiles: a typed band 0.92 of a letter page wide at 1.0x is two
+# tiles across, a handwriting band at 1.75x is two tiles across for up to
+# 0.36 of the page height. Every layout costs fewer tokens than sending
+# its pages whole (tests/test_form_layouts.py checks this).
+
+ROI_CROPPING_ENABLED = str(get_setting("app", "ROI_CROPPING_ENABLED", "true")).strip().lower() not in ("0", "false", "no", "off")
+
+TYPED_ZOOM = 1.0        # 72 DPI: filled-in typed text and checkboxes
+HANDWRITING_ZOOM = 1.75  # ~126 DPI for handwritten entries
+DATE_ZOOM = 1.0         # signature-block date line
+
+
+class Region(NamedTuple):
+    page: int                                  # 0-based; negative counts from the end
+    box: Tuple[float, float, float, float]     # x0, y0, x1, y1 as page fractions
+    zoom: float
+    label: str
+
+
+# Form_A_2022 / Form_B_2024: fillable forms, every entry is typed.
+_TYPED_LAYOUT = [
+    Region(0, (0.04, 0.04, 0.96, 0.64), TYPED_ZOOM, "Property, applicant identity, Co-applicants, C. Representation and Marketing"),
+    Region(0, (0.04, 0.64, 0.96, 0.92), TYPED_ZOOM, "Applicant's Current Address"),
+    Region(1, (0.04, 0.04, 0.96, 0.64), TYPED_ZOOM, "Employment and Other Income, E. Occupant Information, F. Vehicle Information"),
+    Region(2, (0.04, 0.04, 0.50, 0.40), TYPED_ZOOM, "G. Animals"),
+    Region(-1, (0.04, 0.80, 0.50, 0.95), DATE_ZOOM, "Signature block / application date"),
+]
+
+# Handwritten TXR-2003 (2-1-18): same section order, entries are handwritten
+# into narrower bands.
+_HANDWRITTEN_LAYOUT = [
+    Region(0, (0.04, 0.06, 0.96, 0.42), HANDWRITING_ZOOM, "Property, applicant identity, Co-applicants"),
+    Region(0, (0.04, 0.42, 0.96, 0.78), HANDWRITING_ZOOM, "Applicant's Current Address, C. Representation and Marketing"),
+    Region(1, (0.04, 0.05, 0.96, 0.41), HANDWRITING_ZOOM, "Employment and Other Income"),
+    Region(1, (0.04, 0.41, 0.96, 0.77), HANDWRITING_ZOOM, "E. Occupant Information, F. Vehicle Information"),
+    Region(2, (0.04, 0.05, 0.50, 0.35), HANDWRITING_ZOOM, "G. Animals"),
+    Region(-1, (0.04, 0.80, 0.50, 0.95), DATE_ZOOM, "Signature block / application date"),
+]
+
+FORM_LAYOUTS: Dict[str, List[Region]] = {
+    "Form_A_2022": _TYPED_LAYOUT,
+    "Form_B_2024": _TYPED_LAYOUT,
+    "TXR_2003_2018": _HANDWRITTEN_LAYOUT,
+}
+
+# Fewer pages than this means the PDF is not the full form (e.g. a partial
+# scan), so the layout cannot be trusted.
+MIN_LAYOUT_PAGES = 3
+
+
+def get_form_layout(form_variant: Optional[str], page_count: int) -> Optional[List[Region]]:
+    """
+    Return the regions to render for a form variant, or None to send whole pages.
+
+    Pages are resolved to absolute indices and de-duplicated, so a region on
+    the last page never repeats one already taken from the same page.
+    """
+    if not ROI_CROPPING_ENABLED or form_variant not in FORM_LAYOUTS or page_count < MIN_LAYOUT_PAGES:
+        return None
+
+    regions = []
+    seen = set()
+    for region in FORM_LAYOUTS[form_variant]:
+        page = region.page if region.page >= 0 else page_count + region.page
+        if not 0 <= page < page_count or (page, region.box) in seen:
+            continue
+        seen.add((page, region.box))
+        regions.append(region._replace(page=page))
+    return regions
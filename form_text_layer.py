@@ -0,0 +1,287 @@
+import copy
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+import fitz  # PyMuPDF
+from output_schema import fill_blanks, get_path, strip_json_fences
+from pdf_render import open_pdf, PdfSource
+
+# Deterministic extraction for fillable standard forms (Form_A_2022 /
+# Form_B_2024). Filled AcroForm widgets are read straight from the PDF and
+# mapped onto the same JSON schema that STANDARD_FORM_PROMPT asks GPT for.
+# Field names are matched with patterns rather than exact names so small
+# wording differences between form revisions still map.
+
+# Empty record in the shape STANDARD_FORM_PROMPT produces.
+STANDARD_FORM_SKELETON = {
+    "Property Address": None,
+    "Move-in Date": None,
+    "Monthly Rent": None,
+    "FullName": None,
+    "PhoneNumber": None,
+    "Email": None,
+    "DOB": None,
+    "SSN": None,
+    "Co-applicants": [],
+    "Applicant's Current Address": {
+        "Address": None,
+        "Phone:Day": None,
+        "Landlord or Property Manager's Name": None,
+        "Rent": None,
+        "Move-out Date": None,
+        "Reason for Move": None,
+    },
+    "IDType": None,
+    "DriverLicenseNumber": None,
+    "IDIssuer": None,
+    "Nationality": None,
+    "FormSource": None,
+    "ApplicationDate": None,
+    "C.Representation and Marketing": {
+        "Name": None,
+        "Company": None,
+        "E-mail": None,
+        "Phone Number": None,
+    },
+    "Employment and Other Income:": {
+        "Applicant's Current Employer": None,
+        "Current Employer Details": {
+            "Employment Verification Contact": None,
+            "Address": None,
+            "Phone": None,
+            "E-mail": None,
+            "Position": None,
+            "Start Date": None,
+            "Gross Monthly Income": None,
+        },
+        "Child Support": None,
+    },
+    "E. Occupant Information": [],
+    "F. Vehicle Information:": [],
+    "G. Animals": [],
+}
+
+_EMPLOYER = ("Employment and Other Income:", "Current Employer Details")
+
+# (schema path, pattern on the normalized widget name). First match wins, so
+# more specific patterns come before generic ones.
+SCALAR_FIELD_PATTERNS: List[Tuple[Tuple[str, ...], str]] = [
+    (("C.Representation and Marketing", "E-mail"), r"\b(agent|broker|representative|leasing)\b.*e ?mail"),
+    (("C.Representation and Marketing", "Phone Number"), r"\b(agent|broker|representative|leasing)\b.*\b(phone|tel)\b"),
+    (("C.Representation and Marketing", "Company"), r"\b(agent|broker|representative|leasing)\b.*(company|firm)"),
+    (("C.Representation and Marketing", "Name"), r"\b(agent|broker|representative|leasing)\b.*name"),
+    (("Applicant's Current Address", "Phone:Day"), r"(landlord|property manager).*\b(phone|tel)\b|current address.*phone"),
+    (("Applicant's Current Address", "Landlord or Property Manager's Name"), r"(landlord|property manager)( s)?( name)?$"),
+    (("Applicant's Current Address", "Move-out Date"), r"move ?out"),
+    (("Applicant's Current Address", "Reason for Move"), r"reason for (move|moving|leaving)"),
+    (("Applicant's Current Address", "Rent"), r"current rent|present rent"),
+    (("Applicant's Current Address", "Address"), r"(current|present) (home |street )?address"),
+    (_EMPLOYER + ("Gross Monthly Income",), r"gross monthly income|monthly (gross )?income"),
+    (_EMPLOYER + ("Employment Verification Contact",), r"(employment )?verification contact|supervisor"),
+    (_EMPLOYER + ("Start Date",), r"(employment )?start date|date (of )?hire"),
+    (_EMPLOYER + ("Position",), r"\bposition\b|job title|\boccupation\b"),
+    (_EMPLOYER + ("E-mail",), r"employer.*e ?mail"),
+    (_EMPLOYER + ("Phone",), r"employer.*\b(phone|tel)\b"),
+    (_EMPLOYER + ("Address",), r"employer.*address"),
+    (("Employment and Other Income:", "Applicant's Current Employer"), r"current employer|employer name|^employer$"),
+    (("Employment and Other Income:", "Child Support"), r"child support"),
+    (("Property Address",), r"property address|address of (the )?property|leased premises"),
+    (("Move-in Date",), r"move ?in date|anticipated move ?in|commencement date"),
+    (("Monthly Rent",), r"monthly rent|rent amount"),
+    (("DOB",), r"birth ?date|date of birth|^dob$"),
+    (("SSN",), r"social security|^ssn$|^ss ?(no|number|#)"),
+    (("DriverLicenseNumber",), r"driver s? licen[cs]e|^dl ?(no|number|#)?$"),
+    (("IDIssuer",), r"\b(dl|license|id) (issuing )?state\b|\bissu(ing|er)\b"),
+    (("IDType",), r"id type|identification type"),
+    (("Nationality",), r"nationality|citizenship"),
+    (("ApplicationDate",), r"application date|date signed|signature date"),
+    (("Email",), r"e ?mail"),
+    (("PhoneNumber",), r"(cell|mobile|home|work) phone|applicant.*phone|^phone( number)?$|^telephone$"),
+    (("FullName",), r"^(applicant s )?(full |legal )?name$|applicant.*name"),
+]
+
+# List sections: section keyword pattern, then (item key, pattern) pairs.
+# A trailing number on the widget name selects the row (default row 1).
+# Patterns match whole words so that e.g. "Carpet Fee" is not a pet and
+# "Pet Policy Language" has no age.
+LIST_FIELD_PATTERNS: Dict[str, Tuple[str, List[Tuple[str, str]]]] = {
+    "Co-applicants": (r"\bco ?applicants?\b", [
+        ("Relationship", r"\brelationship\b"),
+        ("Name", r"\bname\b"),
+    ]),
+    "E. Occupant Information": (r"\boccupants?\b", [
+        ("Relationship", r"\brelationship\b"),
+        ("DOB", r"\b(birth|dob)\b"),
+        ("Name", r"\bname\b"),
+    ]),
+    "F. Vehicle Information:": (r"\b(vehicles?|autos?|automobiles?|cars?)\b", [
+        ("Monthly Payment", r"\bpayment\b"),
+        ("Type", r"\btype\b"),
+        ("Year", r"\byear\b"),
+        ("Make", r"\bmake\b"),
+        ("Model", r"\bmodel\b"),
+    ]),
+    "G. Animals": (r"\b(animals?|pets?)\b", [
+        ("Type and Breed", r"\b(type|breed|kind)\b"),
+        ("Color", r"\bcolou?r\b"),
+        ("Weight", r"\bweight\b"),
+        ("Age in Yrs", r"\bage\b"),
+        ("Gender", r"\b(gender|sex)\b"),
+        ("Name", r"\bname\b"),
+    ]),
+}
+
+# A record missing any of these is not trusted on the fast path.
+REQUIRED_FIELDS: List[Tuple[str, ...]] = [
+    ("Property Address",),
+    ("FullName",),
+    ("PhoneNumber",),
+    ("DOB",),
+    ("SSN",),
+    ("Employment and Other Income:", "Applicant's Current Employer"),
+]
+
+_UNCHECKED_VALUES = {"", "off", "no", "false", "0"}
+
+
+def _normalize_field_name(name: str) -> str:
+    # "PetAge2" -> "pet age 2", so word-anchored patterns see the words.
+    name = re.sub(r"(?<=[a-z])(?=[A-Z])|(?<=[A-Za-z])(?=[0-9])|(?<=[0-9])(?=[A-Za-z])", " ", name or "")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", name.lower()).split())
+
+
+def read_form_widgets(doc: fitz.Document) -> Dict[str, str]:
+    """Return {field name: value} for every filled widget in the document."""
+    values = {}
+    for page in doc:
+        for widget in page.widgets() or []:
+            value = widget.field_value
+            if isinstance(value, bool):
+                value = "Yes" if value else ""
+            value = str(value or "").strip()
+            if widget.field_type in (fitz.PDF_WIDGET_TYPE_CHECKBOX, fitz.PDF_WIDGET_TYPE_RADIOBUTTON):
+                value = "" if value.lower() in _UNCHECKED_VALUES else "Yes"
+            if value and widget.field_name and widget.field_name not in values:
+                values[widget.field_name] = value
+    return values
+
+
+def _set_path(record: Dict, path: Tuple[str, ...], value: str) -> None:
+    target = record
+    for key in path[:-1]:
+        target = target[key]
+    if target.get(path[-1]) in (None, ""):
+        target[path[-1]] = value
+
+
+def map_widgets_to_record(widgets: Dict[str, str]) -> Tuple[Dict, List[str]]:
+    """
+    Map widget values onto STANDARD_FORM_SKELETON.
+
+    Returns:
+        Tuple[Dict, List[str]]: the record and the names of any filled
+        widgets that could not be mapped (their content would be lost).
+    """
+    record = copy.deepcopy(STANDARD_FORM_SKELETON)
+    rows: Dict[str, Dict[int, Dict[str, str]]] = {}
+    unmapped = []
+
+    for raw_name, value in widgets.items():
+        name = _normalize_field_name(raw_name)
+
+        matched = False
+        for section, (section_pattern, item_patterns) in LIST_FIELD_PATTERNS.items():
+            if not re.search(section_pattern, name):
+                continue
+            row_match = re.search(r"(\d+)$", name)
+            row = int(row_match.group(1)) if row_match else 1
+            for item_key, item_pattern in item_patterns:
+                if re.search(item_pattern, name):
+                    rows.setdefault(section, {}).setdefault(row, {}).setdefault(item_key, value)
+                    matched = True
+                    break
+            if matched:
+                break
+        if matched:
+            continue
+
+        for path, pattern in SCALAR_FIELD_PATTERNS:
+            if re.search(pattern, name):
+                _set_path(record, path, value)
+                matched = True
+                break
+
+        if not matched:
+            unmapped.append(raw_name)
+
+    for section, section_rows in rows.items():
+        item_keys = [key for key, _ in LIST_FIELD_PATTERNS[section][1]]
+        record[section] = [
+            {key: section_rows[row].get(key) for key in item_keys}
+            for row in sorted(section_rows)
+        ]
+
+    return record, unmapped
+
+
+def missing_required_fields(record: Dict) -> List[str]:
+    return [" / ".join(path) for path in REQUIRED_FIELDS if not get_path(record, path)]
+
+
+def extract_from_text_layer(source: PdfSource | fitz.Document, form_source: Optional[str] = None) -> Tuple[Optional[Dict], List[str]]:
+    """
+    Read a fillable standard form without rendering or calling GPT.
+
+    Args:
+        source: PDF path, PDF bytes or an already opened fitz.Document.
+        form_source: Value for "FormSource" (e.g. "Form_B_2024").
+
+    Returns:
+        Tuple[Dict | None, List[str]]: the record in the STANDARD_FORM_PROMPT
+        schema (None when the PDF has no filled widgets) and the list of
+        required fields it could not fill. A record is safe to use on its
+        own only when that list is empty.
+    """
+    try:
+        if isinstance(source, fitz.Document):
+            widgets = read_form_widgets(source)
+        else:
+            with open_pdf(source) as doc:
+                widgets = read_form_widgets(doc)
+    except Exception as e:
+        print(f"⚠️ Failed to read form widgets: {e}")
+        return None, [" / ".join(path) for path in REQUIRED_FIELDS]
+
+    if not widgets:
+        return None, [" / ".join(path) for path in REQUIRED_FIELDS]
+
+    record, unmapped = map_widgets_to_record(widgets)
+    if form_source:
+        record["FormSource"] = form_source
+
+    missing = missing_required_fields(record)
+    if unmapped:
+        # Filled widgets we cannot place may hold data GPT would have read.
+        missing.append(f"unmapped widgets: {', '.join(unmapped[:5])}")
+    return record, missing
+
+
+def merge_with_gpt_output(text_layer_record: Dict, gpt_result: Dict[str, str]) -> Dict[str, str]:
+    """
+    Combine a partial text-layer record with a GPT extraction result.
+
+    Text-layer values win (they are exact); GPT only supplies the fields the
+    widgets left empty. Errors and unparseable GPT output pass through as-is.
+    """
+    if "error" in gpt_result or not gpt_result.get("GPT_Output"):
+        return gpt_result
+
+    try:
+        gpt_record = json.loads(strip_json_fences(gpt_result["GPT_Output"]))
+    except json.JSONDecodeError:
+        return gpt_result
+    if not isinstance(gpt_record, dict):
+        return gpt_result
+
+    merged = fill_blanks(copy.deepcopy(text_layer_record), gpt_record)
+    return {**gpt_result, "GPT_Output": json.dumps(merged), "source": "text_layer+gpt"}
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from settings import get_setting, get_int_setting
+
+# Persistent cache of GPT vision responses, keyed by a hash of the exact
+# request (model, prompt and encoded page images). Resent applications are
+# answered from here instead of paying for an identical gpt-4o call.
+
+GPT_CACHE_PATH = get_setting("app", "GPT_CACHE_PATH", "data/gpt_cache.sqlite3")
+GPT_CACHE_MAX_ENTRIES = get_int_setting("app", "GPT_CACHE_MAX_ENTRIES", 2000)
+GPT_CACHE_MAX_AGE_DAYS = get_int_setting("app", "GPT_CACHE_MAX_AGE_DAYS", 30)
+GPT_CACHE_ENABLED = str(get_setting("app", "GPT_CACHE_ENABLED", "true")).strip().lower() not in ("0", "false", "no", "off")
+
+
+@contextmanager
+def _cache_db(path: str = GPT_CACHE_PATH):
+    """Open the cache database, commit on success and always close."""
+    conn = _connect(path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _connect(path: str = GPT_CACHE_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS gpt_responses (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_gpt_responses_last_used ON gpt_responses(last_used_at)")
+    return conn
+
+
+def make_cache_key(model: str, prompt: str, image_parts: List[Dict], **options) -> str:
+    """
+    Hash everything that determines the model's answer.
+
+    `image_parts` are the encoded `image_url` parts actually sent, so a change
+    of image format or quality produces a different key. Extra `options`
+    (e.g. max_tokens) are folded into the key as well.
+    """
+    h = hashlib.sha256()
+    h.update(model.encode())
+    h.update(b"\0")
+    h.update(prompt.encode())
+    for key in sorted(options):
+        h.update(f"\0{key}={options[key]}".encode())
+    for part in image_parts:
+        h.update(b"\0")
+        h.update(part.get("image_url", {}).get("url", "").encode())
+    return h.hexdigest()
+
+
+def get_cached_response(cache_key: str, max_age_days: int = GPT_CACHE_MAX_AGE_DAYS, path: str = GPT_CACHE_PATH) -> Optional[str]:
+    """Return the cached response text, or None on a miss or expired entry."""
+    now = time.time()
+    try:
+        with _cache_db(path) as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM gpt_responses WHERE cache_key = ?",
+                (cache_key,),
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if max_age_days and now - created_at > max_age_days * 86400:
+                conn.execute("DELETE FROM gpt_responses WHERE cache_key = ?", (cache_key,))
+                return None
+            conn.execute(
+                "UPDATE gpt_responses SET last_used_at = ?, hits = hits + 1 WHERE cache_key = ?",
+                (now, cache_key),
+            )
+            return response
+    except Exception as e:
+        print(f"⚠️ GPT cache lookup failed: {e}")
+        return None
+
+
+def store_response(
+    cache_key: str,
+    model: str,
+    response: str,
+    max_entries: int = GPT_CACHE_MAX_ENTRIES,
+    max_age_days: int = GPT_CACHE_MAX_AGE_DAYS,
+    path: str = GPT_CACHE_PATH,
+) -> None:
+    """Insert or refresh a response, then apply age and size eviction."""
+    now = time.time()
+    try:
+        with _cache_db(path) as conn:
+            conn.execute(
+                """
+                INSERT INTO gpt_responses (cache_key, model, response, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    response = excluded.response,
+                    created_at = excluded.created_at,
+                    last_used_at = excluded.last_used_at
+                """,
+                (cache_key, model, response, now, now),
+            )
+            _evict(conn, max_entries, max_age_days, now)
+    except Exception as e:
+        print(f"⚠️ GPT cache write failed: {e}")
+
+
+def _evict(conn: sqlite3.Connection, max_entries: int, max_age_days: int, now: float) -> None:
+    if max_age_days:
+        conn.execute("DELETE FROM gpt_responses WHERE created_at < ?", (now - max_age_days * 86400,))
+    if max_entries:
+        # Least recently used entries go first.
+        conn.execute(
+            """
+            DELETE FROM gpt_responses WHERE cache_key NOT IN (
+                SELECT cache_key FROM gpt_responses ORDER BY last_used_at DESC LIMIT ?
+            )
+            """,
+            (max_entries,),
+        )
+
+
+def cache_stats(path: str = GPT_CACHE_PATH) -> Dict[str, int]:
+    try:
+        with _cache_db(path) as conn:
+            entries, hits = conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM gpt_responses").fetchone()
+        return {"entries": entries, "hits": hits}
+    except Exception as e:
+        print(f"⚠️ GPT cache stats failed: {e}")
+        return {"entries": 0, "hits": 0}
+
+
+def clear_cache(path: str = GPT_CACHE_PATH) -> None:
+    with _cache_db(path) as conn:
+        conn.execute("DELETE FROM gpt_responses")
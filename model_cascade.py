@@ -0,0 +1,107 @@
+import json
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from output_schema import fill_blanks, get_path, is_blank, strip_json_fences
+from settings import get_setting
+
+# Two-tier extraction: a small, fast vision model reads every application
+# first and only weak answers are re-run on the large model. An answer is
+# weak when the call failed, the output is not a JSON object, or any of the
+# cascade's required fields came back empty.
+
+MODEL_CASCADE_ENABLED = str(get_setting("openai", "MODEL_CASCADE_ENABLED", "false")).strip().lower() not in ("0", "false", "no", "off")
+FIRST_PASS_MODEL = get_setting("openai", "GPT_FIRST_PASS_MODEL", "gpt-4o-mini")
+
+CASCADE_REQUIRED_FIELDS: List[Tuple[str, ...]] = [
+    ("FullName",),
+    ("SSN",),
+    ("DOB",),
+    ("Employment and Other Income:", "Current Employer Details", "Gross Monthly Income"),
+]
+
+
+def score_extraction(result: Dict[str, str]) -> Tuple[Optional[Dict], List[str]]:
+    """
+    Judge a first-pass answer.
+
+    Returns (record, weaknesses). The record is the parsed JSON (None when
+    the call failed or the output is not a JSON object); an empty
+    weaknesses list means the answer can be used as-is.
+    """
+    if "error" in result:
+        return None, [f"error: {result['error']}"]
+    try:
+        record = json.loads(strip_json_fences(result.get("GPT_Output") or ""))
+    except json.JSONDecodeError:
+        return None, ["invalid JSON"]
+    if not isinstance(record, dict):
+        return None, ["invalid JSON"]
+    return record, [" / ".join(path) for path in CASCADE_REQUIRED_FIELDS if is_blank(get_path(record, path))]
+
+
+class CascadeStats:
+    """Thread-safe counters for how often each tier settles an application."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._first_pass = 0
+        self._accepted = 0
+        self._escalated = 0
+        self._escalation_failed = 0
+
+    def record(self, escalated: bool, escalation_failed: bool = False) -> None:
+        with self._lock:
+            self._first_pass += 1
+            if escalated:
+                self._escalated += 1
+                if escalation_failed:
+                    self._escalation_failed += 1
+            else:
+                self._accepted += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "first_pass": self._first_pass,
+                "first_pass_accepted": self._accepted,
+                "escalated": self._escalated,
+                "escalation_failed": self._escalation_failed,
+                "first_pass_hit_rate": round(self._accepted / self._first_pass, 3) if self._first_pass else 0.0,
+            }
+
+
+_cascade_stats = CascadeStats()
+
+
+def get_cascade_stats() -> CascadeStats:
+    return _cascade_stats
+
+
+def run_cascade(complete: Callable[[str], Dict[str, str]], escalation_model: str) -> Dict[str, str]:
+    """
+    Run `complete(model)` on FIRST_PASS_MODEL and escalate weak answers.
+
+    The escalated answer wins; blanks it leaves are filled from the first
+    pass. If escalation fails outright, the first-pass answer (if any) is
+    returned. Results carry "model_tier" ("first_pass" or "escalated") and,
+    when escalated, "escalation_reasons".
+    """
+    first = complete(FIRST_PASS_MODEL)
+    first_record, weaknesses = score_extraction(first)
+    if not weaknesses:
+        _cascade_stats.record(escalated=False)
+        return {**first, "model_tier": "first_pass"}
+
+    second = complete(escalation_model)
+    if "error" in second:
+        _cascade_stats.record(escalated=True, escalation_failed=True)
+        return {**first, "model_tier": "first_pass"} if first_record is not None else second
+
+    _cascade_stats.record(escalated=True)
+    try:
+        record = json.loads(strip_json_fences(second.get("GPT_Output") or ""))
+    except json.JSONDecodeError:
+        record = None
+    if isinstance(record, dict) and first_record is not None:
+        second = {**second, "GPT_Output": json.dumps(fill_blanks(record, first_record))}
+    return {**second, "model_tier": "escalated", "escalation_reasons": weaknesses}
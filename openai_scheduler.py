@@ -0,0 +1,248 @@
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+import openai
+from settings import get_int_setting
+
+# Shared client-side throttle for every OpenAI call made by the app. It keeps
+# requests and tokens under the per-minute account budget so bursts queue
+# locally instead of failing with 429s, and retries transient failures with
+# jittered exponential backoff.
+
+OPENAI_RPM = get_int_setting("openai", "OPENAI_RPM", 500)
+OPENAI_TPM = get_int_setting("openai", "OPENAI_TPM", 30000)
+OPENAI_MAX_RETRIES = get_int_setting("openai", "OPENAI_MAX_RETRIES", 6)
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# Error types the API reports inside a stream that has already started
+# (there is no HTTP status by then), and which are worth retrying.
+RETRYABLE_STREAM_ERROR_TYPES = {"rate_limit_exceeded", "rate_limit_error", "server_error", "overloaded_error", "timeout"}
+
+
+def _stream_error_type(exc: Exception) -> Optional[str]:
+    if isinstance(exc, openai.APIError) and not isinstance(exc, openai.APIStatusError):
+        return exc.type or exc.code
+    return None
+
+
+def _is_transport_error(exc: Exception) -> bool:
+    # A connection dropped mid-stream surfaces unwrapped as the HTTP client's
+    # TransportError (httpx, or httpx2 in newer openai releases).
+    return any(cls.__name__ == "TransportError" and cls.__module__.startswith("httpx") for cls in type(exc).__mro__)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """Transient failures: rate limits, timeouts, dropped connections and server errors, also mid-stream."""
+    if isinstance(exc, RETRYABLE_ERRORS) or _is_transport_error(exc):
+        return True
+    return _stream_error_type(exc) in RETRYABLE_STREAM_ERROR_TYPES
+
+
+def _is_rate_limit(exc: Exception) -> bool:
+    return isinstance(exc, openai.RateLimitError) or (_stream_error_type(exc) or "").startswith("rate_limit")
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Approximate vision input tokens for one high-detail image."""
+    if width <= 0 or height <= 0:
+        return 0
+    # Fit within 2048x2048, then scale the shortest side down to 768.
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
+
+
+def estimate_request_tokens(prompt: str, image_sizes, max_tokens: int) -> int:
+    """Rough total (input + reserved output) tokens for one vision request."""
+    text_tokens = len(prompt) // 4
+    image_tokens = sum(estimate_image_tokens(w, h) for w, h in image_sizes)
+    return text_tokens + image_tokens + max_tokens
+
+
+def _retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Read Retry-After (or retry-after-ms) from an OpenAI error response."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class RateLimitScheduler:
+    """
+    Token-bucket scheduler for requests-per-minute and tokens-per-minute.
+
+    Callers block in `call` until both budgets allow the request, so
+    throughput settles at the account limit. `stats()` reports queue depth
+    and time spent waiting.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = OPENAI_RPM,
+        tokens_per_minute: int = OPENAI_TPM,
+        max_retries: int = OPENAI_MAX_RETRIES,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.requests_per_minute = max(1, requests_per_minute)
+        self.tokens_per_minute = max(1, tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._request_budget = float(self.requests_per_minute)
+        self._token_budget = float(self.tokens_per_minute)
+        self._last_refill = time.monotonic()
+
+        self._waiting = 0
+        self._in_flight = 0
+        self._requests = 0
+        self._retries = 0
+        self._failures = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_budget = min(self.requests_per_minute, self._request_budget + elapsed * self.requests_per_minute / 60)
+        self._token_budget = min(self.tokens_per_minute, self._token_budget + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, estimated_tokens: int) -> float:
+        """Block until the request fits both budgets. Returns seconds waited."""
+        # A single request larger than the whole budget can never fit; let it
+        # through once the bucket is full rather than waiting forever.
+        tokens = min(max(0, estimated_tokens), self.tokens_per_minute)
+        started = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    self._refill(time.monotonic())
+                    if self._request_budget >= 1 and self._token_budget >= tokens:
+                        self._request_budget -= 1
+                        self._token_budget -= tokens
+                        break
+                    request_wait = max(0.0, (1 - self._request_budget) * 60 / self.requests_per_minute)
+                    token_wait = max(0.0, (tokens - self._token_budget) * 60 / self.tokens_per_minute)
+                time.sleep(min(max(request_wait, token_wait, 0.01), 5.0))
+        finally:
+            waited = time.monotonic() - started
+            with self._lock:
+                self._waiting -= 1
+                self._total_wait += waited
+                self._max_wait = max(self._max_wait, waited)
+        return waited
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token budget once the real usage is known."""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self._token_budget = min(self.tokens_per_minute, self._token_budget + estimated_tokens - actual_tokens)
+
+    def backoff_delay(self, attempt: int, exc: Exception) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after_seconds(exc)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, fn: Callable, estimated_tokens: int, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` within the rate budget, retrying transient
+        OpenAI errors. The last error is re-raised when retries run out.
+        """
+        def attempt():
+            response = fn(*args, **kwargs)
+            return response, getattr(getattr(response, "usage", None), "total_tokens", None)
+
+        return self._run(attempt, estimated_tokens)
+
+    def call_stream(self, fn: Callable, estimated_tokens: int, read: Callable[[Any], Tuple[Any, Optional[int]]], *args, **kwargs):
+        """
+        `call` for streamed responses. `read(stream)` consumes the stream
+        `fn(*args, **kwargs)` opens and returns (result, total_tokens), with
+        the tokens taken from the final usage chunk. Opening and reading are
+        retried together, so a failure mid-stream starts a fresh request.
+        Returns `read`'s result.
+        """
+        return self._run(lambda: read(fn(*args, **kwargs)), estimated_tokens)
+
+    def _run(self, attempt: Callable[[], Tuple[Any, Optional[int]]], estimated_tokens: int):
+        for n in range(self.max_retries + 1):
+            self.acquire(estimated_tokens)
+            with self._lock:
+                self._in_flight += 1
+                self._requests += 1
+            try:
+                result, actual_tokens = attempt()
+            except Exception as exc:
+                if not _is_retryable(exc) or n >= self.max_retries:
+                    with self._lock:
+                        self._failures += 1
+                    raise
+                delay = self.backoff_delay(n, exc)
+                with self._lock:
+                    self._retries += 1
+                    if _is_rate_limit(exc):
+                        # The server says we are over budget: drain the local
+                        # bucket so other threads back off too.
+                        self._token_budget = min(self._token_budget, 0.0)
+                print(f"⚠️ OpenAI call failed ({type(exc).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+            self.reconcile(estimated_tokens, actual_tokens)
+            return result
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "requests": self._requests,
+                "retries": self._retries,
+                "failures": self._failures,
+                "total_wait_seconds": round(self._total_wait, 2),
+                "max_wait_seconds": round(self._max_wait, 2),
+                "available_requests": int(self._request_budget),
+                "available_tokens": int(self._token_budget),
+            }
+
+
+_scheduler: Optional[RateLimitScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RateLimitScheduler:
+    """Process-wide scheduler shared by every extraction thread and session."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RateLimitScheduler()
+        return _scheduler
@@ -0,0 +1,253 @@
+import copy
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+from settings import get_setting
+
+# JSON schemas for the extraction prompts, sent as `response_format` so the
+# model can only answer with a complete, well-formed record. The same
+# schemas validate (and repair) answers that did not go through structured
+# output: batch results, continued truncated answers and cached responses.
+#
+# Schemas are written as compact specs: None is a nullable string, a dict is
+# an object with exactly those keys, and a one-item list is an array of that
+# item.
+
+STRUCTURED_OUTPUT_ENABLED = str(get_setting("openai", "STRUCTURED_OUTPUT_ENABLED", "true")).strip().lower() not in ("0", "false", "no", "off")
+
+_EMPLOYMENT_SPEC = {
+    "Applicant's Current Employer": None,
+    "Current Employer Details": {
+        "Employment Verification Contact": None,
+        "Address": None,
+        "Phone": None,
+        "E-mail": None,
+        "Position": None,
+        "Start Date": None,
+        "Gross Monthly Income": None,
+    },
+    "Child Support": None,
+}
+
+STANDARD_FORM_SPEC = {
+    "Property Address": None,
+    "Move-in Date": None,
+    "Monthly Rent": None,
+    "FullName": None,
+    "PhoneNumber": None,
+    "Email": None,
+    "DOB": None,
+    "SSN": None,
+    "Co-applicants": [{"Name": None, "Relationship": None}],
+    "Applicant's Current Address": {
+        "Address": None,
+        "Phone:Day": None,
+        "Landlord or Property Manager's Name": None,
+        "Rent": None,
+        "Move-out Date": None,
+        "Reason for Move": None,
+    },
+    "IDType": None,
+    "DriverLicenseNumber": None,
+    "IDIssuer": None,
+    "Nationality": None,
+    "FormSource": None,
+    "ApplicationDate": None,
+    "C.Representation and Marketing": {
+        "Name": None,
+        "Company": None,
+        "E-mail": None,
+        "Phone Number": None,
+    },
+    "Employment and Other Income:": _EMPLOYMENT_SPEC,
+    "E. Occupant Information": [{"Name": None, "Relationship": None, "DOB": None}],
+    "F. Vehicle Information:": [{"Type": None, "Year": None, "Make": None, "Model": None, "Monthly Payment": None}],
+    "G. Animals": [{"Type and Breed": None, "Name": None, "Color": None, "Weight": None, "Age in Yrs": None, "Gender": None}],
+}
+
+# The handwritten TXR-2003 prompt has no move-out date or reason for moving.
+HANDWRITTEN_FORM_SPEC = copy.deepcopy(STANDARD_FORM_SPEC)
+del HANDWRITTEN_FORM_SPEC["Applicant's Current Address"]["Move-out Date"]
+del HANDWRITTEN_FORM_SPEC["Applicant's Current Address"]["Reason for Move"]
+
+
+def spec_to_json_schema(spec) -> Dict:
+    """Translate a compact spec into a strict-mode JSON schema."""
+    if spec is None:
+        return {"type": ["string", "null"]}
+    if isinstance(spec, list):
+        return {"type": "array", "items": spec_to_json_schema(spec[0])}
+    return {
+        "type": "object",
+        "properties": {key: spec_to_json_schema(value) for key, value in spec.items()},
+        "required": list(spec),
+        "additionalProperties": False,
+    }
+
+
+# Response format name -> spec, so answers can be validated by format.
+_SPECS_BY_NAME: Dict[str, Dict] = {}
+
+
+def make_response_format(name: str, spec: Dict) -> Dict:
+    """Build a strict `response_format` and register `spec` for validation under `name`."""
+    _SPECS_BY_NAME[name] = spec
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": spec_to_json_schema(spec)},
+    }
+
+
+STANDARD_FORM_RESPONSE_FORMAT = make_response_format("standard_form_application", STANDARD_FORM_SPEC)
+HANDWRITTEN_FORM_RESPONSE_FORMAT = make_response_format("handwritten_form_application", HANDWRITTEN_FORM_SPEC)
+
+
+def response_format_fingerprint(response_format: Dict) -> str:
+    """Short hash of a response format, for cache keys."""
+    return hashlib.sha256(json.dumps(response_format, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def spec_for_response_format(response_format: Optional[Dict]):
+    if not response_format:
+        return None
+    return _SPECS_BY_NAME.get(response_format.get("json_schema", {}).get("name"))
+
+
+def strip_json_fences(raw: str) -> str:
+    raw = raw.strip()
+    if raw.startswith("```json"):
+        raw = raw[7:]
+    elif raw.startswith("```"):
+        raw = raw[3:]
+    if raw.endswith("```"):
+        raw = raw[:-3]
+    return raw.strip()
+
+
+def get_path(record: Dict, path: Tuple[str, ...]):
+    """The value at `path` in a nested record, or None when any step is missing."""
+    node = record
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
+def is_blank(value) -> bool:
+    return value is None or (isinstance(value, str) and value.strip().lower() in ("", "null", "n/a", "none"))
+
+
+def fill_blanks(target, source):
+    """Fill blank values (and empty lists) in `target` from `source`, recursively."""
+    if isinstance(target, dict) and isinstance(source, dict):
+        for key, value in source.items():
+            if key not in target or is_blank(target[key]) or target[key] == []:
+                target[key] = copy.deepcopy(value)
+            else:
+                target[key] = fill_blanks(target[key], value)
+    return target
+
+
+def conform_to_spec(value, spec, path: str = "") -> Tuple[object, List[str]]:
+    """
+    Coerce `value` into the shape of `spec`.
+
+    Missing keys become null (or an empty list), unknown keys are dropped,
+    numbers become strings and a lone object where a list is expected is
+    wrapped. Returns the conformed value and a description of every repair.
+    """
+    problems: List[str] = []
+    label = path or "<root>"
+
+    if spec is None:
+        if value is None or isinstance(value, str):
+            return value, problems
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            problems.append(f"{label}: number converted to string")
+            return str(value), problems
+        problems.append(f"{label}: expected string, got {type(value).__name__}")
+        return None, problems
+
+    if isinstance(spec, list):
+        if value is None:
+            return [], problems
+        if isinstance(value, dict):
+            problems.append(f"{label}: single object wrapped in a list")
+            value = [value]
+        if not isinstance(value, list):
+            problems.append(f"{label}: expected list, got {type(value).__name__}")
+            return [], problems
+        items = []
+        for i, item in enumerate(value):
+            conformed, item_problems = conform_to_spec(item, spec[0], f"{path}[{i}]")
+            items.append(conformed)
+            problems.extend(item_problems)
+        return items, problems
+
+    if not isinstance(value, dict):
+        problems.append(f"{label}: expected object, got {type(value).__name__}")
+        value = {}
+    result = {}
+    for key, sub_spec in spec.items():
+        sub_path = f"{path}.{key}" if path else key
+        if key not in value:
+            problems.append(f"{sub_path}: missing")
+        conformed, sub_problems = conform_to_spec(value.get(key), sub_spec, sub_path)
+        result[key] = conformed
+        problems.extend(sub_problems)
+    for key in value:
+        if key not in spec:
+            problems.append(f"{path + '.' if path else ''}{key}: not in schema, dropped")
+    return result, problems
+
+
+def validate_gpt_json(raw: str, spec) -> Tuple[Optional[Dict], List[str]]:
+    """
+    Parse a model answer and conform it to `spec`.
+
+    Returns (record, problems). The record is None only when the text is not
+    a JSON object at all; otherwise it always has the full schema shape.
+    """
+    try:
+        data = json.loads(strip_json_fences(raw))
+    except json.JSONDecodeError as e:
+        return None, [f"invalid JSON: {e}"]
+    if not isinstance(data, dict):
+        return None, [f"expected a JSON object, got {type(data).__name__}"]
+    return conform_to_spec(data, spec)
+
+
+def parse_partial_json(text: str) -> Dict:
+    """
+    Top-level members of a JSON object that are already complete in `text`,
+    which may be cut off anywhere (e.g. a response still being streamed).
+    """
+    start = text.find("{")
+    if start < 0:
+        return {}
+    decoder = json.JSONDecoder()
+    fields = {}
+    pos = start + 1
+    end = len(text)
+    while True:
+        while pos < end and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= end or text[pos] != '"':
+            break
+        try:
+            key, pos = decoder.raw_decode(text, pos)
+            while pos < end and text[pos] in " \t\r\n":
+                pos += 1
+            if pos >= end or text[pos] != ":":
+                break
+            pos += 1
+            while pos < end and text[pos] in " \t\r\n":
+                pos += 1
+            value, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            break
+        if isinstance(value, (int, float)) and pos >= end:
+            break  # the number may still be growing
+        fields[key] = value
+    return fields
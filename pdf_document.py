@@ -0,0 +1,155 @@
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import fitz  # PyMuPDF
+from PIL import Image
+from form_layouts import get_form_layout
+from form_text_layer import extract_from_text_layer
+from pdf_render import (
+    DEFAULT_RENDER_PROCESSES,
+    PdfSource,
+    iter_page_images_in_pool,
+    open_pdf,
+    render_page,
+    render_region,
+)
+
+# One open handle per application PDF. Text, form detection, the AcroForm
+# text layer and page images all come from the same fitz.Document, and the
+# PDF can be opened straight from the uploaded bytes without a temp file.
+
+# First pages with less text than this are scans, so they are treated as
+# handwritten and sent to GPT whole.
+OCR_TEXT_THRESHOLD = 50
+
+
+def detect_form_type(text: str, ocr_used: bool = False) -> str:
+    if ocr_used:
+        return "handwritten_form"
+    if "05-15-24" in text or "07-08-22" in text:
+        return "standard_form"
+    elif "2-1-18" in text or "Declawed?" in text:
+        return "handwritten_form"
+    return "unknown"
+
+
+def detect_standard_form_variant(text: str) -> str | None:
+    if "05-15-24" in text:
+        return "Form_B_2024"
+    if "07-08-22" in text:
+        return "Form_A_2022"
+    return None
+
+
+def detect_form_variant(text: str, ocr_used: bool = False) -> str | None:
+    """Identify the exact printed form (for layout-aware rendering), if known."""
+    if ocr_used:
+        return None
+    variant = detect_standard_form_variant(text)
+    if variant:
+        return variant
+    if "2-1-18" in text:
+        return "TXR_2003_2018"
+    return None
+
+
+class PdfDocument:
+    """
+    An application PDF opened once.
+
+    Args:
+        source: PDF path or raw PDF bytes (e.g. `UploadedFile.getvalue()`).
+        name: Display name; defaults to the file name of a path source.
+
+    Use as a context manager, or call `close()`, to release the handle.
+    """
+
+    def __init__(self, source: PdfSource, name: Optional[str] = None):
+        self.source = str(source) if isinstance(source, Path) else source
+        self.name = name or ("document.pdf" if isinstance(source, (bytes, bytearray)) else Path(source).name)
+        self.doc = open_pdf(source)
+        self._first_page_text: Optional[str] = None
+
+    def __enter__(self) -> "PdfDocument":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.doc.close()
+
+    @property
+    def page_count(self) -> int:
+        return self.doc.page_count
+
+    @property
+    def first_page_text(self) -> str:
+        if self._first_page_text is None:
+            try:
+                self._first_page_text = self.doc[0].get_text().strip()
+            except Exception as e:
+                print(f"❌ Error extracting text from first page: {e}")
+                self._first_page_text = ""
+        return self._first_page_text
+
+    @property
+    def ocr_used(self) -> bool:
+        return len(self.first_page_text) < OCR_TEXT_THRESHOLD
+
+    @property
+    def form_type(self) -> str:
+        return detect_form_type(self.first_page_text, ocr_used=self.ocr_used)
+
+    @property
+    def form_variant(self) -> str | None:
+        return detect_form_variant(self.first_page_text, ocr_used=self.ocr_used)
+
+    def read_text_layer(self) -> Tuple[Optional[Dict], List[str]]:
+        """The filled AcroForm widgets as a standard-form record, see `extract_from_text_layer`."""
+        return extract_from_text_layer(self.doc, form_source=detect_standard_form_variant(self.first_page_text))
+
+    def iter_page_images(self, parallel: Optional[bool] = None, max_workers: Optional[int] = None) -> Iterator[Tuple[int, Image.Image]]:
+        """
+        Yield (page_number, image) for every page as soon as it is rendered,
+        so callers can encode pages while later ones are still rendering.
+
+        Sequential rendering reuses the open handle and yields in page
+        order. In parallel mode the render processes open their own copies
+        of the PDF and pages arrive in completion order.
+        """
+        max_workers = max_workers or DEFAULT_RENDER_PROCESSES
+        if parallel is None:
+            parallel = max_workers > 1 and self.page_count > 1
+        try:
+            if not parallel:
+                for page in self.doc:
+                    yield page.number, render_page(page)
+                return
+            yield from iter_page_images_in_pool(self.source, self.page_count, max_workers)
+        except Exception as e:
+            print(f"❌ Failed to extract images from PDF: {e}")
+
+    def page_images(self, parallel: Optional[bool] = None, max_workers: Optional[int] = None) -> List[Image.Image]:
+        """Render every page, in page order."""
+        pages = self.iter_page_images(parallel=parallel, max_workers=max_workers)
+        return [img for _, img in sorted(pages, key=lambda p: p[0])]
+
+    def iter_form_images(self) -> Iterator[Tuple[int, Image.Image]]:
+        """
+        (index, image) pairs to send to GPT, as they are rendered: the
+        layout's region crops for known forms, whole pages otherwise (or
+        when region rendering fails). Sort on index for the GPT order.
+        """
+        try:
+            layout = get_form_layout(self.form_variant, self.page_count)
+            if layout:
+                crops = [render_region(self.doc[region.page], region.box, region.zoom) for region in layout]
+                yield from enumerate(crops)
+                return
+        except Exception as e:
+            print(f"⚠️ Region rendering failed, sending full pages: {e}")
+        yield from self.iter_page_images()
+
+    def form_images(self) -> List[Image.Image]:
+        """`iter_form_images` as a list, in GPT order."""
+        return [img for _, img in sorted(self.iter_form_images(), key=lambda p: p[0])]
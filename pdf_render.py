@@ -0,0 +1,186 @@
+import os
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+import fitz  # PyMuPDF
+from PIL import Image
+
+# This module is imported by the render worker processes, so it must stay
+# free of Streamlit/OpenAI imports to keep worker start-up cheap.
+
+RENDER_ZOOM = 2.0  # 2x zoom gives ~144 DPI (sufficient for clean OCR)
+# Set RENDER_PROCESSES=1 to disable the process pool (e.g. on single-core hosts).
+DEFAULT_RENDER_PROCESSES = int(os.environ.get("RENDER_PROCESSES") or min(4, os.cpu_count() or 1))
+
+PdfSource = str | Path | bytes
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_size = 0
+_render_pool_lock = threading.Lock()
+
+
+def open_pdf(source: PdfSource) -> fitz.Document:
+    """Open a PDF from a filesystem path or from in-memory bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def pixmap_to_image(pix: fitz.Pixmap) -> Image.Image:
+    """
+    Copy a pixmap's RGB samples into a PIL image, without a PNG round trip.
+
+    PIL cannot map 3-byte RGB pixels, so the samples are copied once and the
+    pixmap can be released as soon as this returns.
+    """
+    return Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
+
+
+def render_page(page: fitz.Page, zoom: float = RENDER_ZOOM) -> Image.Image:
+    # alpha=False guarantees a 3-channel RGB buffer that matches pixmap_to_image
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+    return pixmap_to_image(pix)
+
+
+def render_region(page: fitz.Page, box: Tuple[float, float, float, float], zoom: float = RENDER_ZOOM) -> Image.Image:
+    """Render part of a page. `box` is (x0, y0, x1, y1) as fractions of the page."""
+    rect = page.rect
+    clip = fitz.Rect(
+        rect.x0 + box[0] * rect.width,
+        rect.y0 + box[1] * rect.height,
+        rect.x0 + box[2] * rect.width,
+        rect.y0 + box[3] * rect.height,
+    )
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False, clip=clip)
+    return pixmap_to_image(pix)
+
+
+# The document a render worker opened last, as (path, mtime_ns, document).
+# Every page of a PDF is sent to the same pool, so workers reopen a file
+# only when they switch to another one.
+_worker_document: Optional[Tuple[str, int, fitz.Document]] = None
+
+
+def _open_worker_document(path: str) -> fitz.Document:
+    global _worker_document
+    mtime_ns = os.stat(path).st_mtime_ns
+    if _worker_document is None or _worker_document[:2] != (path, mtime_ns):
+        if _worker_document is not None:
+            _worker_document[2].close()
+        _worker_document = (path, mtime_ns, fitz.open(path))
+    return _worker_document[2]
+
+
+def render_page_samples(path: str, page_number: int, zoom: float = RENDER_ZOOM) -> Tuple[int, int, int, int, bytes]:
+    """Render one page of the PDF at `path` to raw RGB samples. Runs inside render worker processes."""
+    doc = _open_worker_document(path)
+    pix = doc[page_number].get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+    return page_number, pix.width, pix.height, pix.stride, pix.samples
+
+
+def _get_render_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Return the shared render pool, (re)creating it if the size changed or it broke."""
+    global _render_pool, _render_pool_size
+    with _render_pool_lock:
+        if _render_pool is None or _render_pool_size != max_workers:
+            if _render_pool is not None:
+                _render_pool.shutdown(wait=False, cancel_futures=True)
+            # "spawn" avoids forking a process that already runs Streamlit and
+            # extraction threads.
+            _render_pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _render_pool_size = max_workers
+        return _render_pool
+
+
+def _reset_render_pool() -> None:
+    global _render_pool, _render_pool_size
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+        _render_pool_size = 0
+
+
+def iter_page_images(
+    source: PdfSource,
+    parallel: Optional[bool] = None,
+    max_workers: Optional[int] = None,
+    zoom: float = RENDER_ZOOM,
+) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    Yield (page_number, PIL image) pairs as pages finish rendering.
+
+    Args:
+        source: PDF path or raw PDF bytes.
+        parallel: Render pages in the shared process pool. None picks parallel
+            mode automatically for multi-page documents when more than one
+            render process is configured.
+        max_workers: Render processes to use (default DEFAULT_RENDER_PROCESSES).
+        zoom: Render scale factor.
+
+    Notes:
+        - In parallel mode pages are yielded in completion order, not page order.
+        - Sequential mode yields in page order and opens the document once.
+    """
+    max_workers = max_workers or DEFAULT_RENDER_PROCESSES
+
+    with open_pdf(source) as doc:
+        page_count = doc.page_count
+        if parallel is None:
+            parallel = max_workers > 1 and page_count > 1
+        if not parallel:
+            for page in doc:
+                yield page.number, render_page(page, zoom)
+            return
+
+    yield from iter_page_images_in_pool(source, page_count, max_workers, zoom)
+
+
+def iter_page_images_in_pool(
+    source: PdfSource,
+    page_count: int,
+    max_workers: Optional[int] = None,
+    zoom: float = RENDER_ZOOM,
+) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    Render `page_count` pages of `source` in the shared process pool, yielding
+    (page_number, image) in completion order.
+
+    For callers that already hold the document open and know its page count.
+    """
+    temp_path = None
+    if isinstance(source, (bytes, bytearray)):
+        # Workers get a path, not a pickled copy of the PDF for every page.
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            tmp.write(source)
+        path = temp_path = tmp.name
+    else:
+        path = str(source)
+
+    pool = _get_render_pool(max_workers or DEFAULT_RENDER_PROCESSES)
+    futures = []
+    try:
+        futures = [pool.submit(render_page_samples, path, n, zoom) for n in range(page_count)]
+        for future in as_completed(futures):
+            page_number, width, height, stride, samples = future.result()
+            yield page_number, Image.frombuffer("RGB", (width, height), samples, "raw", "RGB", stride, 1)
+    except BrokenProcessPool:
+        _reset_render_pool()
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+        if temp_path:
+            # Pages still rendering when the caller stopped early may hold
+            # the file open; they only fail to re-open it.
+            try:
+                os.remove(temp_path)
+            except OSError as e:
+                print(f"⚠️ Could not remove render temp file {temp_path}: {e}")
@@ -0,0 +1,266 @@
+import os
+import re
+import threading
+from difflib import SequenceMatcher
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+import openpyxl
+from settings import get_setting
+
+# In-memory index of PropertyInfo.xlsx (column B: P-number, column C:
+# address, column D: square feet). The workbook is read once per process
+# and again only when the file on disk changes, so template writes look
+# properties up in memory instead of re-reading the workbook.
+#
+# Addresses are matched on normalized tokens: the street type and
+# directionals are folded to their USPS abbreviations ("North" -> "n",
+# "Street" -> "st"), unit designators after the street type are dropped
+# ("Apt 4"), and candidates are
+# the properties sharing the house number (or, without one, a street-name
+# token n-gram) with the query. Each candidate is scored by how much of its
+# address appears in the query.
+
+PROPERTY_INFO_PATH = get_setting("app", "PROPERTY_INFO_PATH", "PropertyInfo.xlsx")
+try:
+    PROPERTY_MATCH_MIN_SCORE = float(get_setting("app", "PROPERTY_MATCH_MIN_SCORE", 0.75))
+except (TypeError, ValueError):
+    PROPERTY_MATCH_MIN_SCORE = 0.75
+
+DIRECTIONALS = {
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw",
+}
+
+STREET_SUFFIXES = {
+    "avenue": "ave", "av": "ave", "boulevard": "blvd", "circle": "cir", "court": "ct",
+    "cove": "cv", "crossing": "xing", "drive": "dr", "expressway": "expy", "freeway": "fwy",
+    "highway": "hwy", "hollow": "holw", "lane": "ln", "loop": "loop", "parkway": "pkwy",
+    "place": "pl", "plaza": "plz", "point": "pt", "road": "rd", "square": "sq",
+    "street": "st", "str": "st", "terrace": "ter", "trail": "trl", "way": "way",
+}
+
+UNIT_DESIGNATORS = {"apt", "apartment", "unit", "ste", "suite", "bldg", "building", "rm", "room", "lot"}
+
+# Suffixes and directionals carry less weight than the house number and
+# street name, so "6930 Tara" still matches "6930 Tara Dr".
+_MINOR_TOKENS = set(DIRECTIONALS.values()) | set(STREET_SUFFIXES.values())
+_MINOR_WEIGHT = 0.25
+# Street-name tokens count as matching when this similar (typos such as
+# "Waterlilly" / "Waterlily").
+_FUZZY_TOKEN_RATIO = 0.85
+
+
+_STREET_TYPES = set(STREET_SUFFIXES) | set(STREET_SUFFIXES.values())
+# What may follow a unit designator: "4", "12b", "b2", "c".
+_UNIT_ID_RE = re.compile(r"[a-z]?\d+[a-z]?|[a-z]")
+_UNIT_SIGN_RE = re.compile(r"(?:\b(?:%s)\s*)?#\s*" % "|".join(sorted(UNIT_DESIGNATORS)))
+
+
+def _is_unit(tokens: List[str], i: int) -> bool:
+    return tokens[i] in UNIT_DESIGNATORS and i + 1 < len(tokens) and bool(_UNIT_ID_RE.fullmatch(tokens[i + 1]))
+
+
+def _street_type_index(tokens: List[str]) -> Optional[int]:
+    """
+    Index of the street-type token ("St" in "12 Court St Apt 4"): a suffix
+    word after the street name that ends the street part, i.e. is followed
+    only by directionals and/or a unit designator with its id.
+    """
+    for i in range(len(tokens) - 1, 0, -1):
+        if tokens[i] not in _STREET_TYPES or all(t.isdigit() for t in tokens[:i]):
+            continue
+        rest = i + 1
+        while rest < len(tokens) and tokens[rest] in DIRECTIONALS:
+            rest += 1
+        if rest == len(tokens) or _is_unit(tokens, rest):
+            return i
+    return None
+
+
+def normalize_address_tokens(address) -> List[str]:
+    """
+    Street tokens of an address with the street type and directionals folded
+    and unit designators dropped. Suffix and unit words that are part of the
+    street name ("Court" in "Court St", "Lot" in "1 Lot Rd") are kept.
+    """
+    text = str(address or "").lower()
+    text = _UNIT_SIGN_RE.sub(" unit ", text)  # "#4", "Apt # 12B"
+    tokens = re.sub(r"[^a-z0-9]+", " ", text).split()
+
+    street_type = _street_type_index(tokens)
+    name_words = [t for t in tokens[:street_type] if not t.isdigit()]
+    result: List[str] = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if street_type is not None and i > street_type and _is_unit(tokens, i):
+            i += 2
+            continue
+        if i == street_type:
+            token = STREET_SUFFIXES.get(token, token)
+        elif token in DIRECTIONALS and name_words != [token]:
+            # "North" stays a name in "1 North Rd".
+            token = DIRECTIONALS[token]
+        result.append(token)
+        i += 1
+    return result
+
+
+def address_key(address) -> str:
+    return " ".join(normalize_address_tokens(address))
+
+
+def _house_number(tokens: List[str]) -> Optional[str]:
+    return tokens[0] if tokens and tokens[0].isdigit() else None
+
+
+def _token_weight(token: str) -> float:
+    return _MINOR_WEIGHT if token in _MINOR_TOKENS else 1.0
+
+
+def _name_grams(tokens: List[str]) -> Set[str]:
+    """Unigrams and bigrams of the street-name tokens (house number, suffixes and directionals left out)."""
+    words = [t for t in tokens[1 if _house_number(tokens) else 0:] if t not in _MINOR_TOKENS]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def score_address(query_tokens: List[str], property_tokens: List[str]) -> float:
+    """
+    Weighted share of the property's tokens found in the query, 0..1.
+    Different house numbers always score 0.
+    """
+    if not query_tokens or not property_tokens:
+        return 0.0
+    query_number, property_number = _house_number(query_tokens), _house_number(property_tokens)
+    if query_number and property_number and query_number != property_number:
+        return 0.0
+
+    query_set = set(query_tokens)
+    total = matched = 0.0
+    for token in property_tokens:
+        weight = _token_weight(token)
+        total += weight
+        if token in query_set:
+            matched += weight
+        elif weight == 1.0 and not token.isdigit():
+            best = max((SequenceMatcher(None, token, q).ratio() for q in query_set if not q.isdigit()), default=0.0)
+            if best >= _FUZZY_TOKEN_RATIO:
+                matched += weight * best
+    return matched / total
+
+
+class PropertyMatch(NamedTuple):
+    p_number: object
+    sqft: object
+    address: str
+    score: float
+
+
+class PropertyIndex:
+    """Normalized-address index of the properties; the first row for an address wins."""
+
+    def __init__(self, rows):
+        self._properties: List[Tuple[object, object, str, List[str]]] = []
+        self._by_key: Dict[str, int] = {}
+        self._by_number: Dict[str, List[int]] = {}
+        self._by_gram: Dict[str, List[int]] = {}
+
+        for p_number, address, sqft in rows:
+            tokens = normalize_address_tokens(address)
+            key = " ".join(tokens)
+            if not key or key in self._by_key:
+                continue
+            i = len(self._properties)
+            self._properties.append((p_number, sqft, str(address).strip(), tokens))
+            self._by_key[key] = i
+            number = _house_number(tokens)
+            if number:
+                self._by_number.setdefault(number, []).append(i)
+            for gram in _name_grams(tokens):
+                self._by_gram.setdefault(gram, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self._properties)
+
+    def _candidates(self, tokens: List[str]) -> List[int]:
+        number = _house_number(tokens)
+        if number:
+            return self._by_number.get(number, [])
+        found: Set[int] = set()
+        for gram in _name_grams(tokens):
+            found.update(self._by_gram.get(gram, ()))
+        return sorted(found)
+
+    def match(self, address, min_score: float = PROPERTY_MATCH_MIN_SCORE) -> Optional[PropertyMatch]:
+        """Best-scoring property for `address`, or None when nothing scores `min_score` or more."""
+        tokens = normalize_address_tokens(address)
+        if not tokens:
+            return None
+
+        exact = self._by_key.get(" ".join(tokens))
+        if exact is not None:
+            p_number, sqft, original, _ = self._properties[exact]
+            return PropertyMatch(p_number, sqft, original, 1.0)
+
+        best, best_rank = None, None
+        for i in self._candidates(tokens):
+            p_number, sqft, original, property_tokens = self._properties[i]
+            score = score_address(tokens, property_tokens)
+            # Ties go to the more specific property address.
+            rank = (score, sum(_token_weight(t) for t in property_tokens))
+            if score >= min_score and (best_rank is None or rank > best_rank):
+                best, best_rank = PropertyMatch(p_number, sqft, original, score), rank
+        return best
+
+    def lookup(self, address) -> Tuple[Optional[object], Optional[object]]:
+        found = self.match(address)
+        return (found.p_number, found.sqft) if found else (None, None)
+
+    @classmethod
+    def from_workbook(cls, path: str) -> "PropertyIndex":
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = (
+                (row[1], row[2], row[3])
+                for row in wb.active.iter_rows(min_row=2, max_col=4, values_only=True)
+                if len(row) >= 4
+            )
+            return cls(rows)
+        finally:
+            wb.close()
+
+
+# path -> (file signature, index)
+_indexes: Dict[str, Tuple[Tuple[int, int], PropertyIndex]] = {}
+_indexes_lock = threading.Lock()
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_property_index(path: str = PROPERTY_INFO_PATH) -> PropertyIndex:
+    """The index for `path`, rebuilt only when the file's mtime or size changes."""
+    signature = _file_signature(path)
+    with _indexes_lock:
+        cached = _indexes.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        index = PropertyIndex.from_workbook(path)
+        _indexes[path] = (signature, index)
+        print(f"✅ Loaded {len(index)} properties from {path}")
+        return index
+
+
+def match_property(address, path: str = PROPERTY_INFO_PATH, min_score: float = PROPERTY_MATCH_MIN_SCORE) -> Optional[PropertyMatch]:
+    """Best `PropertyMatch` for `address` (with its score), or None."""
+    if not address:
+        return None
+    return get_property_index(path).match(address, min_score)
+
+
+def lookup_property(address, path: str = PROPERTY_INFO_PATH) -> Tuple[Optional[object], Optional[object]]:
+    """(P-number, sqft) of the property at `address`, or (None, None)."""
+    if not address:
+        return None, None
+    return get_property_index(path).lookup(address)
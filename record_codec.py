@@ -0,0 +1,62 @@
+import ast
+import json
+from typing import Dict, List
+
+# Typed handling of the list-of-object fields in flattened records. The
+# applicant store keeps them as native JSON; these helpers make sure every
+# reader gets real lists of dicts, including records that passed through a
+# spreadsheet (where lists were written as their Python repr).
+
+NESTED_FIELDS: Dict[str, tuple] = {
+    "Co-applicants": ("Name", "Relationship"),
+    "E. Occupant Information": ("Name", "Relationship", "DOB"),
+    "G. Animals": ("Type and Breed", "Name", "Color", "Weight", "Age in Yrs", "Gender"),
+}
+
+
+def decode_nested(value) -> List[Dict]:
+    """
+    Return a nested field as a list of dicts.
+
+    Lists pass through (non-dict items dropped), a single dict is wrapped,
+    JSON or Python-repr strings are parsed once, and blanks/NaN become [].
+    """
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict)]
+    if isinstance(value, dict):
+        return [value]
+    if not isinstance(value, str) or not value.strip():
+        return []
+
+    text = value.strip()
+    if text[0] not in "[{":
+        return []
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            return decode_nested(parse(text))
+        except (ValueError, SyntaxError, TypeError):
+            continue
+    return []
+
+
+def nested_field(record, field: str) -> List[Dict]:
+    """`decode_nested(record[field])` for a dict or pandas row."""
+    return decode_nested(record.get(field))
+
+
+def normalize_record(record: Dict) -> Dict:
+    """Copy of `record` with every nested field decoded to a list of dicts."""
+    normalized = dict(record)
+    for field in NESTED_FIELDS:
+        if field in normalized:
+            normalized[field] = decode_nested(normalized[field])
+    return normalized
+
+
+def encode_for_excel(record: Dict) -> Dict:
+    """Copy of `record` with nested fields as JSON text, which `decode_nested` reads back exactly."""
+    encoded = dict(record)
+    for field in NESTED_FIELDS:
+        if field in encoded:
+            encoded[field] = json.dumps(decode_nested(encoded[field]))
+    return encoded
@@ -0,0 +1,31 @@
+import os
+import streamlit as st
+
+
+def get_setting(section: str, key: str, default=None):
+    """
+    Look up a configuration value.
+
+    The environment variable named `key` wins, then `st.secrets[section][key]`,
+    then `default`. This lets the same code run inside Streamlit and from
+    plain Python processes that have no secrets.toml.
+    """
+    value = os.environ.get(key)
+    if value not in (None, ""):
+        return value
+
+    try:
+        value = st.secrets[section][key]
+        if value not in (None, ""):
+            return value
+    except Exception:
+        pass
+
+    return default
+
+
+def get_int_setting(section: str, key: str, default: int) -> int:
+    try:
+        return int(get_setting(section, key, default))
+    except (TypeError, ValueError):
+        return default
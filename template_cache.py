@@ -0,0 +1,69 @@
+import copy
+import copyreg
+import os
+import threading
+import zipfile
+from typing import Dict, Tuple
+import openpyxl
+from openpyxl.utils.indexed_list import IndexedList
+from openpyxl.workbook.workbook import Workbook
+
+# Parsed Excel templates. Each template is parsed once (and again only when
+# the file on disk changes); writers get a deep copy, which is several times
+# cheaper than `openpyxl.load_workbook` on the styled templates and can be
+# filled and saved without affecting the cached original.
+
+# IndexedList restores its lookup dict before its items when deep-copied,
+# which makes `append` drop every item and leaves the copied workbook with
+# empty style tables. Rebuild it from its items instead.
+copyreg.pickle(IndexedList, lambda indexed: (IndexedList, (list(indexed),)))
+
+# path -> (file signature, parsed workbook); the cached workbooks are never written to.
+_templates: Dict[str, Tuple[Tuple[int, int], Workbook]] = {}
+_templates_lock = threading.Lock()
+
+# path -> (file signature, {part name: bytes}) for the XML patching engine.
+_template_parts: Dict[str, Tuple[Tuple[int, int], Dict[str, bytes]]] = {}
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parsed_template(path: str) -> Workbook:
+    signature = _file_signature(path)
+    with _templates_lock:
+        cached = _templates.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        wb = openpyxl.load_workbook(path)
+        _templates[path] = (signature, wb)
+        return wb
+
+
+def load_template(path: str) -> Workbook:
+    """A fresh, independent copy of the workbook at `path`."""
+    return copy.deepcopy(_parsed_template(path))
+
+
+def load_template_parts(path: str) -> Dict[str, bytes]:
+    """
+    The decompressed zip parts of the template at `path`, in archive order.
+    The dict is shared between callers and must not be modified.
+    """
+    signature = _file_signature(path)
+    with _templates_lock:
+        cached = _template_parts.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        with zipfile.ZipFile(path) as zf:
+            parts = {name: zf.read(name) for name in zf.namelist()}
+        _template_parts[path] = (signature, parts)
+        return parts
+
+
+def clear_template_cache() -> None:
+    with _templates_lock:
+        _templates.clear()
+        _template_parts.clear()
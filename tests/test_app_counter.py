@@ -0,0 +1,32 @@
+import threading
+
+from app_counter import current_application_number, next_application_number
+
+
+def test_numbers_start_at_start_and_increase(tmp_path):
+    path = str(tmp_path / "counter.sqlite3")
+    assert current_application_number(path=path) is None
+    assert next_application_number(path=path, start=636) == 636
+    assert next_application_number(path=path, start=636) == 637
+    assert next_application_number("other", path=path, start=1) == 1
+    assert current_application_number(path=path) == 637
+
+
+def test_concurrent_callers_get_unique_contiguous_numbers(tmp_path):
+    path = str(tmp_path / "counter.sqlite3")
+    numbers, lock = [], threading.Lock()
+
+    def worker():
+        for _ in range(25):
+            number = next_application_number(path=path, start=100)
+            with lock:
+                numbers.append(number)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(numbers) == list(range(100, 300))
+    assert current_application_number(path=path) == 299
@@ -0,0 +1,70 @@
+from applicant_store import load_applicants, load_applicants_cached, store_version, update_applicant, upsert_records
+
+
+def _record(name, source="a.pdf", **extra):
+    return {"FullName": name, "Property Address": "6930 Tara Dr", "ApplicationDate": "2025-06-01", "SourceFile": source, **extra}
+
+
+def test_corrected_record_is_updated_not_duplicated(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    [applicant_id] = upsert_records([_record("Jon Smith")], path=path)
+
+    assert update_applicant(applicant_id, {"FullName": "John Smith"}, path=path)
+    assert upsert_records([_record("John Smith", Email="john@example.com")], path=path) == [applicant_id]
+
+    df = load_applicants(path=path)
+    assert list(df.index) == [applicant_id]
+    assert df.loc[applicant_id, "FullName"] == "John Smith"
+    assert df.loc[applicant_id, "Email"] == "john@example.com"
+
+
+def test_correction_onto_an_existing_identity_folds_the_rows(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    kept_id, other_id = upsert_records(
+        [_record("Jon Smith", Phone="555-0100"), _record("John Smith", source="b.pdf", Email="john@example.com")],
+        path=path,
+    )
+
+    assert update_applicant(kept_id, {"FullName": "John Smith"}, path=path)
+
+    df = load_applicants(path=path)
+    assert list(df.index) == [kept_id]
+    assert df.loc[kept_id, "SourceFile"] == "a.pdf"
+    assert df.loc[kept_id, "Phone"] == "555-0100"
+    assert df.loc[kept_id, "Email"] == "john@example.com"
+    assert upsert_records([_record("John Smith")], path=path) == [kept_id]
+
+
+def test_cached_load_is_reused_until_the_store_changes(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    [ann_id] = upsert_records([_record("Ann Lee")], path=path)
+
+    first = load_applicants_cached(path=path)
+    assert load_applicants_cached(path=path) is first
+    assert load_applicants_cached(search="ann", path=path) is not first
+
+    version = store_version(path)
+    upsert_records([_record("Bo Diaz")], path=path)
+    assert store_version(path) != version
+    second = load_applicants_cached(path=path)
+    assert second is not first and sorted(second["FullName"]) == ["Ann Lee", "Bo Diaz"]
+
+    update_applicant(ann_id, {"Email": "ann@example.com"}, path=path)
+    third = load_applicants_cached(path=path)
+    assert third is not second and third.loc[ann_id, "Email"] == "ann@example.com"
+
+
+def test_search_matches_percent_and_underscore_literally(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    upsert_records(
+        [
+            _record("Ann 100% Lee", source="a.pdf"),
+            _record("Bo_b Smith", source="b.pdf"),
+            _record("Carl Jones", source="c.pdf"),
+        ],
+        path=path,
+    )
+
+    assert list(load_applicants(search="100%", path=path)["FullName"]) == ["Ann 100% Lee"]
+    assert list(load_applicants(search="o_b", path=path)["FullName"]) == ["Bo_b Smith"]
+    assert list(load_applicants(search="%", path=path)["FullName"]) == ["Ann 100% Lee"]
@@ -0,0 +1,65 @@
+import json
+import os
+
+import fitz
+import pytest
+
+import batch_cli
+from applicant_store import load_applicants
+from batch_cli import find_pdfs, format_throughput, percentile, process_pdfs
+
+
+def _write_pdf(path, text="Residential Lease Application for Tenancy 05-15-24"):
+    doc = fitz.open()
+    doc.new_page().insert_text((50, 40), text)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_find_pdfs_expands_folders_globs_and_dedupes(tmp_path):
+    top = _write_pdf(tmp_path / "a.pdf")
+    upper = _write_pdf(tmp_path / "B.PDF")
+    (tmp_path / "notes.txt").write_text("not a pdf")
+    (tmp_path / "sub").mkdir()
+    nested = _write_pdf(tmp_path / "sub" / "c.pdf")
+
+    assert find_pdfs([str(tmp_path)]) == sorted([top, upper])
+    assert find_pdfs([str(tmp_path)], recursive=True) == sorted([top, upper, nested])
+    assert find_pdfs([str(tmp_path / "**" / "*.pdf")]) == sorted([top, nested])
+    assert find_pdfs([str(tmp_path), top, os.path.relpath(top)]) == sorted([top, upper])
+    assert find_pdfs([str(tmp_path / "missing.pdf")]) == []
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([4.0, 1.0, 3.0, 2.0], 50) == 2.5
+    assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 95) == pytest.approx(4.8)
+    assert percentile([1.0, 2.0], 100) == 2.0
+
+
+def test_process_pdfs_stores_records_as_files_finish(tmp_path, monkeypatch):
+    def extract(doc, use_cache=True):
+        if "bad" in doc.name:
+            return {"error": "GPT output failed schema validation: invalid JSON"}
+        return {"GPT_Output": json.dumps({"FullName": doc.name.split(".")[0].title(), "Property Address": "6930 Tara Dr"})}
+
+    monkeypatch.setattr(batch_cli, "extract_from_document", extract)
+    paths = [_write_pdf(tmp_path / name) for name in ("ann.pdf", "bo.pdf", "bad.pdf")]
+    paths.append(_write_pdf(tmp_path / "unknown.pdf", text="A page that is not any known rental application form."))
+    store = str(tmp_path / "store.sqlite3")
+    seen = []
+
+    results = process_pdfs(paths, max_workers=2, store_path=store, on_result=lambda r, done, total: seen.append((done, total)))
+
+    assert seen == [(1, 4), (2, 4), (3, 4), (4, 4)]
+    by_name = {os.path.basename(r.path): r for r in results}
+    assert by_name["ann.pdf"].record["SourceFile"] == "ann.pdf"
+    assert set(by_name["ann.pdf"].timings) == set(batch_cli.STAGES)
+    assert by_name["bad.pdf"].error.startswith("GPT output failed")
+    assert by_name["unknown.pdf"].error.startswith("Unsupported or unknown form type")
+
+    stored = load_applicants(path=store)
+    assert sorted(stored["FullName"]) == ["Ann", "Bo"]
+    assert "2 stored, 2 failed" in format_throughput(results, 1.0)
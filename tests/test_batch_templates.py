@@ -0,0 +1,85 @@
+import csv
+import io
+import zipfile
+
+import batch_templates
+from batch_templates import REPORT_NAME, group_by_property, write_batch_zip
+
+
+def _applicant(name, address, **extra):
+    return {"FullName": name, "Property Address": address, "Monthly Rent": "1200", **extra}
+
+
+def test_group_by_property_folds_address_spellings():
+    records = [
+        _applicant("Ann Lee", "6930 Tara Drive"),
+        _applicant("Bo Diaz", "12 Court St"),
+        _applicant("Cy Park", "6930 tara dr."),
+        _applicant("Di Moss", "6930 Tara Dr Apt 4"),
+        _applicant("No Address", ""),
+        _applicant("Ed Ray", "12 Court Street"),
+    ]
+
+    groups = group_by_property(records)
+
+    assert [(address, [r["FullName"] for r in members]) for address, members in groups] == [
+        ("6930 Tara Drive", ["Ann Lee", "Cy Park", "Di Moss"]),
+        ("12 Court St", ["Bo Diaz", "Ed Ray"]),
+    ]
+
+
+def test_group_by_property_blanks_nan_fields():
+    [(_, [record])] = group_by_property([_applicant("Ann Lee", "6930 Tara Dr", Email=float("nan"))])
+    assert record["Email"] == ""
+
+
+def test_write_batch_zip_layout_and_report():
+    records = [
+        _applicant("Ann Lee", "6930 Tara Dr"),
+        _applicant("Cy Park", "6930 Tara Drive"),
+        _applicant("Bo Diaz", "12 Court St."),
+    ]
+    progress = []
+    output = io.BytesIO()
+
+    reports = write_batch_zip(records, output, max_workers=1, on_progress=lambda done, total, r: progress.append((done, total)))
+
+    assert progress == [(1, 2), (2, 2)]
+    assert all(r.error is None for r in reports)
+    with zipfile.ZipFile(output) as zf:
+        names = zf.namelist()
+        report_rows = list(csv.DictReader(io.StringIO(zf.read(REPORT_NAME).decode())))
+
+    assert names[-1] == REPORT_NAME
+    folders = {name.split("/")[0] for name in names if "/" in name}
+    assert folders == {"6930_Tara_Dr", "12_Court_St"}
+    for report in reports:
+        assert len(report.files) == 2  # tenant template + summary
+        assert all(path in names and path.endswith(".xlsx") for path in report.files)
+    assert [(row["Property Address"], row["Applicants"], row["Error"]) for row in report_rows] == [
+        ("6930 Tara Dr", "2", ""),
+        ("12 Court St.", "1", ""),
+    ]
+    assert report_rows[0]["Files"] == "; ".join(reports[0].files)
+
+
+def test_write_batch_zip_reports_failed_groups(monkeypatch):
+    real_build = batch_templates.build_group_outputs
+
+    def build(address, records, engine=None):
+        if address.startswith("12"):
+            return real_build(address, records, engine, single_template="templates/missing.xlsx")
+        return real_build(address, records, engine)
+
+    monkeypatch.setattr(batch_templates, "build_group_outputs", build)
+    output = io.BytesIO()
+
+    reports = write_batch_zip([_applicant("Ann Lee", "6930 Tara Dr"), _applicant("Bo Diaz", "12 Court St")], output, max_workers=1)
+
+    failed = [r for r in reports if r.error]
+    assert [(r.property_address, r.files) for r in failed] == [("12 Court St", [])]
+    with zipfile.ZipFile(output) as zf:
+        rows = {row["Property Address"]: row for row in csv.DictReader(io.StringIO(zf.read(REPORT_NAME).decode()))}
+        assert not any(name.startswith("12_Court_St/") for name in zf.namelist())
+    assert rows["12 Court St"]["Error"] == failed[0].error
+    assert rows["6930 Tara Dr"]["Error"] == ""
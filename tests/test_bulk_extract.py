@@ -0,0 +1,104 @@
+import json
+
+import fitz
+import pytest
+
+from bulk_extract import (
+    download_batch_results,
+    make_openai_client,
+    pending_batches,
+    prepare_batch,
+    record_batch,
+    run_bulk_extraction,
+    submit_batch,
+    update_batch_status,
+    wait_for_batch,
+)
+from fake_batch_server import FakeBatchServer
+
+
+def _pdf(form_marker, widgets=None):
+    doc = fitz.open()
+    page = doc.new_page()
+    # Enough page text that detection does not treat the page as a scan.
+    page.insert_text((50, 40), f"Residential Lease Application for Tenancy {form_marker}")
+    for i, (name, value) in enumerate((widgets or {}).items()):
+        widget = fitz.Widget()
+        widget.field_name = name
+        widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+        widget.field_value = value
+        widget.rect = fitz.Rect(50, 80 + i * 20, 300, 95 + i * 20)
+        page.add_widget(widget)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("GPT_CACHE_ENABLED", "false")
+    return make_openai_client
+
+
+def test_run_bulk_extraction_against_fake_server(client):
+    sources = [
+        ("standard.pdf", _pdf("05-15-24", {"Applicant Name": "Ann Lee", "Property Address": "6930 Tara Dr"})),
+        ("handwritten.pdf", _pdf("2-1-18 Declawed?")),
+        ("broken.pdf", _pdf("2-1-18 Declawed?")),
+    ]
+    responses = {
+        # GPT misreads a field the widgets already have; the widget value wins.
+        "standard.pdf": json.dumps({"FullName": "Anne Leigh", "Monthly Rent": "1200"}),
+        # Fenced answer missing most keys: conformed to the full schema shape.
+        "handwritten.pdf": '```json\n{"FullName": "Bo Diaz", "Unexpected": 1}\n```',
+        "broken.pdf": "Sorry, I cannot read this form.",
+    }
+
+    with FakeBatchServer(responses) as server:
+        records, errors = run_bulk_extraction(sources, client=client(base_url=server.base_url), poll_interval=0, timeout=30)
+
+        sent = server.requests_seen
+        assert set(sent) == {"standard.pdf", "handwritten.pdf", "broken.pdf"}
+
+    assert set(records) == {"standard.pdf", "handwritten.pdf"}
+    assert records["standard.pdf"]["FullName"] == "Ann Lee"
+    assert records["standard.pdf"]["Property Address"] == "6930 Tara Dr"
+    assert records["standard.pdf"]["Monthly Rent"] == "1200"
+    assert records["handwritten.pdf"]["FullName"] == "Bo Diaz"
+    assert "Unexpected" not in records["handwritten.pdf"]
+    assert errors == {"broken.pdf": errors["broken.pdf"]}
+    assert errors["broken.pdf"].startswith("GPT output failed schema validation")
+
+
+def test_submitted_batches_are_collected_from_the_store(client, tmp_path):
+    store = str(tmp_path / "batches.sqlite3")
+    sources = [("standard.pdf", _pdf("05-15-24", {"Applicant Name": "Ann Lee", "Property Address": "6930 Tara Dr"}))]
+
+    with FakeBatchServer({"standard.pdf": json.dumps({"FullName": "Anne Leigh"})}) as server:
+        openai_client = client(base_url=server.base_url)
+        payload, _, pending = prepare_batch(sources)
+        batch_id = submit_batch(openai_client, payload)
+        record_batch(batch_id, pending, path=store)
+
+        # A later session only has the store to go on.
+        [stored] = pending_batches(path=store)
+        assert stored.batch_id == batch_id
+        assert stored.pending == json.loads(json.dumps(pending))
+
+        batch = wait_for_batch(openai_client, batch_id, poll_interval=0, timeout=30)
+        update_batch_status(batch_id, batch.status, collected=True, path=store)
+        results = download_batch_results(openai_client, batch, stored.pending)
+
+    assert json.loads(results["standard.pdf"]["GPT_Output"])["FullName"] == "Ann Lee"
+    assert pending_batches(path=store) == []
+
+
+def test_status_updates_keep_a_batch_pending(tmp_path):
+    store = str(tmp_path / "batches.sqlite3")
+    record_batch("batch_1", {"a.pdf": {"form_type": "handwritten_form", "text_layer_record": None}}, path=store)
+    update_batch_status("batch_1", "in_progress", path=store)
+
+    [stored] = pending_batches(path=store)
+    assert stored.status == "in_progress"
+    assert list(stored.pending) == ["a.pdf"]
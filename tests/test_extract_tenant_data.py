@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+
+import extract_tenant_data
+from openai_scheduler import RateLimitScheduler
+
+FORMAT = {"type": "json_schema", "json_schema": {"name": "x", "strict": True, "schema": {}}}
+
+
+def _response(content, finish_reason):
+    message = SimpleNamespace(content=content, refusal=None)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)], usage=None)
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    """Queue of canned responses for openai.chat.completions.create; records each request."""
+    calls, responses = [], []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return responses.pop(0)
+
+    monkeypatch.setattr(extract_tenant_data.openai.chat.completions, "create", create)
+    monkeypatch.setattr(extract_tenant_data, "get_scheduler", lambda: RateLimitScheduler(base_delay=0, max_delay=0))
+    return SimpleNamespace(calls=calls, responses=responses)
+
+
+def test_truncated_answer_is_continued(completions):
+    completions.responses += [_response('{"FullName": "Ann', "length"), _response(' Lee"}', "stop")]
+
+    content, error = extract_tenant_data._complete_with_continuation(
+        [{"role": "user", "content": "extract"}], "gpt-4o", 5, estimated_tokens=100, response_format=FORMAT,
+    )
+
+    assert (content, error) == ('{"FullName": "Ann Lee"}', None)
+    first, second = completions.calls
+    assert first["response_format"] == FORMAT
+    # Continuations carry no schema: the rest of the JSON text would not match it.
+    assert "response_format" not in second
+    assert second["messages"][-2:] == [
+        {"role": "assistant", "content": '{"FullName": "Ann'},
+        {"role": "user", "content": extract_tenant_data.CONTINUE_PROMPT},
+    ]
+
+
+def test_continuations_are_capped(completions, monkeypatch):
+    monkeypatch.setattr(extract_tenant_data, "MAX_CONTINUATIONS", 1)
+    completions.responses += [_response('{"a": "', "length"), _response("b", "length")]
+
+    content, error = extract_tenant_data._complete_with_continuation(
+        [{"role": "user", "content": "extract"}], "gpt-4o", 5, estimated_tokens=100,
+    )
+
+    assert (content, error) == ('{"a": "b', None)
+    assert len(completions.calls) == 2
+
+
+def test_refusal_is_an_error(completions):
+    refusal = SimpleNamespace(content=None, refusal="I can't help with that")
+    completions.responses.append(SimpleNamespace(choices=[SimpleNamespace(message=refusal, finish_reason="stop")], usage=None))
+
+    content, error = extract_tenant_data._complete_with_continuation([], "gpt-4o", 5, estimated_tokens=100)
+
+    assert content is None and error == "GPT refused the request: I can't help with that"
+
+
+def _chunk(content=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, refusal=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)], usage=None)
+
+
+def test_streamed_fields_are_reported_as_they_complete():
+    stream = [_chunk('{"FullName": "A'), _chunk('nn", "SS'), _chunk('N": null, '), _chunk('"DOB": "1990"}', "stop")]
+    partials = []
+
+    choice, total_tokens = extract_tenant_data._read_streamed_choice(stream, "", partials.append)
+
+    assert choice == ('{"FullName": "Ann", "SSN": null, "DOB": "1990"}', "stop", None)
+    assert total_tokens is None
+    assert partials == [
+        {"FullName": "Ann"},
+        {"FullName": "Ann", "SSN": None},
+        {"FullName": "Ann", "SSN": None, "DOB": "1990"},
+    ]
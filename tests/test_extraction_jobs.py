@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+
+import extraction_jobs
+from extraction_jobs import (
+    FILE_ERROR,
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_INTERRUPTED,
+    JOB_RUNNING,
+    cancel_job,
+    get_job,
+    job_results,
+    list_jobs,
+    submit_extraction_job,
+)
+
+
+def _wait_until_finished(job_id, path, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = get_job(job_id, path=path)
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def jobs_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    """Replace the PDF extractor; tests set `extractor.fn(filename, pdf_bytes)`."""
+    class Stub:
+        fn = staticmethod(lambda filename, pdf_bytes: {"GPT_Output": pdf_bytes.decode()})
+
+    stub = Stub()
+    monkeypatch.setattr(
+        extraction_jobs,
+        "extract_uploaded_pdf",
+        lambda filename, pdf_bytes, use_cache=True, on_partial=None: stub.fn(filename, pdf_bytes),
+    )
+    return stub
+
+
+def test_extractor_crash_is_recorded_as_a_failed_file(jobs_path, extractor):
+    def extract(filename, pdf_bytes):
+        if filename == "bad.pdf":
+            raise RuntimeError("renderer crashed")
+        return {"GPT_Output": "{}"}
+
+    extractor.fn = extract
+    job_id = submit_extraction_job([("good.pdf", b"1"), ("bad.pdf", b"2")], max_workers=2, path=jobs_path)
+    job = _wait_until_finished(job_id, jobs_path)
+
+    assert (job.status, job.total, job.done, job.failed) == (JOB_DONE, 2, 2, 1)
+    assert job.running_files == []
+    with extraction_jobs._jobs_db(jobs_path) as conn:
+        statuses = dict(conn.execute("SELECT filename, status FROM job_files WHERE job_id = ?", (job_id,)))
+    assert statuses == {"good.pdf": JOB_DONE, "bad.pdf": FILE_ERROR}
+
+
+def test_uploads_sharing_a_name_keep_separate_results(jobs_path, extractor):
+    job_id = submit_extraction_job([("scan.pdf", b"first"), ("scan.pdf", b"second")], max_workers=2, path=jobs_path)
+    _wait_until_finished(job_id, jobs_path)
+
+    assert job_results(job_id, path=jobs_path) == [
+        ("scan.pdf", {"GPT_Output": "first"}),
+        ("scan.pdf", {"GPT_Output": "second"}),
+    ]
+
+
+def test_submit_and_poll_until_done(jobs_path, extractor):
+    files = [(f"app{i}.pdf", f"record {i}".encode()) for i in range(5)]
+    job_id = submit_extraction_job(files, max_workers=2, path=jobs_path)
+
+    assert get_job(job_id, path=jobs_path).total == 5
+    job = _wait_until_finished(job_id, jobs_path)
+    assert (job.status, job.done, job.failed) == (JOB_DONE, 5, 0)
+    assert job_results(job_id, path=jobs_path) == [(name, {"GPT_Output": data.decode()}) for name, data in files]
+    assert [j.job_id for j in list_jobs(path=jobs_path)] == [job_id]
+
+
+def test_empty_job_is_done_at_once(jobs_path, extractor):
+    job_id = submit_extraction_job([], path=jobs_path)
+    assert get_job(job_id, path=jobs_path).status == JOB_DONE
+
+
+def test_cancel_skips_files_not_yet_started(jobs_path, extractor):
+    started, release = threading.Event(), threading.Event()
+
+    def extract(filename, pdf_bytes):
+        started.set()
+        release.wait(10)
+        return {"GPT_Output": filename}
+
+    extractor.fn = extract
+    job_id = submit_extraction_job([("a.pdf", b""), ("b.pdf", b""), ("c.pdf", b"")], max_workers=1, path=jobs_path)
+    assert started.wait(10)
+    running = get_job(job_id, path=jobs_path)
+    assert running.status == JOB_RUNNING and running.running_files == ["a.pdf"]
+
+    assert cancel_job(job_id, path=jobs_path)
+    release.set()
+    job = _wait_until_finished(job_id, jobs_path)
+
+    # The file already in flight finishes and keeps its result.
+    assert (job.status, job.done) == (JOB_CANCELLED, 1)
+    assert job_results(job_id, path=jobs_path) == [("a.pdf", {"GPT_Output": "a.pdf"})]
+    assert not cancel_job(job_id, path=jobs_path)
+
+
+def _insert_job(path, job_id, owner, heartbeat_at):
+    now = time.time()
+    with extraction_jobs._jobs_db(path) as conn:
+        conn.execute(
+            "INSERT INTO jobs (job_id, status, total, use_cache, created_at, updated_at, owner, heartbeat_at) VALUES (?, ?, 1, 1, ?, ?, ?, ?)",
+            (job_id, JOB_RUNNING, now, now, owner, heartbeat_at),
+        )
+        conn.execute("INSERT INTO job_files (job_id, position, filename, status) VALUES (?, 0, 'a.pdf', ?)", (job_id, JOB_RUNNING))
+
+
+def _dead_pid():
+    pid = 999999
+    while extraction_jobs._pid_alive(pid):
+        pid += 1
+    return pid
+
+
+def test_only_jobs_of_gone_owners_are_interrupted(jobs_path):
+    host = extraction_jobs.socket.gethostname()
+    now = time.time()
+    stale = now - extraction_jobs.EXTRACTION_JOB_LEASE_SECONDS - 1
+    _insert_job(jobs_path, "remote-live", "other-host:123", now)
+    _insert_job(jobs_path, "remote-stale", "other-host:123", stale)
+    _insert_job(jobs_path, "local-dead", f"{host}:{_dead_pid()}", now)
+    _insert_job(jobs_path, "local-live", f"{host}:1", now)  # PID 1 always exists
+    _insert_job(jobs_path, "legacy", None, None)
+    _insert_job(jobs_path, "own", extraction_jobs._owner_id(), stale)
+
+    statuses = {job.job_id: job.status for job in list_jobs(path=jobs_path)}
+
+    assert statuses == {
+        "remote-live": JOB_RUNNING,
+        "remote-stale": JOB_INTERRUPTED,
+        "local-dead": JOB_INTERRUPTED,
+        "local-live": JOB_RUNNING,
+        "legacy": JOB_INTERRUPTED,
+        "own": JOB_RUNNING,
+    }
+    assert get_job("local-dead", path=jobs_path).running_files == []
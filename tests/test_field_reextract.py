@@ -0,0 +1,72 @@
+import json
+
+import fitz
+import pytest
+
+import field_reextract
+from field_reextract import build_targeted_prompt, reextract_fields, targeted_images
+from form_layouts import HANDWRITING_ZOOM
+from pdf_document import PdfDocument
+
+
+def _form(marker, pages=3):
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page(width=612, height=792).insert_text((50, 40), f"Residential Lease Application for Tenancy {marker}")
+    data = doc.tobytes()
+    doc.close()
+    return PdfDocument(data, name="form.pdf")
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """Record what targeted_images renders instead of rendering it."""
+    calls = []
+    monkeypatch.setattr(field_reextract, "render_region", lambda page, box, zoom: calls.append(("region", page.number, box, zoom)))
+    monkeypatch.setattr(field_reextract, "render_page", lambda page: calls.append(("page", page.number)))
+    return calls
+
+
+def test_identity_fields_render_only_the_identity_region(rendered):
+    with _form("05-15-24") as doc:
+        targeted_images(doc, ["SSN", "DOB"])
+
+    [(kind, page, box, zoom)] = rendered
+    assert (kind, page) == ("region", 0)
+    assert box[1] < 0.1  # the top band of the first page
+    assert zoom >= HANDWRITING_ZOOM
+
+
+def test_each_needed_region_is_rendered_once(rendered):
+    with _form("2-1-18 Declawed?") as doc:
+        targeted_images(doc, ["FullName", "PhoneNumber", "Applicant's Current Employer"])
+
+    assert [(kind, page) for kind, page, *_ in rendered] == [("region", 0), ("region", 1)]
+
+
+def test_unknown_layout_sends_the_fallback_pages(rendered):
+    with _form("no known form marker here at all") as doc:
+        targeted_images(doc, ["SSN", "Applicant's Current Employer"])
+    assert rendered == [("page", 0), ("page", 1)]
+
+    rendered.clear()
+    with _form("05-15-24", pages=1) as doc:  # too short for the layout, and no page 1
+        targeted_images(doc, ["Applicant's Current Employer"])
+    assert rendered == [("page", 0)]
+
+
+def test_reextract_asks_only_for_the_missing_columns(monkeypatch, rendered):
+    requests = []
+
+    def run_vision_completion(prompt, images, **kwargs):
+        requests.append((prompt, kwargs["response_format"]))
+        return {"GPT_Output": json.dumps({"SSN": " 123-45-6789 ", "DOB": None})}
+
+    monkeypatch.setattr(field_reextract, "run_vision_completion", run_vision_completion)
+    with _form("05-15-24") as doc:
+        values, error = reextract_fields(doc, ["SSN", "DOB", "NotAField"])
+
+    assert (values, error) == ({"SSN": "123-45-6789"}, None)
+    [(prompt, response_format)] = requests
+    assert prompt == build_targeted_prompt(["SSN", "DOB"])
+    assert response_format["json_schema"]["schema"]["required"] == ["SSN", "DOB"]
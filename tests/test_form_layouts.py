@@ -0,0 +1,38 @@
+import fitz
+import pytest
+
+from form_layouts import FORM_LAYOUTS, MIN_LAYOUT_PAGES, get_form_layout
+from openai_scheduler import estimate_image_tokens
+from pdf_render import render_page, render_region
+
+
+@pytest.fixture
+def letter_pages():
+    doc = fitz.open()
+    for _ in range(MIN_LAYOUT_PAGES):
+        doc.new_page(width=612, height=792)
+    yield doc
+    doc.close()
+
+
+@pytest.mark.parametrize("variant", sorted(FORM_LAYOUTS))
+def test_regions_cost_fewer_tokens_than_whole_pages(variant, letter_pages):
+    layout = get_form_layout(variant, letter_pages.page_count)
+    region_tokens = sum(
+        estimate_image_tokens(*render_region(letter_pages[r.page], r.box, r.zoom).size) for r in layout
+    )
+    page_tokens = sum(estimate_image_tokens(*render_page(page).size) for page in letter_pages)
+
+    assert region_tokens < page_tokens
+
+
+@pytest.mark.parametrize("variant", sorted(FORM_LAYOUTS))
+def test_regions_on_a_page_do_not_overlap(variant):
+    layout = get_form_layout(variant, MIN_LAYOUT_PAGES)
+    for i, a in enumerate(layout):
+        for b in layout[i + 1:]:
+            if a.page != b.page:
+                continue
+            overlap_x = min(a.box[2], b.box[2]) - max(a.box[0], b.box[0])
+            overlap_y = min(a.box[3], b.box[3]) - max(a.box[1], b.box[1])
+            assert overlap_x <= 0 or overlap_y <= 0, (a.label, b.label)
@@ -0,0 +1,73 @@
+import json
+
+import fitz
+import pytest
+
+from form_text_layer import extract_from_text_layer, map_widgets_to_record, merge_with_gpt_output
+
+# Filled widgets of a standard form, plus look-alike names that contain
+# "pet", "car" or "age" without being about animals, vehicles or ages.
+WIDGETS = {
+    "Property Address": "6930 Tara Dr",
+    "Applicant Name": "Ann Lee",
+    "Cell Phone": "555-0100",
+    "Date of Birth": "01/02/1990",
+    "Social Security Number": "123-45-6789",
+    "Current Employer": "Acme",
+    "PetType1": "Dog",
+    "Pet Age 1": "3",
+    "Pet Name 1": "Rex",
+    "Animal Weight 2": "12 lb",
+    "Car Make 1": "Honda",
+    "Carpet Cleaning Fee": "150",
+    "Competitor Name": "Other Realty",
+    "Pet Policy Language Accepted": "Yes",
+    "Mortgage Company": "Big Bank",
+}
+
+
+@pytest.fixture
+def lookalike_form_pdf():
+    doc = fitz.open()
+    page = doc.new_page()
+    for i, (name, value) in enumerate(WIDGETS.items()):
+        widget = fitz.Widget()
+        widget.field_name = name
+        widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+        widget.field_value = value
+        widget.rect = fitz.Rect(50, 40 + i * 20, 300, 55 + i * 20)
+        page.add_widget(widget)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_lookalike_widgets_do_not_fill_list_sections(lookalike_form_pdf):
+    record, missing = extract_from_text_layer(lookalike_form_pdf, form_source="Form_B_2024")
+
+    assert record["G. Animals"] == [
+        {"Type and Breed": "Dog", "Color": None, "Weight": None, "Age in Yrs": "3", "Gender": None, "Name": "Rex"},
+        {"Type and Breed": None, "Color": None, "Weight": "12 lb", "Age in Yrs": None, "Gender": None, "Name": None},
+    ]
+    assert record["F. Vehicle Information:"] == [
+        {"Monthly Payment": None, "Type": None, "Year": None, "Make": "Honda", "Model": None},
+    ]
+    assert record["FullName"] == "Ann Lee"
+    # Look-alikes are reported as unmapped instead of landing in a section.
+    unmapped = [m for m in missing if m.startswith("unmapped widgets")]
+    assert unmapped and all(name in unmapped[0] for name in ("Carpet Cleaning Fee", "Competitor Name", "Pet Policy Language Accepted"))
+
+
+def test_section_words_are_matched_whole():
+    record, unmapped = map_widgets_to_record({"Carpet Type": "Berber", "Mortgage Payment": "900"})
+    assert record["G. Animals"] == []
+    assert record["F. Vehicle Information:"] == []
+    assert sorted(unmapped) == ["Carpet Type", "Mortgage Payment"]
+
+
+def test_merge_prefers_text_layer_and_strips_fences():
+    text_layer = {"FullName": "Ann Lee", "SSN": None, "G. Animals": []}
+    gpt = {"GPT_Output": '```json\n{"FullName": "A. Lee", "SSN": "123-45-6789", "G. Animals": [{"Name": "Rex"}]}\n```'}
+
+    merged = json.loads(merge_with_gpt_output(text_layer, gpt)["GPT_Output"])
+    assert merged == {"FullName": "Ann Lee", "SSN": "123-45-6789", "G. Animals": [{"Name": "Rex"}]}
@@ -0,0 +1,74 @@
+import itertools
+
+import pytest
+
+import gpt_cache
+from gpt_cache import cache_stats, get_cached_response, make_cache_key, store_response
+
+PARTS = [{"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AAAA"}}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A clock that advances one second per reading."""
+    ticks = itertools.count(1_000_000)
+    now = {"value": 0.0}
+
+    def time():
+        now["value"] = float(next(ticks))
+        return now["value"]
+
+    monkeypatch.setattr(gpt_cache.time, "time", time)
+    return now
+
+
+def test_cache_key_covers_model_prompt_images_and_options():
+    key = make_cache_key("gpt-4o", "prompt", PARTS, max_tokens=1000)
+
+    assert key == make_cache_key("gpt-4o", "prompt", [dict(p) for p in PARTS], max_tokens=1000)
+    other_image = [{"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AAAB"}}]
+    assert len({
+        key,
+        make_cache_key("gpt-4o-mini", "prompt", PARTS, max_tokens=1000),
+        make_cache_key("gpt-4o", "prompt 2", PARTS, max_tokens=1000),
+        make_cache_key("gpt-4o", "prompt", other_image, max_tokens=1000),
+        make_cache_key("gpt-4o", "prompt", PARTS + PARTS, max_tokens=1000),
+        make_cache_key("gpt-4o", "prompt", PARTS, max_tokens=300),
+        make_cache_key("gpt-4o", "prompt", PARTS),
+    }) == 7
+    # Option order does not matter.
+    assert make_cache_key("m", "p", PARTS, a=1, b=2) == make_cache_key("m", "p", PARTS, b=2, a=1)
+
+
+def test_hit_miss_and_stats(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    assert get_cached_response("k1", path=path) is None
+
+    store_response("k1", "gpt-4o", '{"FullName": "Ann"}', path=path)
+
+    assert get_cached_response("k1", path=path) == '{"FullName": "Ann"}'
+    assert get_cached_response("k1", path=path) == '{"FullName": "Ann"}'
+    assert cache_stats(path=path) == {"entries": 1, "hits": 2}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    store_response("a", "m", "A", max_entries=2, path=path)
+    store_response("b", "m", "B", max_entries=2, path=path)
+    get_cached_response("a", path=path)  # "b" is now the least recently used
+
+    store_response("c", "m", "C", max_entries=2, path=path)
+
+    assert get_cached_response("b", path=path) is None
+    assert get_cached_response("a", path=path) == "A"
+    assert get_cached_response("c", path=path) == "C"
+
+
+def test_expired_entries_are_dropped(tmp_path, clock, monkeypatch):
+    path = str(tmp_path / "cache.sqlite3")
+    store_response("old", "m", "OLD", path=path)
+    stored_at = clock["value"]
+
+    monkeypatch.setattr(gpt_cache.time, "time", lambda: stored_at + 2 * 86400)
+    assert get_cached_response("old", max_age_days=1, path=path) is None
+    assert cache_stats(path=path)["entries"] == 0
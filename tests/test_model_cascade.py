@@ -0,0 +1,85 @@
+import json
+
+import model_cascade
+from model_cascade import FIRST_PASS_MODEL, CascadeStats, run_cascade, score_extraction
+
+COMPLETE = {
+    "FullName": "Ann Lee",
+    "SSN": "123-45-6789",
+    "DOB": "01/02/1990",
+    "Email": None,
+    "Employment and Other Income:": {"Current Employer Details": {"Gross Monthly Income": "4000"}},
+}
+
+
+def _answer(record):
+    return {"GPT_Output": json.dumps(record)}
+
+
+def _complete_with(answers):
+    calls = []
+
+    def complete(model):
+        calls.append(model)
+        return answers[model]
+
+    return complete, calls
+
+
+def test_score_flags_blank_required_fields():
+    weak = {**COMPLETE, "SSN": "N/A", "Employment and Other Income:": {}}
+
+    assert score_extraction(_answer(COMPLETE)) == (COMPLETE, [])
+    assert score_extraction(_answer(weak))[1] == ["SSN", "Employment and Other Income: / Current Employer Details / Gross Monthly Income"]
+    assert score_extraction({"GPT_Output": "not json"}) == (None, ["invalid JSON"])
+    assert score_extraction({"error": "timeout"}) == (None, ["error: timeout"])
+
+
+def test_complete_first_pass_is_not_escalated():
+    complete, calls = _complete_with({FIRST_PASS_MODEL: _answer(COMPLETE)})
+
+    result = run_cascade(complete, "gpt-4o")
+
+    assert calls == [FIRST_PASS_MODEL]
+    assert result["model_tier"] == "first_pass"
+
+
+def test_weak_first_pass_escalates_and_keeps_its_extra_fields():
+    first = {**COMPLETE, "DOB": None, "Email": "ann@example.com"}
+    second = {**COMPLETE, "FullName": "Ann M. Lee", "Email": None}
+    complete, calls = _complete_with({FIRST_PASS_MODEL: _answer(first), "gpt-4o": _answer(second)})
+
+    result = run_cascade(complete, "gpt-4o")
+
+    assert calls == [FIRST_PASS_MODEL, "gpt-4o"]
+    assert result["model_tier"] == "escalated"
+    assert result["escalation_reasons"] == ["DOB"]
+    merged = json.loads(result["GPT_Output"])
+    assert merged["FullName"] == "Ann M. Lee"  # the escalated answer wins
+    assert merged["Email"] == "ann@example.com"  # blanks are filled from the first pass
+
+
+def test_failed_escalation_falls_back_to_the_first_pass():
+    first = {**COMPLETE, "SSN": None}
+    complete, _ = _complete_with({FIRST_PASS_MODEL: _answer(first), "gpt-4o": {"error": "rate limited"}})
+    assert run_cascade(complete, "gpt-4o") == {**_answer(first), "model_tier": "first_pass"}
+
+    complete, _ = _complete_with({FIRST_PASS_MODEL: {"error": "timeout"}, "gpt-4o": {"error": "rate limited"}})
+    assert run_cascade(complete, "gpt-4o") == {"error": "rate limited"}
+
+
+def test_stats_count_each_tier(monkeypatch):
+    stats = CascadeStats()
+    monkeypatch.setattr(model_cascade, "_cascade_stats", stats)
+    answers = {FIRST_PASS_MODEL: _answer(COMPLETE), "gpt-4o": _answer(COMPLETE)}
+    run_cascade(_complete_with(answers)[0], "gpt-4o")
+    answers[FIRST_PASS_MODEL] = _answer({**COMPLETE, "SSN": None})
+    run_cascade(_complete_with(answers)[0], "gpt-4o")
+
+    assert stats.stats() == {
+        "first_pass": 2,
+        "first_pass_accepted": 1,
+        "escalated": 1,
+        "escalation_failed": 0,
+        "first_pass_hit_rate": 0.5,
+    }
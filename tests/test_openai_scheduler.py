@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+import extract_tenant_data
+from openai_scheduler import RateLimitScheduler
+
+
+def _stream_error(kind):
+    return openai.APIError("stream failed", request=None, body={"type": kind, "message": "stream failed"})
+
+
+def _chunk(content=None, finish_reason=None, usage=None):
+    choices = [] if content is None and finish_reason is None else [
+        SimpleNamespace(delta=SimpleNamespace(content=content, refusal=None), finish_reason=finish_reason)
+    ]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def _stream(fail_with=None):
+    yield _chunk('{"FullName": "Ann Lee", ')
+    if fail_with:
+        raise fail_with
+    yield _chunk('"SSN": null}', finish_reason="stop")
+    yield _chunk(usage=SimpleNamespace(total_tokens=300))
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = RateLimitScheduler(requests_per_minute=1000, tokens_per_minute=10000, base_delay=0, max_delay=0)
+    monkeypatch.setattr(extract_tenant_data, "get_scheduler", lambda: scheduler)
+    return scheduler
+
+
+def test_streamed_completion_retries_mid_stream_failures_and_reconciles_usage(scheduler, monkeypatch):
+    streams = iter([_stream(fail_with=_stream_error("server_error")), _stream()])
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        return next(streams)
+
+    monkeypatch.setattr(extract_tenant_data.openai.chat.completions, "create", create)
+    partials = []
+    content, error = extract_tenant_data._complete_with_continuation(
+        [{"role": "user", "content": "extract"}], "gpt-4o", 1000, estimated_tokens=2000, on_partial=partials.append,
+    )
+
+    assert error is None
+    assert content == '{"FullName": "Ann Lee", "SSN": null}'
+    assert len(requests) == 2
+    assert requests[0]["stream_options"] == {"include_usage": True}
+    stats = scheduler.stats()
+    assert stats["retries"] == 1 and stats["failures"] == 0
+    # Only the 300 tokens the finished stream reported stay charged (plus the
+    # failed attempt's estimate, which produced no usage chunk).
+    assert 10000 - 2000 - 300 - 5 <= stats["available_tokens"] <= 10000 - 2000 - 300 + 5
+
+
+def test_call_stream_raises_non_retryable_stream_errors(scheduler):
+    reads = []
+
+    def read(stream):
+        reads.append(stream)
+        list(stream)
+
+    with pytest.raises(openai.APIError):
+        scheduler.call_stream(lambda: _stream(fail_with=_stream_error("invalid_request_error")), 100, read)
+    assert len(reads) == 1
+    assert scheduler.stats()["failures"] == 1
@@ -0,0 +1,86 @@
+import json
+
+from output_schema import (
+    STANDARD_FORM_RESPONSE_FORMAT,
+    STANDARD_FORM_SPEC,
+    conform_to_spec,
+    make_response_format,
+    parse_partial_json,
+    spec_for_response_format,
+    spec_to_json_schema,
+    validate_gpt_json,
+)
+
+SPEC = {"FullName": None, "Address": {"Street": None, "Rent": None}, "Pets": [{"Name": None, "Age": None}]}
+
+
+def test_conform_repairs_shape_and_reports_each_repair():
+    record, problems = conform_to_spec(
+        {"FullName": "Ann Lee", "Address": {"Rent": 1200}, "Pets": {"Name": "Rex", "Age": 3}, "Extra": "x"},
+        SPEC,
+    )
+
+    assert record == {
+        "FullName": "Ann Lee",
+        "Address": {"Street": None, "Rent": "1200"},
+        "Pets": [{"Name": "Rex", "Age": "3"}],
+    }
+    assert problems == [
+        "Address.Street: missing",
+        "Address.Rent: number converted to string",
+        "Pets: single object wrapped in a list",
+        "Pets[0].Age: number converted to string",
+        "Extra: not in schema, dropped",
+    ]
+
+
+def test_conform_leaves_a_valid_record_alone():
+    record = {"FullName": None, "Address": {"Street": "1 Main St", "Rent": None}, "Pets": []}
+    assert conform_to_spec(record, SPEC) == (record, [])
+
+
+def test_validate_gpt_json_strips_fences_and_rejects_non_objects():
+    record, problems = validate_gpt_json('```json\n{"FullName": "Ann"}\n```', SPEC)
+    assert record["FullName"] == "Ann" and record["Pets"] == []
+    assert "Address: missing" in problems
+
+    assert validate_gpt_json('{"FullName": "Ann", ', SPEC)[0] is None
+    assert validate_gpt_json("[1, 2]", SPEC) == (None, ["expected a JSON object, got list"])
+
+
+def test_strict_schema_requires_every_key():
+    schema = spec_to_json_schema(SPEC)
+    assert schema["required"] == ["FullName", "Address", "Pets"]
+    assert schema["additionalProperties"] is False
+    assert schema["properties"]["Pets"]["items"]["required"] == ["Name", "Age"]
+
+
+def test_response_formats_resolve_to_their_spec():
+    assert spec_for_response_format(STANDARD_FORM_RESPONSE_FORMAT) is STANDARD_FORM_SPEC
+    response_format = make_response_format("test_spec", SPEC)
+    assert spec_for_response_format(response_format) is SPEC
+    assert spec_for_response_format(None) is None
+    json.dumps(response_format)  # sent as-is in the request body
+
+
+def test_parse_partial_json_returns_only_complete_members():
+    assert parse_partial_json("") == {}
+    assert parse_partial_json('```json\n{"FullName": "Ann Lee", "SSN": "123') == {"FullName": "Ann Lee"}
+    assert parse_partial_json('{"FullName": "Ann", "Pets": [{"Name": "Rex"}') == {"FullName": "Ann"}
+    assert parse_partial_json('{"FullName": "Ann", "Pets": [{"Name": "Rex"}], ') == {"FullName": "Ann", "Pets": [{"Name": "Rex"}]}
+    # A number at the very end may still be growing; once followed by anything it is final.
+    assert parse_partial_json('{"Rent": 12') == {}
+    assert parse_partial_json('{"Rent": 1200,') == {"Rent": 1200}
+
+
+def test_parse_partial_json_grows_monotonically_to_the_full_record():
+    record = {"FullName": "Ann \"Annie\" Lee", "Rent": 1200, "Address": {"Street": "1 Main St, Apt 4"}, "Pets": [], "Email": None}
+    text = json.dumps(record, indent=1)
+
+    previous = {}
+    for end in range(len(text) + 1):
+        fields = parse_partial_json(text[:end])
+        assert fields.items() >= previous.items()
+        assert all(record[key] == value for key, value in fields.items())
+        previous = fields
+    assert previous == record
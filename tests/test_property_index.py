@@ -0,0 +1,36 @@
+import pytest
+
+from property_index import PropertyIndex, normalize_address_tokens
+
+
+@pytest.mark.parametrize(
+    "address, tokens",
+    [
+        ("1 Lot Rd", ["1", "lot", "rd"]),
+        ("1 Lot Rd Lot 5", ["1", "lot", "rd"]),
+        ("12 Court St", ["12", "court", "st"]),
+        ("100 Park Place Drive", ["100", "park", "place", "dr"]),
+        ("5 Suite Ave Ste 200", ["5", "suite", "ave"]),
+        ("1 North Rd", ["1", "north", "rd"]),
+        ("100 North Main Street", ["100", "n", "main", "st"]),
+        ("123 Main Street Apt 4", ["123", "main", "st"]),
+        ("123 Main St. Apt #4B", ["123", "main", "st"]),
+        ("123 Main St # 12", ["123", "main", "st"]),
+        ("100 Main St Southwest Unit B", ["100", "main", "st", "sw"]),
+        ("6930 Tara", ["6930", "tara"]),
+    ],
+)
+def test_normalize_address_tokens(address, tokens):
+    assert normalize_address_tokens(address) == tokens
+
+
+def test_street_name_words_still_distinguish_properties():
+    index = PropertyIndex([
+        ("P-1", "12 Court St", 900),
+        ("P-2", "12 Main St", 1100),
+        ("P-3", "1 Lot Rd", 700),
+    ])
+
+    assert index.match("12 Court Street Apt 3").p_number == "P-1"
+    assert index.match("12 Main Street").p_number == "P-2"
+    assert index.match("1 Lot Road").p_number == "P-3"
@@ -0,0 +1,56 @@
+import io
+
+import pandas as pd
+import pytest
+
+from applicant_store import load_applicants, upsert_records
+from record_codec import decode_nested, encode_for_excel, normalize_record
+
+ANIMALS = [
+    {"Type and Breed": "Dog, Lab", "Name": 'Rex "Jr"', "Color": "Black", "Weight": "60", "Age in Yrs": "3", "Gender": "M"},
+    {"Type and Breed": "Cat", "Name": "O'Malley", "Color": None, "Weight": "", "Age in Yrs": "1", "Gender": "F"},
+]
+RECORD = {
+    "FullName": "Ann Lee",
+    "Property Address": "6930 Tara Dr",
+    "G. Animals": ANIMALS,
+    "Co-applicants": [{"Name": "Bo Diaz", "Relationship": "Spouse"}],
+    "E. Occupant Information": [],
+}
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (ANIMALS, ANIMALS),
+        (ANIMALS[0], [ANIMALS[0]]),
+        (str(ANIMALS), ANIMALS),  # Python repr, as older holders stored lists
+        ("[{'Name': 'Rex'}, 'stray text', 3]", [{"Name": "Rex"}]),
+        ("", []),
+        ("None", []),
+        ("[not valid", []),
+        (float("nan"), []),
+        (None, []),
+    ],
+)
+def test_decode_nested(value, expected):
+    assert decode_nested(value) == expected
+
+
+def test_excel_round_trip_is_lossless():
+    buffer = io.BytesIO()
+    pd.DataFrame([encode_for_excel(RECORD)]).to_excel(buffer, index=False)
+    buffer.seek(0)
+    [row] = pd.read_excel(buffer, dtype=str).fillna("").to_dict("records")
+
+    assert normalize_record(row) == RECORD
+
+
+def test_store_round_trip_keeps_native_lists(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    upsert_records([encode_for_excel(RECORD)], path=path)
+
+    [stored] = load_applicants(path=path).to_dict("records")
+    assert stored["G. Animals"] == ANIMALS
+    assert stored["Co-applicants"] == RECORD["Co-applicants"]
+    assert stored["E. Occupant Information"] == []
@@ -0,0 +1,84 @@
+import io
+import os
+import shutil
+
+import openpyxl
+import pytest
+
+import template_cache
+from template_cache import load_template, load_template_parts
+
+
+@pytest.fixture
+def template(tmp_path):
+    path = str(tmp_path / "Tenant_Template.xlsx")
+    shutil.copy("templates/Tenant_Template.xlsx", path)
+    yield path
+    template_cache.clear_template_cache()
+
+
+def test_copies_are_isolated_from_each_other_and_the_cache(template):
+    first = load_template(template)
+    ws = first.active
+    original = ws["B2"].value
+    ws["B2"] = "written by the first caller"
+    ws.title = "Renamed"
+    first.create_sheet("Extra")
+
+    second = load_template(template)
+    assert second.active["B2"].value == original
+    assert second.active.title != "Renamed"
+    assert "Extra" not in second.sheetnames
+    assert template_cache._templates[template][1].active["B2"].value == original
+
+
+def _style(cell):
+    font, fill, border = cell.font, cell.fill, cell.border
+    return (
+        font.name, font.sz, font.b, font.i, font.color.rgb if font.color else None,
+        fill.fill_type, fill.fgColor.rgb,
+        border.left.style, border.right.style, border.top.style, border.bottom.style,
+        cell.number_format, cell.alignment.horizontal, cell.alignment.wrap_text,
+    )
+
+
+def test_copies_keep_the_template_styles(template):
+    output = io.BytesIO()
+    load_template(template).save(output)
+    output.seek(0)
+
+    saved, fresh = openpyxl.load_workbook(output), openpyxl.load_workbook(template)
+    styled = 0
+    for ws in fresh.worksheets:
+        for row in ws.iter_rows():
+            for cell in row:
+                assert _style(saved[ws.title][cell.coordinate]) == _style(cell), cell.coordinate
+                styled += cell.has_style
+    assert styled
+
+
+def test_template_is_parsed_once_until_the_file_changes(template, monkeypatch):
+    loads = []
+    real_load = openpyxl.load_workbook
+    monkeypatch.setattr(template_cache.openpyxl, "load_workbook", lambda path: loads.append(path) or real_load(path))
+
+    load_template(template)
+    load_template(template)
+    assert loads == [template]
+
+    wb = real_load(template)
+    wb.active["B2"] = "new printing"
+    wb.save(template)
+    os.utime(template, ns=(0, os.stat(template).st_mtime_ns + 1_000_000))
+
+    assert load_template(template).active["B2"].value == "new printing"
+    assert loads == [template, template]
+
+
+def test_template_parts_are_shared_and_refreshed(template):
+    parts = load_template_parts(template)
+    assert load_template_parts(template) is parts
+    assert "xl/workbook.xml" in parts
+
+    os.utime(template, ns=(0, os.stat(template).st_mtime_ns + 1_000_000))
+    assert load_template_parts(template) is not parts
@@ -0,0 +1,57 @@
+import io
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+from write_to_excel_template import open_template, write_multiple_applicants_to_template
+
+MULTIPLE_TEMPLATE = "templates/Tenant_Template_Multiple.xlsx"
+ENGINES = ["openpyxl", "xml"]
+
+
+def _reload(data) -> openpyxl.Workbook:
+    return openpyxl.load_workbook(io.BytesIO(data))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_numpy_and_missing_numbers_write_valid_cells(engine):
+    wb = open_template(MULTIPLE_TEMPLATE, engine)
+    ws = wb.active
+    ws["B104"] = np.float64(3.5)
+    ws["B105"] = np.int64(4)
+    ws["B106"] = float("nan")
+    ws["B107"] = np.float64("nan")
+    ws["B108"] = float("inf")
+    ws["B109"] = 2.25
+    output = io.BytesIO()
+    wb.save(output)
+
+    ws = _reload(output.getvalue()).active
+    assert ws["B104"].value == 3.5
+    assert ws["B105"].value == 4
+    assert ws["B106"].value is None
+    assert ws["B107"].value is None
+    assert ws["B108"].value is None
+    assert ws["B109"].value == 2.25
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_multiple_applicants_with_missing_fields(engine):
+    # Applicants that lack a field get NaN for it once they share a DataFrame.
+    df = pd.DataFrame([
+        {"FullName": "Ann Lee", "Property Address": "1 Main St", "Email": "ann@example.com", "Gross Monthly Income": np.float64(4200.5)},
+        {"FullName": "Bo Lee", "Property Address": "1 Main St", "No of Children": np.int64(2)},
+    ])
+    output, _ = write_multiple_applicants_to_template(df, template_path=MULTIPLE_TEMPLATE, engine=engine)
+    assert output is not None
+
+    ws = _reload(output.getvalue()).active
+    assert ws["F14"].value == "Ann Lee"
+    assert ws["F15"].value == "ann@example.com"
+    assert ws["I15"].value in (None, "")
+    assert ws["F31"].value == 4200.5
+    assert ws["I22"].value == 2
+    values = [cell.value for row in ws.iter_rows() for cell in row]
+    assert not any(isinstance(v, str) and ("nan" == v.lower() or "np.float64" in v) for v in values)
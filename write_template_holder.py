@@ -1,11 +1,7 @@
-import os
-import pandas as pd
-import openpyxl
-from datetime import datetime
-from io import BytesIO
-import re
+from applicant_store import APPLICANT_STORE_PATH, upsert_records
 
-def write_to_template_holder(data_dict, holder_path="templates/Template_Data_Holder.xlsx"):
+def write_to_template_holder(data_dict, store_path=APPLICANT_STORE_PATH):
+    """Save one applicant to the applicant store (upsert). Returns the store id."""
     if not isinstance(data_dict, dict) or not data_dict:
         raise ValueError("No applicant data was provided. Please make sure all required fields are filled before saving.")
 
@@ -19,13 +15,14 @@ def write_to_template_holder(data_dict, holder_path="templates/Template_Data_Hol
         "Child Support", "Vehicle Type", "Vehicle Year", "Vehicle Make", "Vehicle Model", "Vehicle Monthly Payment", "No of Animals", "G. Animals", "Animal Summary"
     ]
 
-    df_new = pd.DataFrame([data_dict])
-    df_new = df_new.reindex(columns=expected_columns, fill_value=None)
-    df_new = df_new.fillna("").applymap(lambda x: str(x).strip() if isinstance(x, str) else x)  # Clean all cells
+    record = {column: data_dict.get(column, "") for column in expected_columns}
+    record.update({k: v for k, v in data_dict.items() if k not in record})
+    record = {k: ("" if v is None else v.strip() if isinstance(v, str) else v) for k, v in record.items()}  # Clean all cells
 
     try:
-        df_new.to_excel(holder_path, index=False, engine='openpyxl')
-        print(f"✅ Replaced contents of {holder_path}")
+        applicant_id = upsert_records([record], path=store_path)[0]
+        print(f"✅ Saved applicant {applicant_id} to {store_path}")
+        return applicant_id
     except Exception as e:
-        print(f"❌ Failed to write to template holder: {e}")
+        print(f"❌ Failed to write to applicant store: {e}")
         raise
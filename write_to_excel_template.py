@@ -9,6 +9,26 @@ from datetime import datetime, date
 import pandas as pd
 from openpyxl.styles import Alignment
 from extract_tenant_data import normalize_all_dates, normalize_date_string
+from property_index import match_property
+from template_cache import load_template
+from app_counter import next_application_number
+from record_codec import nested_field
+from settings import get_setting
+from xlsx_patch import PatchedWorkbook
+
+# "openpyxl" loads and re-saves the template; "xml" patches the target cells
+# inside the .xlsx and copies every other part through unchanged.
+EXCEL_WRITER_ENGINE = str(get_setting("app", "EXCEL_WRITER_ENGINE", "openpyxl")).strip().lower()
+
+
+def open_template(template_path, engine=None):
+    """Open a template for filling with the given (or configured) writer engine."""
+    engine = (engine or EXCEL_WRITER_ENGINE).strip().lower()
+    if engine == "xml":
+        return PatchedWorkbook(template_path)
+    if engine != "openpyxl":
+        raise ValueError(f"Unknown Excel writer engine '{engine}' (expected 'openpyxl' or 'xml')")
+    return load_template(template_path)
 
 def calc_age(dob_str: str) -> str | int:
     if not dob_str:
@@ -39,28 +59,6 @@ def calc_age(dob_str: str) -> str | int:
     return "Invalid DOB"
 
 
-def lookup_property_info(address: str, reference_file="PropertyInfo.xlsx"):
-    try:
-        if not address:
-            return None, None
-
-        wb_info = openpyxl.load_workbook(reference_file, data_only=True)
-        ws_info = wb_info.active
-
-        address_prefix = " ".join(address.strip().lower().split()[:3])
-
-        for row in ws_info.iter_rows(min_row=2):
-            c_val = str(row[2].value).strip().lower() if row[2].value else ""
-            c_prefix = " ".join(c_val.split()[:3])
-            if address_prefix == c_prefix:
-                p_number = row[1].value  # Column B
-                sqft = row[3].value      # Column D
-                return p_number, sqft
-        return None, None
-    except Exception as e:
-        print("❌ Error in lookup_property_info:", e)
-        return None, None
-
 # ───────────────────────────────────────────────────────────────────────────────
 # 1. write_flattened_to_template  (adds strict input-type guard)
 # ───────────────────────────────────────────────────────────────────────────────
@@ -68,10 +66,11 @@ def write_flattened_to_template(
     data,
     template_path="templates/Tenant_Template.xlsx",
     summary_header=None,
+    engine=None,
 ):
     try:
         data = normalize_all_dates(data)
-        wb = openpyxl.load_workbook(template_path)
+        wb = open_template(template_path, engine)
         ws = wb.active
 
         # Property Address
@@ -98,13 +97,12 @@ def write_flattened_to_template(
 
         # PropertyInfo lookup
         try:
-            prop_df = pd.read_excel("PropertyInfo.xlsx", header=None, dtype=str)
-            addr_prefix = " ".join(property_address.strip().lower().split()[:3])
-            mask = prop_df[2].fillna("").str.lower().apply(lambda x: " ".join(x.split()[:3])) == addr_prefix
-            match = prop_df[mask]
-            if not match.empty:
-                ws["G3"] = match.iloc[0, 1]
-                ws["G7"] = match.iloc[0, 3]
+            match = match_property(property_address)
+            if match:
+                if match.score < 1:
+                    print(f"⚠️ Property '{property_address}' matched '{match.address}' (score {match.score:.2f})")
+                ws["G3"] = match.p_number
+                ws["G7"] = match.sqft
         except Exception as e:
             print(f"Warning: Failed lookup – {e}")
 
@@ -192,7 +190,7 @@ def write_flattened_to_template(
             rent = float(str(data.get("Monthly Rent", "0")).replace("$", "").replace(",", "").strip() or 0)
             gross = float(str(data.get("Gross Monthly Income", "0")).replace("$", "").replace(",", "").strip() or 0)
             co_total = 0
-            for app in data.get("Co-applicants", []):
+            for app in nested_field(data, "Co-applicants"):
                 if isinstance(app, dict):
                     val = str(app.get("Gross Monthly Income", "")).replace("$", "").replace(",", "").strip()
                     try:
@@ -230,11 +228,12 @@ def write_multiple_applicants_to_template(
     df,
     template_path="templates/Tenant_Template_Multiple.xlsx",
     summary_header=None,
+    engine=None,
 ):
     import traceback
     try:
         first_row = normalize_all_dates(df.iloc[0].to_dict())
-        wb = openpyxl.load_workbook(template_path)
+        wb = open_template(template_path, engine)
         ws = wb.active
 
         # ── Property Info ─────────────────────────────
@@ -267,13 +266,12 @@ def write_multiple_applicants_to_template(
 
         # ── PropertyInfo.xlsx Lookup ─────────────────────────────
         try:
-            prop_df = pd.read_excel("PropertyInfo.xlsx", header=None, dtype=str)
-            addr_prefix = " ".join(property_address.strip().lower().split()[:3])
-            mask = prop_df[2].fillna("").str.lower().apply(lambda x: " ".join(x.split()[:3])) == addr_prefix
-            match = prop_df[mask]
-            if not match.empty:
-                ws["G3"] = match.iloc[0, 1]
-                ws["G7"] = match.iloc[0, 3]
+            match = match_property(property_address)
+            if match:
+                if match.score < 1:
+                    print(f"⚠️ Property '{property_address}' matched '{match.address}' (score {match.score:.2f})")
+                ws["G3"] = match.p_number
+                ws["G7"] = match.sqft
         except Exception as e:
             print(f"Warning: Failed PropertyInfo lookup – {e}")
 
@@ -359,7 +357,8 @@ def write_multiple_applicants_to_template(
 
             def write(offset, value):
                 try:
-                    ws[f"{col}{start_row + offset}"] = value or ""
+                    # DataFrame rows carry NaN for fields an applicant does not have.
+                    ws[f"{col}{start_row + offset}"] = "" if isinstance(value, float) and pd.isna(value) else (value or "")
                 except Exception as e:
                     print(f"⚠️ Failed to write value '{value}' at {col}{start_row + offset}: {e}")
 
@@ -475,10 +474,15 @@ def write_multiple_applicants_to_template(
 # ───────────────────────────────────────────────────────────────────────────────
 def write_to_summary_template(
     flat_data,
-    output_path,
+    output_path=None,
     summary_template_path="templates/App_Summary_Template.xlsx",
-) -> None:
-    from openpyxl import load_workbook
+    engine=None,
+):
+    """
+    Fill a copy of the summary template in memory and return
+    (BytesIO, download filename). The template file is never written; the
+    summary is also saved to `output_path` when one is given.
+    """
     from datetime import datetime
     import traceback
     import re
@@ -494,33 +498,24 @@ def write_to_summary_template(
         flat_data = normalize_all_dates(flat_data)
 
         try:
-            wb = load_workbook(summary_template_path)
+            wb = open_template(summary_template_path, engine)
             ws = wb.active
         except Exception as e:
             raise RuntimeError(f"Failed to load workbook: {e}")
 
-        # ── Meta Sheet and Counter ─────────────────────────────
+        # ── Application Number ─────────────────────────────
         try:
-            meta_ws = wb["_Meta"] if "_Meta" in wb.sheetnames else wb.create_sheet("_Meta")
-            if "_Meta" not in wb.sheetnames:
-                wb.move_sheet(meta_ws, offset=len(wb.sheetnames))
-                meta_ws.sheet_state = "hidden"
-                meta_ws["A1"] = "counter"
-
-            TEST_MODE = True
-            TEST_START_VALUE = 636
-            counter = TEST_START_VALUE if TEST_MODE else (meta_ws["B1"].value or TEST_START_VALUE) + 1
-            meta_ws["B1"] = counter
+            counter = next_application_number()
             ws["B1"] = datetime.now().strftime(f"APP-{counter}-%Y-%m-%d-%H%M%S")
         except Exception as e:
-            print(f"⚠️ Failed to update _Meta counter: {e}")
+            print(f"⚠️ Failed to reserve an application number: {e}")
 
         # ── Gross & Net Ratio Calculation ──────────────
         try:
             rent = float(str(flat_data.get("Monthly Rent", "0")).replace("$", "").replace(",", "").strip() or 0)
             gross = float(str(flat_data.get("Gross Monthly Income", "0")).replace("$", "").replace(",", "").strip() or 0)
             co_total = 0
-            for app in flat_data.get("Co-applicants", []):
+            for app in nested_field(flat_data, "Co-applicants"):
                 if isinstance(app, dict):
                     val = str(app.get("Gross Monthly Income", "")).replace("$", "").replace(",", "").strip()
                     try:
@@ -538,8 +533,8 @@ def write_to_summary_template(
 
         # ── Total Occupants ─────────────────────────────
         try:
-            co_applicants = flat_data.get("Co-applicants", [])
-            occupants = flat_data.get("E. Occupant Information", [])
+            co_applicants = nested_field(flat_data, "Co-applicants")
+            occupants = nested_field(flat_data, "E. Occupant Information")
 
             co_applicant_count = sum(1 for c in co_applicants if isinstance(c, dict) and (c.get("Name") or c.get("FullName")))
             occupant_count = sum(1 for o in occupants if isinstance(o, dict) and (o.get("Name") or o.get("FullName")))
@@ -612,7 +607,7 @@ def write_to_summary_template(
             else:
                 # fallback: if Co-applicants exist, use max rent among all
                 rent_values = [rent]
-                for c in flat_data.get("Co-applicants", []):
+                for c in nested_field(flat_data, "Co-applicants"):
                     if isinstance(c, dict):
                         val = str(c.get("Monthly Rent", "")).replace("$", "").replace(",", "").strip()
                         if val.replace(".", "", 1).isdigit():
@@ -627,8 +622,9 @@ def write_to_summary_template(
         animals = ""
         try:
             animal_lines = []
-            if isinstance(flat_data.get("G. Animals"), list):
-                for a in flat_data["G. Animals"]:
+            animal_list = nested_field(flat_data, "G. Animals")
+            if animal_list or isinstance(flat_data.get("G. Animals"), list):
+                for a in animal_list:
                     if not isinstance(a, dict):
                         continue
                     line = " | ".join(
@@ -672,10 +668,19 @@ def write_to_summary_template(
             traceback.print_exc()
 
         try:
-            wb.save(output_path)
+            output = BytesIO()
+            wb.save(output)
+            output.seek(0)
+            if output_path:
+                with open(output_path, "wb") as f:
+                    f.write(output.getvalue())
         except Exception as e:
             raise RuntimeError(f"❌ Failed to save summary workbook: {e}")
 
+        address = str(flat_data.get("Property Address", "tenant")).strip()
+        address_clean = "_".join(re.sub(r"[^\w\s]", "", address).split()[:3]) or "tenant"
+        return output, f"{address_clean}_{datetime.now():%Y%m%d}_summary.xlsx".lower()
+
     except Exception as final_error:
         print("❌ write_to_summary_template failed:")
         traceback.print_exc()
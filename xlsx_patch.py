@@ -0,0 +1,405 @@
+import html
+import math
+import numbers
+import posixpath
+import re
+import zipfile
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+from openpyxl.utils.cell import column_index_from_string, coordinate_from_string
+from template_cache import load_template_parts
+
+# Writer engine that fills a template by patching cell XML inside the .xlsx
+# zip instead of loading and re-saving the workbook through openpyxl. Only
+# the patched worksheets (and, when needed, styles.xml, workbook.xml and the
+# calculation chain) are rewritten; every other part - drawings, images,
+# comments, printer settings - is copied through byte for byte.
+#
+# `PatchedWorkbook` offers the part of the openpyxl API the Excel writers
+# use: `wb.active`, `wb[name]`, `ws["E3"] = value`, `ws["G14"].value`,
+# `ws["F26"].alignment = Alignment(wrap_text=True)` and
+# `ws.oddHeader.left/center.text`. Strings are written as inline strings,
+# so the shared string table is only read (to resolve template values).
+
+_ROW_RE = re.compile(r"<row\b([^>]*?)(?:/>|>(.*?)</row>)", re.S)
+_CELL_RE = re.compile(r"<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.S)
+_SI_RE = re.compile(r"<si>(.*?)</si>", re.S)
+_T_RE = re.compile(r"<t\b[^>]*>(.*?)</t>", re.S)
+_V_RE = re.compile(r"<v>(.*?)</v>", re.S)
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# Elements that follow <headerFooter> in a worksheet, in schema order.
+_AFTER_HEADER_FOOTER = (
+    "rowBreaks", "colBreaks", "customProperties", "cellWatches", "ignoredErrors", "smartTags",
+    "drawing", "legacyDrawing", "legacyDrawingHF", "drawingHF", "picture", "oleObjects",
+    "controls", "webPublishItems", "tableParts", "extLst",
+)
+# Header/footer codes that set the font, size or colour of a section.
+_HEADER_FORMAT_RE = re.compile(r'^((?:&"[^"]*"|&\d+|&K[0-9A-Fa-f]{6}|&[BIUSXYE])*)(.*)$', re.S)
+
+
+def _attr(attrs: str, name: str) -> Optional[str]:
+    found = re.search(rf'(?<![\w:]){name}="([^"]*)"', attrs)
+    return found.group(1) if found else None
+
+
+def _set_attr(tag: str, name: str, value: str) -> str:
+    """Set `name` on the opening tag `tag` (e.g. '<calcPr calcId="1"/>')."""
+    if _attr(tag, name) is not None:
+        return re.sub(rf'(?<![\w:]){name}="[^"]*"', f'{name}="{value}"', tag, count=1)
+    end = -2 if tag.endswith("/>") else -1
+    return f'{tag[:end]} {name}="{value}"{tag[end:]}'
+
+
+def _split_coordinate(coordinate: str) -> Tuple[int, int]:
+    column, row = coordinate_from_string(coordinate.upper())
+    return row, column_index_from_string(column)
+
+
+class _Alignment:
+    def __init__(self, wrap_text: bool):
+        self.wrap_text = wrap_text
+
+
+class PatchedCell:
+    """A cell of a `PatchedSheet`; reads template values and records writes."""
+
+    def __init__(self, sheet: "PatchedSheet", coordinate: str):
+        self._sheet = sheet
+        self.coordinate = coordinate.upper()
+
+    @property
+    def value(self):
+        if self.coordinate in self._sheet._values:
+            return self._sheet._values[self.coordinate]
+        return self._sheet._template_value(self.coordinate)
+
+    @value.setter
+    def value(self, value):
+        self._sheet._values[self.coordinate] = value
+
+    @property
+    def alignment(self):
+        return _Alignment(self.coordinate in self._sheet._wrapped)
+
+    @alignment.setter
+    def alignment(self, alignment):
+        # Like openpyxl, the new alignment replaces the old one; only
+        # wrap_text is carried over.
+        if getattr(alignment, "wrap_text", False):
+            self._sheet._wrapped.add(self.coordinate)
+        else:
+            self._sheet._wrapped.discard(self.coordinate)
+
+
+class _HeaderFooterItem:
+    def __init__(self, raw: str):
+        self.format_codes, self.text = _HEADER_FORMAT_RE.match(raw).groups()
+
+    def to_str(self) -> str:
+        if not self.text:
+            return ""
+        if re.search(r"&\d+$", self.format_codes) and self.text[:1].isdigit():
+            return f"{self.format_codes} {self.text}"  # keep "&20" + "2726 ..." from reading as size 202726
+        return f"{self.format_codes}{self.text}"
+
+
+class _HeaderFooter:
+    """One header or footer (`oddHeader`), split into its &L/&C/&R sections."""
+
+    def __init__(self, raw: str):
+        sections = {"L": "", "C": "", "R": ""}
+        current, i = "C", 0  # text before any section code is centred
+        while i < len(raw):
+            if raw[i] == "&" and i + 1 < len(raw) and raw[i + 1] in "LCR":
+                current = raw[i + 1]
+                i += 2
+                continue
+            if raw[i] == "&" and i + 1 < len(raw):
+                sections[current] += raw[i:i + 2]  # "&&", "&P", "&B", ...
+                i += 2
+                continue
+            sections[current] += raw[i]
+            i += 1
+        self.left = _HeaderFooterItem(sections["L"])
+        self.center = _HeaderFooterItem(sections["C"])
+        self.right = _HeaderFooterItem(sections["R"])
+
+    def to_str(self) -> str:
+        return "".join(
+            f"&{code}{text}"
+            for code, text in (("L", self.left.to_str()), ("C", self.center.to_str()), ("R", self.right.to_str()))
+            if text
+        )
+
+
+class PatchedSheet:
+    def __init__(self, workbook: "PatchedWorkbook", title: str, part: str):
+        self._workbook = workbook
+        self.title = title
+        self.part = part
+        self._values: Dict[str, object] = {}
+        self._wrapped = set()
+        self._template_cells: Optional[Dict[str, Tuple[str, str]]] = None
+        self._original_header = self._read_odd_header()
+        self.oddHeader = _HeaderFooter(self._original_header)
+
+    def __getitem__(self, coordinate: str) -> PatchedCell:
+        return PatchedCell(self, coordinate)
+
+    def __setitem__(self, coordinate: str, value) -> None:
+        self._values[coordinate.upper()] = value
+
+    @property
+    def _xml(self) -> str:
+        return self._workbook._parts[self.part].decode("utf-8")
+
+    def _read_odd_header(self) -> str:
+        found = re.search(r"<oddHeader\b[^>]*>(.*?)</oddHeader>", self._xml, re.S)
+        return html.unescape(found.group(1)) if found else ""
+
+    def _template_value(self, coordinate: str):
+        if self._template_cells is None:
+            self._template_cells = {
+                (_attr(attrs, "r") or "").upper(): (attrs, inner or "")
+                for attrs, inner in _CELL_RE.findall(self._xml)
+            }
+        if coordinate not in self._template_cells:
+            return None
+        attrs, inner = self._template_cells[coordinate]
+        kind = _attr(attrs, "t") or "n"
+        if kind == "inlineStr":
+            return html.unescape("".join(_T_RE.findall(inner)))
+        found = _V_RE.search(inner)
+        if not found:
+            return None
+        raw = html.unescape(found.group(1))
+        if kind == "s":
+            return self._workbook._shared_string(int(raw))
+        if kind == "b":
+            return raw == "1"
+        if kind in ("str", "e"):
+            return raw
+        number = float(raw)
+        return int(number) if number.is_integer() and "." not in raw and "E" not in raw.upper() else number
+
+    def _has_changes(self) -> bool:
+        return bool(self._values or self._wrapped) or self.oddHeader.to_str() != self._original_header
+
+    def _render(self, wrap_style) -> Tuple[str, bool]:
+        """The patched worksheet XML, and whether any formula cell was overwritten."""
+        xml = self._xml
+        by_row: Dict[int, Dict[int, str]] = {}
+        for coordinate in set(self._values) | self._wrapped:
+            row, column = _split_coordinate(coordinate)
+            by_row.setdefault(row, {})[column] = coordinate
+
+        formula_replaced = False
+
+        def patch_cell(coordinate: str, attrs: Optional[str], inner: Optional[str]) -> str:
+            nonlocal formula_replaced
+            style = _attr(attrs, "s") if attrs else None
+            if coordinate in self._wrapped:
+                style = wrap_style(style or "0")
+            if coordinate not in self._values:
+                # Only the style changes; the cell keeps its content.
+                kept = re.sub(r'\ss="[^"]*"', "", attrs or f' r="{coordinate}"')
+                return f'<c{kept} s="{style}"' + (f">{inner}</c>" if inner else "/>")
+            if inner and "<f" in inner:
+                formula_replaced = True
+            return _cell_xml(coordinate, style, self._values[coordinate])
+
+        def patch_row(row_number: int, attrs: str, inner: str) -> str:
+            pending = dict(by_row.pop(row_number))
+            cells: List[Tuple[int, str]] = []
+            for cell_match in _CELL_RE.finditer(inner or ""):
+                cell_attrs, cell_inner = cell_match.group(1), cell_match.group(2)
+                coordinate = (_attr(cell_attrs, "r") or "").upper()
+                column = _split_coordinate(coordinate)[1]
+                if column in pending:
+                    cells.append((column, patch_cell(pending.pop(column), cell_attrs, cell_inner)))
+                else:
+                    cells.append((column, cell_match.group(0)))
+            for column, coordinate in pending.items():
+                cells.append((column, patch_cell(coordinate, None, None)))
+            cells.sort(key=lambda item: item[0])
+            # `spans` is only an optimisation hint and may no longer be accurate.
+            attrs = re.sub(r'\sspans="[^"]*"', "", attrs)
+            return f"<row{attrs}>{''.join(cell for _, cell in cells)}</row>"
+
+        def replace_row(row_match) -> str:
+            row_number = int(_attr(row_match.group(1), "r"))
+            if row_number not in by_row:
+                return row_match.group(0)
+            return patch_row(row_number, row_match.group(1), row_match.group(2))
+
+        start = xml.find("<sheetData")
+        head_end = xml.find(">", start) + 1
+        if xml[head_end - 2] == "/":  # <sheetData/>
+            head, body, tail = xml[:head_end - 2] + ">", "", "</sheetData>" + xml[head_end:]
+        else:
+            end = xml.find("</sheetData>", head_end)
+            head, body, tail = xml[:head_end], xml[head_end:end], xml[end:]
+
+        body = _ROW_RE.sub(replace_row, body)
+        if by_row:
+            # Rows the template does not have yet, inserted in order.
+            rows = [(int(_attr(m.group(1), "r")), m.group(0)) for m in _ROW_RE.finditer(body)]
+            rows += [(row_number, patch_row(row_number, f' r="{row_number}"', "")) for row_number in list(by_row)]
+            body = "".join(text for _, text in sorted(rows, key=lambda item: item[0]))
+
+        xml = head + body + tail
+        header = self.oddHeader.to_str()
+        if header != self._original_header:
+            xml = _set_odd_header(xml, header)
+        return xml, formula_replaced
+
+
+def _cell_xml(coordinate: str, style: Optional[str], value) -> str:
+    attrs = f' r="{coordinate}"' + (f' s="{style}"' if style is not None else "")
+    if value is None or value == "":
+        return f"<c{attrs}/>"
+    if isinstance(value, bool):
+        return f'<c{attrs} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Integral):
+        return f"<c{attrs}><v>{int(value)}</v></c>"
+    if isinstance(value, numbers.Real):
+        # float() also turns numpy scalars into plain floats, whose repr is
+        # a valid cell value; NaN/inf have none and are left blank, as
+        # openpyxl does.
+        number = float(value)
+        return f"<c{attrs}><v>{number!r}</v></c>" if math.isfinite(number) else f"<c{attrs}/>"
+    if isinstance(value, numbers.Number):
+        return f"<c{attrs}><v>{value}</v></c>"
+    text = escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+    return f'<c{attrs} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _set_odd_header(xml: str, header: str) -> str:
+    element = f'<oddHeader xml:space="preserve">{escape(header)}</oddHeader>'
+    if re.search(r"<oddHeader\b", xml):
+        return re.sub(r"<oddHeader\b.*?(?:/>|</oddHeader>)", lambda _: element, xml, count=1, flags=re.S)
+    found = re.search(r"<headerFooter\b[^>]*?(/?)>", xml)
+    if found:
+        if found.group(1):  # <headerFooter/>
+            return xml[:found.start()] + found.group(0)[:-2] + f">{element}</headerFooter>" + xml[found.end():]
+        return xml[:found.end()] + element + xml[found.end():]
+    position = len(xml) - len("</worksheet>")
+    for tag in _AFTER_HEADER_FOOTER:
+        found = re.search(rf"<{tag}\b", xml)
+        if found:
+            position = min(position, found.start())
+    return xml[:position] + f"<headerFooter>{element}</headerFooter>" + xml[position:]
+
+
+class PatchedWorkbook:
+    """A template opened for cell patching; see the module comment for the supported API."""
+
+    def __init__(self, template_path: str):
+        self.template_path = template_path
+        self._parts = load_template_parts(template_path)
+        self._shared_strings: Optional[List[str]] = None
+
+        workbook_xml = self._parts["xl/workbook.xml"].decode("utf-8")
+        rels = self._parts["xl/_rels/workbook.xml.rels"].decode("utf-8")
+        targets = {
+            _attr(attrs, "Id"): _attr(attrs, "Target")
+            for attrs in re.findall(r"<Relationship\b([^>]*)/?>", rels)
+        }
+        self._sheets: Dict[str, PatchedSheet] = {}
+        for attrs in re.findall(r"<sheet\b([^>]*)/?>", workbook_xml):
+            target = targets[_attr(attrs, "r:id")]
+            part = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+            self._sheets[html.unescape(_attr(attrs, "name"))] = PatchedSheet(self, html.unescape(_attr(attrs, "name")), part)
+        active_tab = re.search(r'<workbookView\b[^>]*\bactiveTab="(\d+)"', workbook_xml)
+        self._active = list(self._sheets.values())[int(active_tab.group(1)) if active_tab else 0]
+
+    @property
+    def active(self) -> PatchedSheet:
+        return self._active
+
+    @property
+    def sheetnames(self) -> List[str]:
+        return list(self._sheets)
+
+    def __getitem__(self, name: str) -> PatchedSheet:
+        return self._sheets[name]
+
+    def _shared_string(self, index: int) -> str:
+        if self._shared_strings is None:
+            xml = self._parts.get("xl/sharedStrings.xml", b"").decode("utf-8")
+            self._shared_strings = [html.unescape("".join(_T_RE.findall(si))) for si in _SI_RE.findall(xml)]
+        return self._shared_strings[index]
+
+    def _styles_patcher(self):
+        """Returns (wrap_style, render): wrap_style(s) gives the id of style s with wrapped text."""
+        added: Dict[str, str] = {}
+        state = {"xml": None}
+
+        def wrap_style(style: str) -> str:
+            if style in added:
+                return added[style]
+            if state["xml"] is None:
+                state["xml"] = self._parts["xl/styles.xml"].decode("utf-8")
+            xml = state["xml"]
+            start = xml.find("<cellXfs")
+            end = xml.find("</cellXfs>", start)
+            xfs = re.findall(r"<xf\b[^>]*?(?:/>|>.*?</xf>)", xml[start:end], re.S)
+            xf = xfs[int(style)]
+            opening = re.match(r"<xf\b[^>]*?/?>", xf).group(0)
+            children = "" if opening.endswith("/>") else xf[len(opening):-len("</xf>")]
+            children = re.sub(r"<alignment\b[^>]*?(?:/>|>.*?</alignment>)", "", children, flags=re.S)
+            opening = _set_attr(opening.rstrip("/>").rstrip() + ">", "applyAlignment", "1")
+            new_xf = f'{opening}<alignment wrapText="1"/>{children}</xf>'
+            count = len(xfs) + 1
+            head = _set_attr(re.match(r"<cellXfs\b[^>]*>", xml[start:]).group(0), "count", str(count))
+            head_end = start + len(re.match(r"<cellXfs\b[^>]*>", xml[start:]).group(0))
+            state["xml"] = xml[:start] + head + xml[head_end:end] + new_xf + xml[end:]
+            added[style] = str(count - 1)
+            return added[style]
+
+        return wrap_style, lambda: state["xml"]
+
+    def _render_parts(self) -> Dict[str, bytes]:
+        """The parts that differ from the template (None for parts to drop)."""
+        changed: Dict[str, Optional[bytes]] = {}
+        wrap_style, styles_xml = self._styles_patcher()
+        formula_replaced = False
+        for sheet in self._sheets.values():
+            if sheet._has_changes():
+                xml, replaced = sheet._render(wrap_style)
+                changed[sheet.part] = xml.encode("utf-8")
+                formula_replaced = formula_replaced or replaced
+        if styles_xml() is not None:
+            changed["xl/styles.xml"] = styles_xml().encode("utf-8")
+        if not changed:
+            return changed
+
+        # Cached formula results may be stale now; have Excel recalculate on open.
+        workbook_xml = self._parts["xl/workbook.xml"].decode("utf-8")
+        calc_pr = re.search(r"<calcPr\b[^>]*?/?>", workbook_xml)
+        if calc_pr:
+            workbook_xml = workbook_xml.replace(calc_pr.group(0), _set_attr(calc_pr.group(0), "fullCalcOnLoad", "1"), 1)
+        else:
+            workbook_xml = re.sub(r"(</sheets>(?:<functionGroups\b.*?</functionGroups>|<externalReferences>.*?</externalReferences>|<definedNames>.*?</definedNames>)*)",
+                                  r'\1<calcPr fullCalcOnLoad="1"/>', workbook_xml, count=1, flags=re.S)
+        changed["xl/workbook.xml"] = workbook_xml.encode("utf-8")
+
+        if formula_replaced and "xl/calcChain.xml" in self._parts:
+            # The calculation chain would list cells that no longer hold
+            # formulas; Excel rebuilds it when it is missing.
+            changed["xl/calcChain.xml"] = None
+            rels = self._parts["xl/_rels/workbook.xml.rels"].decode("utf-8")
+            changed["xl/_rels/workbook.xml.rels"] = re.sub(r'<Relationship\b[^>]*Target="(?:/xl/)?calcChain\.xml"[^>]*/>', "", rels).encode("utf-8")
+            types = self._parts["[Content_Types].xml"].decode("utf-8")
+            changed["[Content_Types].xml"] = re.sub(r'<Override\b[^>]*PartName="/xl/calcChain\.xml"[^>]*/>', "", types).encode("utf-8")
+        return changed
+
+    def save(self, output) -> None:
+        """Write the patched workbook to a path or binary file object."""
+        changed = self._render_parts()
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name, data in self._parts.items():
+                data = changed.get(name, data)
+                if data is not None:
+                    zf.writestr(name, data)